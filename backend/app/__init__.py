@@ -1,6 +1,6 @@
 from flask import Flask
 from .config import Config
-from .extensions import db, jwt, redis_client, supabase_client, gemini_client
+from .extensions import db, jwt, get_redis_client, get_supabase_client, get_gemini_client
 from .routes import register_routes
 
 def create_app(config_class=Config):
@@ -22,27 +22,25 @@ def create_app(config_class=Config):
     def health():
         return {"status":"ok"}, 200
     
-    with app.app_context():
-        test_connections()
-        
     return app
 
 def test_connections():
-    """Test all external services"""
+    """Test all external services. Connects on demand, so call it explicitly rather than at startup."""
     print("Testing")
     
+    redis_client = get_redis_client()
     if redis_client:
         try : 
             redis_client.ping()
             print("Redis connected")
         except :
             print("Redis connection failed")
-    if supabase_client:
+    if get_supabase_client():
         print("Supabase available")
     else :
         print("Supabase not available")
         
-    if gemini_client:
+    if get_gemini_client():
         print("Gemini available")
     else :
         print("Gemini not available")
\ No newline at end of file
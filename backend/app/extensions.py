@@ -1,15 +1,11 @@
-from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
-from redis import Redis
-from supabase import create_client
-import google.generativeai as genai
-import razorpay
 import os
 import logging
-from typing import Optional
+import threading
+import time
 
-# SQLAlchemy ORM
-db = SQLAlchemy()
+# SQLAlchemy ORM, shared with the models
+from models import db
 
 # JWT
 jwt = JWTManager()
@@ -17,78 +13,187 @@ jwt = JWTManager()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-class Config:
+# Seconds before a client that failed to initialize is tried again
+RETRY_AFTER = 30
+
+
+class ClientRegistry:
     """
-    Configuration class with validation
+    External clients built on first use, once per process.
+
+    Nothing connects at import time. After a fork the child drops the
+    parent's clients instead of sharing its sockets, and builds its own on
+    first use (or in the background when warmup is enabled). A client that
+    fails to initialize is reported as None and retried after RETRY_AFTER
+    seconds, so callers keep their "no client" fallbacks.
     """
-    
+
     def __init__(self):
-        self.redis_client = self._init_redis()
-        self.supabase_client = self._init_supabase()
-        self.gemini_client = self._init_gemini()
-        self.razorpay_client = self._init_razorpay()
-    
-    def _init_redis(self) -> Optional[Redis] :
-        """Initialize Redis"""
-        try :
-            redis_url = os.getenv("REDIS_URL","redis://localhost:6379/0")
-            client = Redis.from_url(redis_url, decode_responses=True)
-            client.ping()
-            logger.info("Redis connected")
+        self._factories = {}
+        self._clients = {}
+        self._failed_at = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._warm_names = None
+
+    def register(self, name):
+        def decorator(factory):
+            self._factories[name] = factory
+            return factory
+        return decorator
+
+    def get(self, name):
+        if self._pid != os.getpid():
+            self.reset()
+
+        client = self._clients.get(name)
+        if client is not None:
             return client
-        except Exception as e :
-            logger.error(f"Redis initialization failed : {e}")
-            return None
-        
-    def _init_supabase(self) :
-        """Initialize SUPABASE"""
-        url = os.getenv("SUPABASE_URL")
-        key = os.getenv("SUPABASE_SERVICE_KEY")
-        
-        if not url or not key :
-            logger.error("Supabase credentials missing")
-            return None
-        
-        try :
-            logger.info("Supabase client initialized")
-            return create_client(url,key)
-        except Exception as e :
-            logger.error(f"Supabase initialization failed : {e}")
-            return None
-
-    def _init_gemini(self) :
-        """Initialize GEMINI"""
-        api_key = os.getenv("GEMINI_API_KEY")
-        
-        if not api_key:
-            logger.error("GEMINI_API_KEY missing")
-            return None
-        try :
-            genai.configure(api_key=api_key)
-            logger.info("Google Gemini Client initialized")
-            return genai.GenerativeModel("gemini-pro")
-        except Exception as e :
-            logger.error(f"Gemini initialization failed : {e}")
-            return None
-        
-    def _init_razorpay(self):
-        """Initialize Razorpay Client"""
-        key_id = os.getenv("RAZORPAY_KEY_ID")
-        key_secret = os.getenv("RAZORPAY_KEY_SECRET")
-        
-        if not key_id or not key_secret:
-            logger.error("Razorpay credentials missing")
-            return None
-        
-        try :
-            client = razorpay.Client(auth=(key_id,key_secret)) 
-            logger.info("Razorpay client initialized")
+
+        with self._lock:
+            client = self._clients.get(name)
+            if client is not None:
+                return client
+            failed_at = self._failed_at.get(name)
+            if failed_at is not None and time.monotonic() - failed_at < RETRY_AFTER:
+                return None
+
+            client = self._factories[name]()
+            if client is None:
+                self._failed_at[name] = time.monotonic()
+            else:
+                self._clients[name] = client
+                self._failed_at.pop(name, None)
             return client
-        except Exception as e :
-            logger.error(f"Razorpay initialized failed : {e}")  
-             
-config = Config()
-redis_client = config.redis_client
-supabase_client = config.supabase_client
-gemini_client = config.gemini_client
-razorpay_client = config.razorpay_client
\ No newline at end of file
+
+    def reset(self):
+        """Forget every client; the next get() builds a fresh one in this process"""
+        # A new lock too: the parent may have forked while another thread held it
+        self._lock = threading.Lock()
+        self._clients = {}
+        self._failed_at = {}
+        self._pid = os.getpid()
+
+    def warmup(self, names=None):
+        """Build clients on a background thread so the first request doesn't pay for it"""
+        self._warm_names = tuple(names or self._factories)
+
+        def warm():
+            for name in self._warm_names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    logger.error(f"Warming up {name} failed : {e}")
+
+        thread = threading.Thread(target=warm, name='client-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def after_fork(self):
+        self.reset()
+        if self._warm_names:
+            self.warmup(self._warm_names)
+
+    def status(self):
+        """'connected', 'unavailable' or 'not initialized' for each client"""
+        return {
+            name: 'connected' if name in self._clients
+            else 'unavailable' if name in self._failed_at
+            else 'not initialized'
+            for name in self._factories
+        }
+
+
+clients = ClientRegistry()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=clients.after_fork)
+
+
+@clients.register('redis')
+def _init_redis():
+    """Initialize Redis"""
+    from redis import Redis
+    try :
+        redis_url = os.getenv("REDIS_URL","redis://localhost:6379/0")
+        client = Redis.from_url(redis_url, decode_responses=True, socket_connect_timeout=2)
+        client.ping()
+        logger.info("Redis connected")
+        return client
+    except Exception as e :
+        logger.error(f"Redis initialization failed : {e}")
+        return None
+
+
+@clients.register('supabase')
+def _init_supabase():
+    """Initialize SUPABASE"""
+    url = os.getenv("SUPABASE_URL")
+    key = os.getenv("SUPABASE_SERVICE_KEY")
+
+    if not url or not key :
+        logger.error("Supabase credentials missing")
+        return None
+
+    try :
+        from supabase import create_client
+        client = create_client(url,key)
+        logger.info("Supabase client initialized")
+        return client
+    except Exception as e :
+        logger.error(f"Supabase initialization failed : {e}")
+        return None
+
+
+@clients.register('gemini')
+def _init_gemini():
+    """Initialize GEMINI"""
+    api_key = os.getenv("GEMINI_API_KEY")
+
+    if not api_key:
+        logger.error("GEMINI_API_KEY missing")
+        return None
+    try :
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        logger.info("Google Gemini Client initialized")
+        return genai.GenerativeModel("gemini-pro")
+    except Exception as e :
+        logger.error(f"Gemini initialization failed : {e}")
+        return None
+
+
+@clients.register('razorpay')
+def _init_razorpay():
+    """Initialize Razorpay Client"""
+    key_id = os.getenv("RAZORPAY_KEY_ID")
+    key_secret = os.getenv("RAZORPAY_KEY_SECRET")
+
+    if not key_id or not key_secret:
+        logger.error("Razorpay credentials missing")
+        return None
+
+    try :
+        import razorpay
+        client = razorpay.Client(auth=(key_id,key_secret))
+        logger.info("Razorpay client initialized")
+        return client
+    except Exception as e :
+        logger.error(f"Razorpay initialized failed : {e}")
+        return None
+
+
+def get_redis_client():
+    return clients.get('redis')
+
+
+def get_supabase_client():
+    return clients.get('supabase')
+
+
+def get_gemini_client():
+    return clients.get('gemini')
+
+
+def get_razorpay_client():
+    return clients.get('razorpay')
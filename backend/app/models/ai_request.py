@@ -14,12 +14,22 @@ class AIRequest(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     model_used = db.Column(db.String(50))
     token_used = db.Column(db.Integer)
+    prompt_tokens = db.Column(db.Integer)
+    completion_tokens = db.Column(db.Integer)
+    tokens_estimated = db.Column(db.Boolean, default=False)
     cost = db.Column(db.Float)
     status = db.Column(db.String(20), default="pending")
+    cache_hit = db.Column(db.Boolean, default=False)
+    queue_wait_ms = db.Column(db.Float)
+    upstream_latency_ms = db.Column(db.Float)
     error_message = db.Column(db.Text)
     
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey("users.id"), nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_ai_requests_user_created', 'user_id', 'created_at'),
+    )
+    
     @validates('status')
     def validate_status(self, key, status):
         """Validate AI request status"""
@@ -35,9 +45,15 @@ class AIRequest(db.Model):
             'prompt': self.prompt,
             'response': self.response,
             'model_used': self.model_used,
-            'tokens_used': self.tokens_used,
+            'tokens_used': self.token_used,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'tokens_estimated': self.tokens_estimated,
             'cost': self.cost,
             'status': self.status,
+            'cache_hit': self.cache_hit,
+            'queue_wait_ms': self.queue_wait_ms,
+            'upstream_latency_ms': self.upstream_latency_ms,
             'error_message': self.error_message,
             'user_id': str(self.user_id),
             'created_at': self.created_at.isoformat()
@@ -0,0 +1,38 @@
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import UUID
+from . import db
+
+class AIUsageRollup(db.Model):
+    """Daily AI token and cost totals per user and model"""
+    __tablename__ = "ai_usage_rollups"
+    
+    user_id = db.Column(UUID(as_uuid=True), db.ForeignKey("users.id"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, default=lambda: datetime.utcnow().date())
+    model_used = db.Column(db.String(50), primary_key=True)
+    requests = db.Column(db.Integer, nullable=False, default=0)
+    cache_hits = db.Column(db.Integer, nullable=False, default=0)
+    prompt_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    completion_tokens = db.Column(db.BigInteger, nullable=False, default=0)
+    cost = db.Column(db.Float, nullable=False, default=0.0)
+    
+    __table_args__ = (
+        db.Index('ix_ai_usage_rollups_day_model', 'day', 'model_used'),
+    )
+    
+    @property
+    def total_tokens(self):
+        return (self.prompt_tokens or 0) + (self.completion_tokens or 0)
+    
+    def to_dict(self):
+        """Convert usage rollup to dictionary"""
+        return {
+            'user_id': str(self.user_id),
+            'day': self.day.isoformat(),
+            'model_used': self.model_used,
+            'requests': self.requests,
+            'cache_hits': self.cache_hits,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
+            'total_tokens': self.total_tokens,
+            'cost': self.cost
+        }
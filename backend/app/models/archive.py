@@ -0,0 +1,32 @@
+from . import db
+from .comment import Comment
+from .ratings import Rating
+from .recipe import Recipe
+from .recipe_tag import RecipeTag
+
+
+def archive_table(model):
+    """
+    `<table>_archive`: the model's columns without foreign keys or defaults,
+    plus archived_at. Built from the model so the two never drift apart.
+    """
+    source = model.__table__
+    columns = [
+        db.Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+        for column in source.columns
+    ]
+    return db.Table(
+        f"{source.name}_archive",
+        db.metadata,
+        *columns,
+        db.Column('archived_at', db.DateTime, nullable=False, index=True)
+    )
+
+
+recipes_archive = archive_table(Recipe)
+comments_archive = archive_table(Comment)
+ratings_archive = archive_table(Rating)
+recipe_tags_archive = archive_table(RecipeTag)
+
+db.Index('ix_comments_archive_recipe_id', comments_archive.c.recipe_id)
+db.Index('ix_ratings_archive_recipe_id', ratings_archive.c.recipe_id)
@@ -7,7 +7,8 @@ class AuditLog(db.Model):
     """Track all important changes for security and debugging"""
     __tablename__ = "audit_logs"
     
-    user_id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = db.Column(UUID(as_uuid=True), index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     action = db.Column(db.String(50), nullable=False)
     table_name = db.Column(db.String(50), nullable=False)
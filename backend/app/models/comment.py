@@ -12,6 +12,9 @@ class Comment(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_edited = db.Column(db.Boolean, default=False)
     edited_at = db.Column(db.DateTime)
+    # Soft delete; `flask archive-deleted` later moves the row to comments_archive
+    is_deleted = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    deleted_at = db.Column(db.DateTime)
     
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey("users.id"), nullable=False)
     recipe_id = db.Column(UUID(as_uuid=True), db.ForeignKey("recipes.id"), nullable=False)
@@ -19,6 +22,13 @@ class Comment(db.Model):
     
     replies = db.relationship("Comment", backref=db.backref("parent", remote_side="Comment.id"))
     
+    # Threads and reply lookups also count deleted rows, so those indexes are not partial
+    __table_args__ = (
+        db.Index('ix_comments_recipe_parent_created', 'recipe_id', 'parent_id', 'created_at'),
+        db.Index('ix_comments_parent_id', 'parent_id'),
+        db.Index('ix_comments_deleted_at', 'deleted_at', postgresql_where=db.text('is_deleted')),
+    )
+    
     @validates('content')
     def validate_content(self, key, content):
         """Validate comment content"""
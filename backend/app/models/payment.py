@@ -19,6 +19,14 @@ class Payment(db.Model):
     
     user_id = db.Column(UUID(as_uuid=True), db.ForeignKey("users.id"), nullable=False)
     
+    __table_args__ = (
+        db.Index('ix_payments_user_status_created', 'user_id', 'status', 'created_at'),
+        # Webhooks match on the provider's order or payment id
+        db.Index('ix_payments_payment_id', 'payment_id'),
+        # Reconciliation walks stale pending payments in (created_at, id) order
+        db.Index('ix_payments_pending_created', 'created_at', 'id', postgresql_where=db.text("status = 'pending'")),
+    )
+    
     @validates('status')
     def validate_status(self, key, status):
         """Validate payment status"""
@@ -46,8 +54,7 @@ class Payment(db.Model):
             'description': self.description,
             'failure_reason': self.failure_reason,
             'user_id': str(self.user_id),
-            'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+            'created_at': self.created_at.isoformat()
         }
     
     
@@ -0,0 +1,44 @@
+from datetime import datetime
+import uuid
+from sqlalchemy.dialects.postgresql import UUID, JSON
+from sqlalchemy.orm import validates
+from . import db
+
+class PaymentEvent(db.Model):
+    """Raw Razorpay webhook events, stored once per provider event id"""
+    __tablename__ = "payment_events"
+    
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    event_id = db.Column(db.String(64), unique=True, nullable=False)
+    event_type = db.Column(db.String(50), nullable=False)
+    order_id = db.Column(db.String(50), index=True)
+    payload = db.Column(JSON, nullable=False)
+    status = db.Column(db.String(20), default="received")
+    error_message = db.Column(db.Text)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_payment_events_received', 'received_at', postgresql_where=db.text("status = 'received'")),
+    )
+    
+    @validates('status')
+    def validate_status(self, key, status):
+        """Validate event processing status"""
+        allowed_statuses = ['received', 'processed', 'ignored', 'failed']
+        if status not in allowed_statuses:
+            raise ValueError(f"Status must be one of: {', '.join(allowed_statuses)}")
+        return status
+    
+    def to_dict(self):
+        """Convert payment event to dictionary"""
+        return {
+            'id': str(self.id),
+            'event_id': self.event_id,
+            'event_type': self.event_type,
+            'order_id': self.order_id,
+            'status': self.status,
+            'error_message': self.error_message,
+            'received_at': self.received_at.isoformat(),
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None
+        }
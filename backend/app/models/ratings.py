@@ -17,6 +17,7 @@ class Rating(db.Model):
     
     __table_args__ = (
         db.UniqueConstraint('user_id','recipe_id',name='unique_user_recipe_rating'),
+        db.Index('ix_ratings_recipe_created', 'recipe_id', 'created_at'),
     )
     
     @validates('score')
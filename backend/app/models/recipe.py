@@ -7,7 +7,7 @@ from sqlalchemy.orm import validates
 class Recipe(db.Model):
     __tablename__ = "recipes"
     
-    id = db.Column(UUID(as_uuid=True), primary_key=True, defautlt=uuid.uuid4)
+    id = db.Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     title = db.Column(db.String(150), nullable=False)
     description = db.Column(db.Text, nullable=False)
     ingredients = db.Column(db.Text, nullable=False)
@@ -21,12 +21,23 @@ class Recipe(db.Model):
     difficulty_level = db.Column(db.String(20), default="medium") # easy, medium, hard
     is_featured = db.Column(db.Boolean, default=False)
     view_count = db.Column(db.Integer, default=0)
-    author_id = db.Column(UUID(as_uuid=True), db.ForeingKey("users.id"), nullable=False)
+    author_id = db.Column(UUID(as_uuid=True), db.ForeignKey("users.id"), nullable=False)
+    # Soft delete; `flask archive-deleted` later moves the row to recipes_archive
+    is_deleted = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false())
+    deleted_at = db.Column(db.DateTime)
     
     comments = db.relationship("Comment", backref="recipe", lazy=True)
     ratings = db.relationship("Rating", backref="recipe", lazy=True)
     tags = db.relationship("Tag", secondary="recipe_tags", back_populates="recipes")
     
+    # Partial indexes cover live rows only, so deleted rows cost nothing on the hot paths
+    __table_args__ = (
+        db.Index('ix_recipes_live_created', 'created_at', 'id', postgresql_where=db.text('NOT is_deleted')),
+        db.Index('ix_recipes_live_author_created', 'author_id', 'created_at', postgresql_where=db.text('NOT is_deleted')),
+        db.Index('ix_recipes_live_featured_created', 'created_at', postgresql_where=db.text('is_featured AND NOT is_deleted')),
+        db.Index('ix_recipes_deleted_at', 'deleted_at', postgresql_where=db.text('is_deleted')),
+    )
+    
     @validates('difficulty_level')
     def validate_difficulty(self, key, difficulty):
         """Validate difficulty level"""
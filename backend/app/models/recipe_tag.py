@@ -7,4 +7,9 @@ class RecipeTag(db.Model):
     
     recipe_id = db.Column(UUID(as_uuid=True), db.ForeignKey("recipes.id"), primary_key=True)
     tag_id = db.Column(UUID(as_uuid=True), db.ForeignKey("tags.id"), primary_key=True)
-    created_at = db.Column(db.DateTime, default=db.func.now())
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=db.func.now())
+    
+    # The primary key leads with recipe_id; tag pages look links up by tag
+    __table_args__ = (
+        db.Index('ix_recipe_tags_tag_recipe', 'tag_id', 'recipe_id'),
+    )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields, validate, validates, ValidationError
+from marshmallow import Schema, fields, validate, validates, validates_schema, ValidationError
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from .user import User
 from .recipe import Recipe
@@ -61,4 +61,27 @@ class PaymentCreateSchema(Schema):
     payment_method = fields.Str(validate=validate.OneOf(['card', 'upi', 'netbanking', 'wallet']))
     description = fields.Str(validate=validate.Length(max=200))
 
-    
\ No newline at end of file
+    
+
+class BulkModerationSchema(Schema):
+    """Schema for bulk admin moderation - target rows by id list or by filter"""
+    ids = fields.List(fields.UUID(), validate=validate.Length(min=1, max=10000))
+    author_id = fields.UUID()
+    created_after = fields.DateTime()
+    created_before = fields.DateTime()
+    
+    @validates_schema
+    def validate_target(self, data, **kwargs):
+        """Refuse requests that would touch the whole table"""
+        if not any(data.get(key) for key in ('ids', 'author_id', 'created_after', 'created_before')):
+            raise ValidationError("Provide ids or at least one filter (author_id, created_after, created_before)")
+
+
+class BulkFeatureSchema(BulkModerationSchema):
+    """Schema for bulk feature/unfeature"""
+    featured = fields.Bool(required=True)
+
+
+class ArchiveRestoreSchema(Schema):
+    """Schema for restoring archived recipes or comments by id"""
+    ids = fields.List(fields.UUID(), required=True, validate=validate.Length(min=1, max=10000))
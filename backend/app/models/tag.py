@@ -11,6 +11,7 @@ class Tag(db.Model):
     description = db.Column(db.String(200))
     color = db.Column(db.String(7), default="#3B82F6")
     usage_count = db.Column(db.Integer, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     recipes = db.relationship("Recipe", secondary="recipe_tags", back_populates="tags")
         
@@ -22,7 +23,7 @@ class Tag(db.Model):
             'description': self.description,
             'color': self.color,
             'usage_count': self.usage_count,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at.isoformat() if self.created_at else None
         }
     
     def __repr__(self):
@@ -14,7 +14,7 @@ class User(db.Model):
     is_deleted = db.Column(db.Boolean, default=False)
     username = db.Column(db.String(80), unique=True, nullable=False, index=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
-    password_hash = db.Column(db.String(128), nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
     is_premium = db.Column(db.Boolean, default=False)
     first_name = db.Column(db.String(50))
     last_name = db.Column(db.String(50))
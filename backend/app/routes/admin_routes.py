@@ -1,18 +1,54 @@
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from sqlalchemy import desc, func
+from marshmallow import ValidationError
+from sqlalchemy import desc, func, select, update, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
 
 from models import db
 from models.user import User
 from models.recipe import Recipe
 from models.payment import Payment
 from models.ai_request import AIRequest
-from app.utils.helpers import log_audit_event
+from models.audit_log import AuditLog
+from models.ai_usage import AIUsageRollup
+from models.comment import Comment
+from models.schemas import BulkModerationSchema, BulkFeatureSchema, ArchiveRestoreSchema
+from utils.helpers import log_audit_event, log_audit_events
+from services.archive import ARCHIVABLE, restore
+from services.prompt_cache import prompt_cache
+from services.thumbnails import thumbnail_cache
 from utils.decorators import admin_required
+from utils.db_pool import pool_stats
+from utils.exports import EXPORT_FORMATS, stream_query
 
 admin_bp = Blueprint('admin', __name__)
 
+# Column projections for each exportable table. Selecting columns instead of
+# entities keeps the ORM out of the loop, so rows stay plain tuples.
+EXPORT_COLUMNS = {
+    'users': [
+        User.id, User.username, User.email, User.first_name, User.last_name,
+        User.is_premium, User.is_active, User.is_deleted, User.last_login,
+        User.created_at, User.updated_at
+    ],
+    'payments': [
+        Payment.id, Payment.user_id, Payment.amount, Payment.currency,
+        Payment.status, Payment.payment_id, Payment.payment_method,
+        Payment.description, Payment.failure_reason, Payment.created_at
+    ],
+    'ai-requests': [
+        AIRequest.id, AIRequest.user_id, AIRequest.prompt, AIRequest.response,
+        AIRequest.model_used, AIRequest.token_used, AIRequest.cost,
+        AIRequest.status, AIRequest.error_message, AIRequest.created_at
+    ],
+    'audit-logs': [
+        AuditLog.id, AuditLog.user_id, AuditLog.action, AuditLog.table_name,
+        AuditLog.record_id, AuditLog.changes, AuditLog.ip_address,
+        AuditLog.user_agent, AuditLog.created_at
+    ],
+}
+
 @admin_bp.route('/dashboard', methods=['GET'])
 @admin_required
 def admin_dashboard():
@@ -93,6 +129,58 @@ def admin_get_users():
         }
     }), 200
 
+@admin_bp.route('/export/<resource>', methods=['GET'])
+@admin_required
+def admin_export(resource):
+    """Stream a full table export as NDJSON or CSV"""
+    columns = EXPORT_COLUMNS.get(resource)
+    if columns is None:
+        return jsonify({'error': 'Unknown export resource'}), 404
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    batch_size = min(max(request.args.get('batch_size', 1000, type=int), 1), 10000)
+    since = request.args.get('since')
+    until = request.args.get('until')
+    
+    created_at = next(column for column in columns if column.key == 'created_at')
+    stmt = select(*columns)
+    try:
+        if since:
+            stmt = stmt.where(created_at >= datetime.fromisoformat(since))
+        if until:
+            stmt = stmt.where(created_at < datetime.fromisoformat(until))
+    except ValueError:
+        return jsonify({'error': 'since/until must be ISO 8601 dates'}), 400
+    
+    current_user_id = get_jwt_identity()
+    log_audit_event(
+        user_id=current_user_id,
+        action='ADMIN_EXPORT',
+        table_name=resource.replace('-', '_'),
+        record_id=current_user_id,
+        changes={'format': fmt, 'since': since, 'until': until},
+        ip_address=request.remote_addr
+    )
+    
+    # The export runs on its own connection; hand the session's connection
+    # back to the pool instead of holding it for the whole download.
+    db.session.close()
+    
+    mimetype, _ = EXPORT_FORMATS[fmt]
+    filename = f"{resource}-{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.{fmt}"
+    
+    return Response(
+        stream_with_context(stream_query(stmt, fmt=fmt, batch_size=batch_size)),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @admin_bp.route('/recipes/<recipe_id>/feature', methods=['POST'])
 @admin_required
 def admin_feature_recipe(recipe_id):
@@ -120,6 +208,224 @@ def admin_feature_recipe(recipe_id):
         'recipe': recipe.to_dict()
     }), 200
 
+@admin_bp.route('/ai/cache', methods=['GET'])
+@admin_required
+def admin_ai_cache_stats():
+    """Hit rate and saved latency of the AI prompt cache"""
+    return jsonify({'cache': prompt_cache.stats()}), 200
+
+@admin_bp.route('/db/pool', methods=['GET'])
+@admin_required
+def admin_db_pool_stats():
+    """Connection pool occupancy, checkout waits and hold times for this worker"""
+    replicas = current_app.extensions.get('db_replicas')
+    return jsonify({
+        'pool': pool_stats(db.engine),
+        'replicas': {
+            name: dict(state, pool=pool_stats(db.engines[name], include_metrics=False))
+            for name, state in replicas.stats().items()
+        } if replicas else {}
+    }), 200
+
+@admin_bp.route('/images/thumbnails', methods=['GET'])
+@admin_required
+def admin_thumbnail_cache_stats():
+    """Size of the thumbnail disk cache, with this worker's hit rate and resize latency"""
+    return jsonify({'cache': thumbnail_cache.stats()}), 200
+
+@admin_bp.route('/ai/usage', methods=['GET'])
+@admin_required
+def admin_ai_usage():
+    """AI token and cost totals grouped by user, day or model"""
+    group_by = request.args.get('group_by', 'day')
+    groups = {
+        'user': AIUsageRollup.user_id,
+        'day': AIUsageRollup.day,
+        'model': AIUsageRollup.model_used
+    }
+    if group_by not in groups:
+        return jsonify({'error': f"group_by must be one of: {', '.join(groups)}"}), 400
+    
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    column = groups[group_by]
+    query = db.session.query(
+        column.label('key'),
+        func.sum(AIUsageRollup.requests).label('requests'),
+        func.sum(AIUsageRollup.cache_hits).label('cache_hits'),
+        func.sum(AIUsageRollup.prompt_tokens).label('prompt_tokens'),
+        func.sum(AIUsageRollup.completion_tokens).label('completion_tokens'),
+        func.sum(AIUsageRollup.cost).label('cost')
+    )
+    
+    try:
+        if request.args.get('since'):
+            query = query.filter(AIUsageRollup.day >= datetime.fromisoformat(request.args['since']).date())
+        if request.args.get('until'):
+            query = query.filter(AIUsageRollup.day < datetime.fromisoformat(request.args['until']).date())
+    except ValueError:
+        return jsonify({'error': 'since/until must be ISO 8601 dates'}), 400
+    if request.args.get('user_id'):
+        query = query.filter(AIUsageRollup.user_id == request.args['user_id'])
+    
+    order = desc(column) if group_by == 'day' else desc('cost')
+    rows = query.group_by(column).order_by(order).limit(limit).all()
+    
+    return jsonify({
+        'group_by': group_by,
+        'usage': [{
+            group_by: row.key.isoformat() if group_by == 'day' else str(row.key),
+            'requests': int(row.requests or 0),
+            'cache_hits': int(row.cache_hits or 0),
+            'prompt_tokens': int(row.prompt_tokens or 0),
+            'completion_tokens': int(row.completion_tokens or 0),
+            'total_tokens': int((row.prompt_tokens or 0) + (row.completion_tokens or 0)),
+            'cost': round(float(row.cost or 0), 6)
+        } for row in rows]
+    }), 200
+
+def _bulk_criteria(model, data, author_column):
+    """Build the WHERE clause for a bulk moderation request"""
+    criteria = []
+    if data.get('ids'):
+        criteria.append(model.id == any_(
+            bindparam('ids', data['ids'], type_=ARRAY(UUID(as_uuid=True)))
+        ))
+    if data.get('author_id'):
+        criteria.append(author_column == data['author_id'])
+    if data.get('created_after'):
+        criteria.append(model.created_at >= data['created_after'])
+    if data.get('created_before'):
+        criteria.append(model.created_at < data['created_before'])
+    return criteria
+
+def _bulk_update(model, schema, author_column, state, values, action):
+    """
+    Lock the matching rows (at most BULK_UPDATE_MAX_ROWS), apply one set-based
+    UPDATE ... WHERE id = ANY(...) RETURNING id, write the audit trail as a
+    single multi-row insert and commit once.
+    """
+    current_user_id = get_jwt_identity()
+    
+    try:
+        data = schema.load(request.get_json() or {})
+    except ValidationError as err:
+        return jsonify({'error': 'Validation failed', 'details': err.messages}), 400
+    
+    values = values(data) if callable(values) else values
+    table_name = model.__tablename__
+    action = action(data) if callable(action) else action
+    max_rows = current_app.config['BULK_UPDATE_MAX_ROWS']
+    
+    # Only rows whose state actually changes are touched and reported back
+    targets = select(model.id).where(
+        *_bulk_criteria(model, data, author_column), *state(data)
+    ).limit(max_rows + 1).with_for_update()
+    
+    try:
+        target_ids = db.session.execute(targets).scalars().all()
+        if len(target_ids) > max_rows:
+            db.session.rollback()
+            return jsonify({
+                'error': 'Too many rows matched',
+                'details': f'More than {max_rows} {table_name} match; narrow the filter or send ids in batches'
+            }), 400
+        
+        record_ids = db.session.execute(
+            update(model).where(
+                model.id == any_(bindparam('target_ids', target_ids, type_=ARRAY(UUID(as_uuid=True))))
+            ).values(**values).returning(model.id).execution_options(synchronize_session=False)
+        ).scalars().all() if target_ids else []
+        log_audit_events(
+            user_id=current_user_id,
+            action=action,
+            table_name=table_name,
+            record_ids=record_ids,
+            changes={
+                key: value.isoformat() if isinstance(value, datetime) else value
+                for key, value in values.items()
+            },
+            ip_address=request.remote_addr
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Bulk update failed', 'details': str(e)}), 500
+    
+    return jsonify({
+        'message': f'{len(record_ids)} {table_name} updated',
+        'updated': len(record_ids),
+        'ids': [str(record_id) for record_id in record_ids]
+    }), 200
+
+@admin_bp.route('/recipes/bulk-feature', methods=['POST'])
+@admin_required
+def admin_bulk_feature_recipes():
+    """Feature/unfeature many recipes at once"""
+    return _bulk_update(
+        Recipe, BulkFeatureSchema(), Recipe.author_id,
+        state=lambda data: [Recipe.is_deleted == False, Recipe.is_featured != data['featured']],
+        values=lambda data: {'is_featured': data['featured']},
+        action=lambda data: 'ADMIN_FEATURE' if data['featured'] else 'ADMIN_UNFEATURE'
+    )
+
+@admin_bp.route('/recipes/bulk-delete', methods=['POST'])
+@admin_required
+def admin_bulk_delete_recipes():
+    """Soft delete many recipes at once"""
+    return _bulk_update(
+        Recipe, BulkModerationSchema(), Recipe.author_id,
+        state=lambda data: [Recipe.is_deleted == False],
+        values=lambda data: {'is_deleted': True, 'deleted_at': datetime.utcnow()},
+        action='ADMIN_DELETE'
+    )
+
+@admin_bp.route('/comments/bulk-delete', methods=['POST'])
+@admin_required
+def admin_bulk_delete_comments():
+    """Soft delete many comments at once"""
+    return _bulk_update(
+        Comment, BulkModerationSchema(), Comment.user_id,
+        state=lambda data: [Comment.is_deleted == False],
+        values=lambda data: {'is_deleted': True, 'deleted_at': datetime.utcnow()},
+        action='ADMIN_DELETE'
+    )
+
+@admin_bp.route('/archive/<table>/restore', methods=['POST'])
+@admin_required
+def admin_restore_archived(table):
+    """Move archived recipes or comments back into the live tables"""
+    if table not in ARCHIVABLE:
+        return jsonify({'error': f"Unknown table, expected one of: {', '.join(ARCHIVABLE)}"}), 404
+    
+    try:
+        data = ArchiveRestoreSchema().load(request.get_json() or {})
+    except ValidationError as err:
+        return jsonify({'error': 'Validation failed', 'details': err.messages}), 400
+    
+    try:
+        restored = restore(table, data['ids'], user_id=get_jwt_identity(), ip_address=request.remote_addr)
+    except Exception as e:
+        return jsonify({'error': 'Restore failed', 'details': str(e)}), 500
+    
+    restored_ids = set(restored)
+    return jsonify({
+        'message': f'{len(restored)} {table} restored',
+        'restored': [str(record_id) for record_id in restored],
+        # Not in the archive, or (comments) their recipe or parent is not live
+        'not_restored': [str(record_id) for record_id in data['ids'] if record_id not in restored_ids]
+    }), 200
+
+@admin_bp.route('/users/bulk-deactivate', methods=['POST'])
+@admin_required
+def admin_bulk_deactivate_users():
+    """Deactivate many users at once"""
+    return _bulk_update(
+        User, BulkModerationSchema(), User.id,
+        state=lambda data: [User.is_active == True],
+        values={'is_active': False},
+        action='ADMIN_DEACTIVATE'
+    )
+
 #@admin_bp.route('/audit-logs', methods=['GET'])
 #@admin_required
 # def get_audit_logs():
@@ -1,17 +1,30 @@
-from flask import Blueprint, request, jsonify
+import json
+import time
+
+from flask import Blueprint, request, jsonify, Response, stream_with_context, url_for, g
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy import desc
-from extensions import gemini_client, db
+from models import db
 from models.ai_request import AIRequest
-from utils.decorators import premium_required
+from services.ai_jobs import TokenStream, submit_generation
+from services.ai_usage import check_quota, record_usage
+from services.gemini_guard import gemini_guard
+from services.prompt_cache import prompt_cache
+from utils.decorators import premium_required, use_primary
 from utils.helpers import log_audit_event
 
 ai_bp = Blueprint('ai', __name__)
 
+# Longest an SSE client is kept waiting on a single generation
+STREAM_TIMEOUT = 180
+# Seconds between re-reads of the request row while streaming, in case the
+# token buffer lives in another process or has expired
+STATUS_CHECK_INTERVAL = 3
+
 @ai_bp.route('/generate-recipe', methods=['POST'])
 @premium_required
 def generate_recipe():
-    """Generate a recipe using Google Gemini (Premium feature)"""
+    """Submit a recipe generation job using Google Gemini (Premium feature)"""
     current_user_id = get_jwt_identity()
     data = request.get_json()
     prompt = data.get('prompt', '').strip()
@@ -19,55 +32,173 @@ def generate_recipe():
     if not prompt:
         return jsonify({'error': 'Prompt is required'}), 400
 
+    model_used = "gemini-pro"
+
+    # Near-identical prompts are answered from the cache unless the user asks for a fresh one
+    cached = None if data.get('fresh') else prompt_cache.get(prompt, model_used)
+    if cached:
+        ai_request = AIRequest(
+            prompt=prompt,
+            response=cached['response'],
+            model_used=model_used,
+            status='completed',
+            cache_hit=True,
+            token_used=0,
+            cost=0.0,
+            user_id=current_user_id
+        )
+        try:
+            db.session.add(ai_request)
+            db.session.flush()
+            record_usage(current_user_id, model_used, cache_hit=True)
+            log_audit_event(
+                user_id=current_user_id,
+                action='AI_REQUEST',
+                table_name='ai_requests',
+                record_id=ai_request.id,
+                changes={'cache_hit': True},
+                ip_address=request.remote_addr,
+                commit=False
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': 'AI request failed', 'details': str(e)}), 500
+
+        return jsonify({
+            'message': 'Recipe generated successfully',
+            'response': ai_request.response,
+            'request_details': ai_request.to_dict()
+        }), 200
+
+    # Turn away users already over their allowance; the job re-checks it,
+    # counting generations still running, right before calling Gemini
+    allowed, used, quota = check_quota(g.current_user)
+    if not allowed:
+        return jsonify({
+            'error': 'Monthly AI token quota exceeded',
+            'tokens_used': used,
+            'quota': quota
+        }), 429
+
     # Create AI request record
     ai_request = AIRequest(
         prompt=prompt,
-        model_used="gemini-pro",
+        model_used=model_used,
+        status='pending',
         user_id=current_user_id
     )
 
     try:
         db.session.add(ai_request)
-        db.session.flush()  # Get the ID
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'AI request failed', 'details': str(e)}), 500
 
-        # Google Gemini API call
-        response = gemini_client.generate_content(
-            f"You are a professional chef assistant. Create a detailed recipe for: {prompt}. "
-            f"Include ingredients, instructions, prep time, cook time, difficulty level."
-        )
+    # The model call happens on the ai queue, outside this request
+    submit_generation(ai_request, priority=gemini_guard.priority_for(g.current_user))
 
-        # Gemini returns a `text` property for the result
-        ai_response = response.text if hasattr(response, "text") else str(response)
+    return jsonify({
+        'message': 'Recipe generation queued',
+        'request_id': str(ai_request.id),
+        'status': ai_request.status,
+        'poll_url': url_for('ai.get_ai_request', request_id=ai_request.id),
+        'stream_url': url_for('ai.stream_ai_request', request_id=ai_request.id)
+    }), 202
 
-        ai_request.response = ai_response
-        ai_request.status = 'completed'
-        # Google doesn’t provide token usage or cost directly
-        ai_request.tokens_used = None
-        ai_request.cost = None
 
-        db.session.commit()
+@ai_bp.route('/requests/<request_id>', methods=['GET'])
+@jwt_required()
+@use_primary
+def get_ai_request(request_id):
+    """Poll the status and result of an AI request"""
+    current_user_id = get_jwt_identity()
 
-        # Log AI usage
-        log_audit_event(
-            user_id=current_user_id,
-            action='AI_REQUEST',
-            table_name='ai_requests',
-            record_id=ai_request.id,
-            ip_address=request.remote_addr
-        )
+    ai_request = AIRequest.query.filter_by(id=request_id, user_id=current_user_id).first()
+    if not ai_request:
+        return jsonify({'error': 'AI request not found'}), 404
 
-        return jsonify({
-            'message': 'Recipe generated successfully',
-            'response': ai_response,
-            'request_details': ai_request.to_dict()
-        }), 200
+    return jsonify({'request': ai_request.to_dict()}), 200
 
-    except Exception as e:
-        ai_request.status = 'failed'
-        ai_request.error_message = str(e)
-        db.session.commit()
 
-        return jsonify({'error': 'AI request failed', 'details': str(e)}), 500
+@ai_bp.route('/requests/<request_id>/stream', methods=['GET'])
+@jwt_required()
+@use_primary
+def stream_ai_request(request_id):
+    """Server-sent events with partial tokens as the model produces them"""
+    current_user_id = get_jwt_identity()
+
+    ai_request = AIRequest.query.filter_by(id=request_id, user_id=current_user_id).first()
+    if not ai_request:
+        return jsonify({'error': 'AI request not found'}), 404
+
+    ai_request_id = ai_request.id
+    status = ai_request.status
+    # Release the connection; the stream only re-reads the row now and then
+    db.session.close()
+
+    stream = TokenStream(request_id)
+
+    def sse(event, data):
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def settled():
+        """The request row once it is no longer pending, else None"""
+        row = db.session.query(
+            AIRequest.status, AIRequest.response, AIRequest.error_message
+        ).filter(AIRequest.id == ai_request_id).first()
+        db.session.close()
+        return row if row and row.status != 'pending' else None
+
+    def finish(row, sent):
+        # The token buffer is gone or never had this request; the row holds the result
+        remaining = (row.response or '')[sent:]
+        if remaining:
+            yield sse('token', {'text': remaining})
+        yield sse('done', {'status': row.status, 'error': row.error_message})
+
+    def generate():
+        if status != 'pending' and not stream.exists():
+            yield from finish(ai_request, 0)
+            return
+
+        cursor = 0
+        sent = 0
+        finished = None
+        deadline = time.monotonic() + STREAM_TIMEOUT
+        last_sent = time.monotonic()
+        next_check = time.monotonic() + STATUS_CHECK_INTERVAL
+        while time.monotonic() < deadline:
+            events = stream.read(cursor)
+            if not events:
+                # Settled on the last check and nothing arrived since
+                if finished:
+                    yield from finish(finished, sent)
+                    return
+                # Comment line keeps proxies from closing an idle stream
+                if time.monotonic() - last_sent > 15:
+                    last_sent = time.monotonic()
+                    yield ': keep-alive\n\n'
+            else:
+                cursor += len(events)
+                last_sent = time.monotonic()
+                for event in events:
+                    if event['type'] == 'done':
+                        yield sse('done', {'status': event['status'], 'error': event['error']})
+                        return
+                    sent += len(event['text'])
+                    yield sse('token', {'text': event['text']})
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + STATUS_CHECK_INTERVAL
+                finished = settled()
+        yield sse('done', {'status': 'pending', 'error': 'Stream timed out, poll the request instead'})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
 
 @ai_bp.route('/my-requests', methods=['GET'])
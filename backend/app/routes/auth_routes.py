@@ -6,7 +6,7 @@ from datetime import datetime
 from models import db
 from models.user import User
 from models.schemas import UserRegistrationSchema, UserLoginSchema
-from app.utils.helpers import log_audit_event
+from utils.helpers import log_audit_event
 
 auth_bp = Blueprint('auth',__name__)
 
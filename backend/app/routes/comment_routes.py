@@ -9,6 +9,7 @@ from models.recipe import Recipe
 from models.schemas import CommentCreateSchema
 from sqlalchemy import desc
 from utils.helpers import log_audit_event
+from utils.serializers import comment_dicts
 
 comment_bp = Blueprint('comments', __name__)
 
@@ -33,7 +34,7 @@ def get_recipe_comments(recipe_id):
     )
     
     return jsonify({
-        'comments': [comment.to_dict(include_replies=True) for comment in comments.items],
+        'comments': comment_dicts(comments.items, include_replies=True),
         'pagination': {
             'page': page,
             'pages': comments.pages,
@@ -152,6 +153,7 @@ def delete_comment(comment_id):
     
     try:
         comment.is_deleted = True
+        comment.deleted_at = datetime.utcnow()
         db.session.commit()
         
         # Log deletion
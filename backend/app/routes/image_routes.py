@@ -0,0 +1,139 @@
+import mimetypes
+import os
+import re
+
+from flask import Blueprint, Response, current_app, jsonify, request, send_file
+from werkzeug.security import safe_join
+
+from services.image_pipeline import normalized_ext
+from services.thumbnails import thumbnail_cache
+
+image_bp = Blueprint('images', __name__)
+
+# <sha256>.<ext> or <sha256>_<width>.<ext>: the bytes behind these names never change
+CONTENT_ADDRESSED = re.compile(r'^[0-9a-f]{64}(_\d+)?\.[a-z0-9]+$')
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MUTABLE_MAX_AGE = 3600
+
+
+def _accepts_webp():
+    """Only an explicit image/webp counts; */* is not a promise to decode it"""
+    return any(value == 'image/webp' and quality > 0 for value, quality in request.accept_mimetypes)
+
+
+def resolve_image(name, negotiate=True):
+    """
+    Absolute path of the file to serve for `name`, preferring the WebP
+    sibling when the client accepts it. None if the name is not servable.
+    """
+    folder = name.split('/', 1)[0]
+    if folder not in current_app.config['IMAGE_SERVE_FOLDERS']:
+        return None
+
+    static_root = os.path.join(current_app.root_path, 'static')
+    path = safe_join(static_root, name)
+    if path is None:
+        return None
+
+    stem, ext = os.path.splitext(path)
+    if negotiate and ext != '.webp' and _accepts_webp() and os.path.isfile(f"{stem}.webp"):
+        return f"{stem}.webp"
+    if os.path.isfile(path):
+        return path
+    return None
+
+
+def image_response(path, immutable=None, root=None, accel_prefix=None):
+    """
+    Serve an image file with validators and cache headers.
+
+    IMAGE_SENDFILE_MODE picks the transfer: 'sendfile' streams through the
+    WSGI file wrapper (zero-copy under gunicorn and friends), 'x-accel' and
+    'x-sendfile' hand the file to a fronting nginx/Apache instead. For
+    x-accel, `path` is mapped from `root` (default static/) to the internal
+    `accel_prefix` location (default IMAGE_ACCEL_PREFIX).
+    """
+    config = current_app.config
+    filename = os.path.basename(path)
+    if immutable is None:
+        immutable = bool(CONTENT_ADDRESSED.match(filename))
+    mode = config['IMAGE_SENDFILE_MODE']
+
+    if mode == 'sendfile':
+        response = send_file(
+            path,
+            conditional=True,
+            etag=filename if immutable else True,
+            max_age=IMMUTABLE_MAX_AGE if immutable else MUTABLE_MAX_AGE
+        )
+    else:
+        root = root or os.path.join(current_app.root_path, 'static')
+        accel_prefix = accel_prefix or config['IMAGE_ACCEL_PREFIX']
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        if mode == 'x-accel':
+            relative = os.path.relpath(path, root)
+            response.headers['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{relative}"
+        else:
+            response.headers['X-Sendfile'] = path
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE if immutable else MUTABLE_MAX_AGE
+
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    response.vary.add('Accept')
+    return response
+
+
+def _thumbnail_params():
+    """
+    (width, height, fit) from the query string, None when no resize was
+    asked for. Raises ValueError for sizes or fits outside the whitelist.
+    """
+    if not any(arg in request.args for arg in ('w', 'h', 'fit')):
+        return None
+
+    config = current_app.config
+    allowed = config['IMAGE_THUMB_DIMENSIONS']
+    width = request.args.get('w', type=int)
+    height = request.args.get('h', type=int)
+    fit = request.args.get('fit', 'contain')
+
+    if width is None and height is None:
+        raise ValueError("w or h is required")
+    for value in (width, height):
+        if value is not None and value not in allowed:
+            raise ValueError(f"Sizes must be one of: {', '.join(map(str, allowed))}")
+    if fit not in config['IMAGE_THUMB_FITS']:
+        raise ValueError(f"fit must be one of: {', '.join(config['IMAGE_THUMB_FITS'])}")
+    return width, height, fit
+
+
+@image_bp.route('/<path:name>', methods=['GET', 'HEAD'])
+def serve_image(name):
+    """Serve an uploaded image, negotiating WebP through Accept and resizing on ?w=&h=&fit="""
+    try:
+        params = _thumbnail_params()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    path = resolve_image(name, negotiate=params is None)
+    if not path:
+        return jsonify({'error': 'Image not found'}), 404
+    if params is None:
+        return image_response(path)
+    
+    width, height, fit = params
+    fmt = 'webp' if _accepts_webp() else normalized_ext(path)
+    try:
+        thumbnail = thumbnail_cache.get(path, width, height, fit, fmt)
+    except Exception as e:
+        current_app.logger.error(f"Thumbnail render failed for {name} : {e}")
+        return jsonify({'error': 'Failed to resize image', 'details': str(e)}), 500
+    # Entries are keyed by the source's identity, so they inherit its immutability
+    return image_response(
+        thumbnail,
+        immutable=bool(CONTENT_ADDRESSED.match(os.path.basename(path))),
+        root=thumbnail_cache.directory(),
+        accel_prefix=current_app.config['IMAGE_THUMB_ACCEL_PREFIX']
+    )
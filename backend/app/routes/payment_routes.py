@@ -1,27 +1,23 @@
+import json
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
 import razorpay
-import os
 
 from models import db
 from models.payment import Payment
 from models.user import User
 from models.schemas import PaymentCreateSchema
 from sqlalchemy import desc
+from services.payment_events import verify_webhook_signature, store_event, apply_completion
 from utils.helpers import log_audit_event
+from extensions import get_razorpay_client
+from utils.decorators import use_primary
+from utils.metrics import track_external
 
 payment_bp = Blueprint('payments', __name__)
 
-# Initialize Razorpay client
-razorpay_client = razorpay.Client(
-    auth=(
-        os.environ.get('RAZORPAY_KEY_ID'),
-        os.environ.get('RAZORPAY_KEY_SECRET')
-    )
-)
-
 @payment_bp.route('/create-order', methods=['POST'])
 @jwt_required()
 def create_payment_order():
@@ -34,6 +30,10 @@ def create_payment_order():
     except ValidationError as err:
         return jsonify({'error': 'Validation failed', 'details': err.messages}), 400
     
+    razorpay_client = get_razorpay_client()
+    if not razorpay_client:
+        return jsonify({'error': 'Payment provider unavailable'}), 503
+    
     try:
         # Create Razorpay order
         order_data = {
@@ -42,7 +42,8 @@ def create_payment_order():
             'receipt': f'receipt_{current_user_id}_{int(datetime.utcnow().timestamp())}'
         }
         
-        razorpay_order = razorpay_client.order.create(data=order_data)
+        with track_external('razorpay', 'order.create'):
+            razorpay_order = razorpay_client.order.create(data=order_data)
         
         # Create payment record
         payment = Payment(
@@ -96,6 +97,17 @@ def verify_payment():
     if not payment:
         return jsonify({'error': 'Payment record not found'}), 404
     
+    # Client retries (or a webhook that got there first) are no-ops
+    if payment.status == 'completed':
+        return jsonify({
+            'message': 'Payment already verified',
+            'payment': payment.to_dict()
+        }), 200
+    
+    razorpay_client = get_razorpay_client()
+    if not razorpay_client:
+        return jsonify({'error': 'Payment provider unavailable'}), 503
+    
     try:
         # Verify payment signature
         razorpay_client.utility.verify_payment_signature({
@@ -104,27 +116,22 @@ def verify_payment():
             'razorpay_signature': razorpay_signature
         })
         
-        # Update payment status
-        payment.status = 'completed'
-        payment.payment_id = razorpay_payment_id
-        
-        # If this is a premium payment, upgrade user
-        if payment.description and 'premium' in payment.description.lower():
-            user = User.query.get(current_user_id)
-            user.is_premium = True
+        # Update payment status and upgrade premium purchases
+        apply_completion(payment, razorpay_payment_id)
         
-        db.session.commit()
-        
-        # Log payment completion
+        # Log payment completion in the same transaction
         log_audit_event(
             user_id=current_user_id,
             action='UPDATE',
             table_name='payments',
             record_id=payment.id,
             changes={'status': 'completed'},
-            ip_address=request.remote_addr
+            ip_address=request.remote_addr,
+            commit=False
         )
         
+        db.session.commit()
+        
         return jsonify({
             'message': 'Payment verified successfully',
             'payment': payment.to_dict()
@@ -140,8 +147,38 @@ def verify_payment():
         db.session.rollback()
         return jsonify({'error': 'Payment verification failed', 'details': str(e)}), 500
 
+@payment_bp.route('/webhook', methods=['POST'])
+def payment_webhook():
+    """
+    Receive Razorpay webhooks. The event is verified, stored once per event id
+    and queued; processing happens on the payments queue, in order per order id.
+    """
+    body = request.get_data(cache=False)
+    signature = request.headers.get('X-Razorpay-Signature')
+    
+    if not verify_webhook_signature(body, signature, current_app.config.get('RAZORPAY_WEBHOOK_SECRET')):
+        return jsonify({'error': 'Invalid webhook signature'}), 400
+    
+    # Parse the bytes that were verified; the body was read without caching
+    try:
+        event = json.loads(body)
+    except ValueError:
+        event = None
+    event_id = request.headers.get('X-Razorpay-Event-Id')
+    if not isinstance(event, dict) or not event or not event_id:
+        return jsonify({'error': 'Malformed webhook'}), 400
+    
+    try:
+        stored = store_event(event_id, event)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Webhook storage failed', 'details': str(e)}), 500
+    
+    return jsonify({'status': 'accepted' if stored else 'duplicate'}), 200
+
 @payment_bp.route('/my-payments', methods=['GET'])
 @jwt_required()
+@use_primary
 def get_my_payments():
     """Get current user's payment history"""
     current_user_id = get_jwt_identity()
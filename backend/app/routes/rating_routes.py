@@ -9,6 +9,7 @@ from models.ratings import Rating
 from models.recipe import Recipe
 from models.schemas import RatingCreateSchema
 from utils.helpers import log_audit_event
+from utils.serializers import rating_dicts
 
 rating_bp = Blueprint('ratings', __name__)
 
@@ -115,7 +116,7 @@ def get_recipe_ratings(recipe_id):
         rating_distribution[rating.score] += 1
     
     return jsonify({
-        'ratings': [rating.to_dict() for rating in ratings.items],
+        'ratings': rating_dicts(ratings.items),
         'statistics': {
             'average_rating': round(avg_rating, 2),
             'total_ratings': len(all_ratings),
@@ -1,19 +1,26 @@
-from flask import Blueprint, request, jsonify
+import os
+import uuid
+from datetime import datetime
+
+from flask import Blueprint, request, jsonify, current_app, url_for
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, func, update
 
 from models import db
 from models.recipe import Recipe
 from models.user import User
 from models.tag import Tag
 from models.schemas import RecipeCreateSchema, RecipeUpdateSchema
-from app.utils.helpers import log_audit_event
+from utils.helpers import log_audit_event, sniff_image_type, IMAGE_SNIFF_BYTES
+from services.image_pipeline import get_pool, process_image
+from services.storage import get_storage, UploadError, UploadGone, OffsetMismatch, CHUNK_SIZE
+from utils.serializers import recipe_dicts
 
 recipe_bp = Blueprint('recipe',__name__)
 
 @recipe_bp.route('',methods=['GET'])
-def get_recipe():
+def get_recipes():
     """Get all recipes with pagination and filtering"""
     page = request.args.get('page',1,type=int)
     per_page = min(request.args.get('per_page',10,type=int),100)
@@ -56,7 +63,7 @@ def get_recipe():
     )
     
     return jsonify({
-        'recipes': [recipe.to_dict(include_relations=True) for recipe in recipes.items],
+        'recipes': recipe_dicts(recipes.items, include_relations=True),
         'pagination': {
             'page': page,
             'pages': recipes.pages,
@@ -74,11 +81,15 @@ def get_recipe(recipe_id):
     if not recipe:
         return jsonify({'error': 'Recipe not found'}), 404
     
-    # Increment view count
-    recipe.view_count += 1
+    # Increment view count in one statement on the primary; the row above may come from a replica
+    db.session.execute(
+        update(Recipe).where(Recipe.id == recipe.id).values(
+            view_count=func.coalesce(Recipe.view_count, 0) + 1
+        ).execution_options(synchronize_session=False)
+    )
     db.session.commit()
     
-    return jsonify({'recipe': recipe.to_dict(include_relations=True)}), 200
+    return jsonify({'recipe': recipe_dicts([recipe], include_relations=True)[0]}), 200
 
 @recipe_bp.route('', methods=['POST'])
 @jwt_required()
@@ -213,6 +224,7 @@ def delete_recipe(recipe_id):
     
     try:
         recipe.is_deleted = True
+        recipe.deleted_at = datetime.utcnow()
         db.session.commit()
         
         # Log deletion
@@ -246,7 +258,7 @@ def get_my_recipes():
     )
     
     return jsonify({
-        'recipes': [recipe.to_dict(include_relations=True) for recipe in recipes.items],
+        'recipes': recipe_dicts(recipes.items, include_relations=True),
         'pagination': {
             'page': page,
             'pages': recipes.pages,
@@ -256,4 +268,181 @@ def get_my_recipes():
             'has_prev': recipes.has_prev
         }
     }), 200
-            
\ No newline at end of file
+
+def _get_owned_recipe(recipe_id, current_user_id):
+    """Recipe owned by the current user, or an error response"""
+    recipe = Recipe.query.filter_by(id=recipe_id, is_deleted=False).first()
+    if not recipe:
+        return None, (jsonify({'error': 'Recipe not found'}), 404)
+    if str(recipe.author_id) != current_user_id:
+        return None, (jsonify({'error': 'Not authorized to update this recipe'}), 403)
+    return recipe, None
+
+def _get_upload(recipe_id, upload_id, current_user_id):
+    """Upload session metadata belonging to this user and recipe"""
+    try:
+        upload_id = uuid.UUID(upload_id).hex
+    except ValueError:
+        return None, None
+    meta = get_storage().upload_meta(upload_id)
+    if not meta or meta['recipe_id'] != str(recipe_id) or meta['user_id'] != current_user_id:
+        return upload_id, None
+    return upload_id, meta
+
+def _upload_gone(upload_id):
+    """The upload's data was cleaned up or already finalized; drop what is left and say so"""
+    get_storage().delete_upload(upload_id)
+    return jsonify({'error': 'Upload expired, start a new one'}), 410
+
+def _read_body(sniffed=None):
+    """
+    Yield the request body in fixed-size chunks. When `sniffed` is given this
+    is the start of the file: its first bytes are checked against the image
+    signatures before anything is written, and the type is stored in it.
+    """
+    stream = request.stream
+    if sniffed is not None:
+        head = b''
+        while len(head) < IMAGE_SNIFF_BYTES:
+            chunk = stream.read(IMAGE_SNIFF_BYTES - len(head))
+            if not chunk:
+                break
+            head += chunk
+        sniffed['ext'] = sniff_image_type(head)
+        if not sniffed['ext']:
+            raise UploadError('File is not a supported image type')
+        yield head
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+@recipe_bp.route('/<recipe_id>/image/uploads', methods=['POST'])
+@jwt_required()
+def create_recipe_image_upload(recipe_id):
+    """Start a resumable recipe image upload"""
+    current_user_id = get_jwt_identity()
+    recipe, error = _get_owned_recipe(recipe_id, current_user_id)
+    if error:
+        return error
+    
+    data = request.get_json() or {}
+    size = data.get('size')
+    max_bytes = current_app.config['RECIPE_IMAGE_MAX_BYTES']
+    if not isinstance(size, int) or not 0 < size <= max_bytes:
+        return jsonify({'error': f'size must be between 1 and {max_bytes} bytes'}), 400
+    
+    upload_id = uuid.uuid4().hex
+    get_storage().create_upload(upload_id, {
+        'recipe_id': str(recipe.id),
+        'user_id': current_user_id,
+        'size': size,
+        'ext': None
+    })
+    upload_url = url_for('recipe.upload_recipe_image_chunk', recipe_id=recipe.id, upload_id=upload_id)
+    
+    return jsonify({
+        'upload_id': upload_id,
+        'offset': 0,
+        'size': size,
+        'upload_url': upload_url
+    }), 201, {'Location': upload_url, 'Upload-Offset': '0'}
+
+@recipe_bp.route('/<recipe_id>/image/uploads/<upload_id>', methods=['GET', 'HEAD'])
+@jwt_required()
+def get_recipe_image_upload(recipe_id, upload_id):
+    """Current offset of a resumable upload"""
+    current_user_id = get_jwt_identity()
+    upload_id, meta = _get_upload(recipe_id, upload_id, current_user_id)
+    if not meta:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    try:
+        offset = get_storage().upload_offset(upload_id)
+    except UploadGone:
+        return _upload_gone(upload_id)
+    return jsonify({
+        'upload_id': upload_id,
+        'offset': offset,
+        'size': meta['size']
+    }), 200, {'Upload-Offset': str(offset), 'Cache-Control': 'no-store'}
+
+@recipe_bp.route('/<recipe_id>/image/uploads/<upload_id>', methods=['PATCH'])
+@jwt_required()
+def upload_recipe_image_chunk(recipe_id, upload_id):
+    """
+    Append a chunk at the offset given in the Upload-Offset header. The body
+    is streamed to storage, so memory use doesn't grow with chunk size. The
+    upload is finalized when the last byte arrives.
+    """
+    current_user_id = get_jwt_identity()
+    upload_id, meta = _get_upload(recipe_id, upload_id, current_user_id)
+    if not meta:
+        return jsonify({'error': 'Upload not found'}), 404
+    
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+    
+    storage = get_storage()
+    size = meta['size']
+    sniffed = {} if offset == 0 else None
+    try:
+        new_offset = storage.append(upload_id, offset, _read_body(sniffed), size - offset)
+    except OffsetMismatch as err:
+        return jsonify({'error': str(err), 'offset': err.expected}), 409, {'Upload-Offset': str(err.expected)}
+    except UploadGone:
+        return _upload_gone(upload_id)
+    except UploadError as err:
+        return jsonify({'error': str(err)}), 400
+    finally:
+        # Remember the type even if the connection drops mid-chunk
+        if sniffed and sniffed.get('ext'):
+            meta = storage.update_meta(upload_id, ext=sniffed['ext'])
+    
+    if new_offset < size:
+        return jsonify({'upload_id': upload_id, 'offset': new_offset, 'size': size}), 200, \
+            {'Upload-Offset': str(new_offset)}
+    
+    recipe, error = _get_owned_recipe(recipe_id, current_user_id)
+    if error:
+        storage.delete_upload(upload_id)
+        return error
+    
+    try:
+        name = storage.finalize(upload_id, meta['ext'])
+    except UploadGone:
+        return _upload_gone(upload_id)
+    
+    # Resized variants are produced in the background for local storage
+    path = storage.local_path(name)
+    if path:
+        digest, ext = os.path.splitext(name)
+        get_pool().submit(
+            process_image, path, os.path.dirname(path), digest, ext.lstrip('.'),
+            current_app.config['IMAGE_VARIANT_WIDTHS'], False
+        )
+    
+    try:
+        recipe.image_url = storage.url(name)
+        log_audit_event(
+            user_id=current_user_id,
+            action='UPDATE',
+            table_name='recipes',
+            record_id=recipe.id,
+            changes={'image_url': recipe.image_url},
+            ip_address=request.remote_addr,
+            commit=False
+        )
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Recipe image update failed', 'details': str(e)}), 500
+    
+    return jsonify({
+        'message': 'Recipe image uploaded successfully',
+        'image_url': recipe.image_url,
+        'offset': new_offset,
+        'size': size
+    }), 200, {'Upload-Offset': str(new_offset)}
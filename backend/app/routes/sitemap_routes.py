@@ -0,0 +1,49 @@
+import os
+
+from flask import Blueprint, jsonify, send_file
+from werkzeug.security import safe_join
+
+from services.sitemaps import FEEDS, INDEX_FILE, SHARD_NAME, etag_for, output_folder
+
+sitemap_bp = Blueprint('sitemaps', __name__)
+
+# Regenerated files keep their name, so clients revalidate with the ETag rather than cache for long
+MAX_AGE = 3600
+SHARD_PREFIX = SHARD_NAME.split('{')[0]
+
+
+def _serve(name, mimetype):
+    path = safe_join(output_folder(), name)
+    if path is None or not os.path.isfile(path):
+        return jsonify({'error': 'Not found'}), 404
+    response = send_file(
+        path,
+        mimetype=mimetype,
+        conditional=True,
+        etag=etag_for(name) or True,
+        max_age=MAX_AGE
+    )
+    response.cache_control.public = True
+    return response
+
+
+@sitemap_bp.route('/sitemap.xml', methods=['GET', 'HEAD'])
+def sitemap_index():
+    """Sitemap index listing the recipe sitemap shards"""
+    return _serve(INDEX_FILE, 'application/xml')
+
+
+@sitemap_bp.route('/sitemaps/<name>', methods=['GET', 'HEAD'])
+def sitemap_shard(name):
+    """One gzip-compressed sitemap shard, served as stored"""
+    if not name.startswith(SHARD_PREFIX):
+        return jsonify({'error': 'Not found'}), 404
+    return _serve(name, 'application/gzip')
+
+
+@sitemap_bp.route('/feeds/<name>.atom', methods=['GET', 'HEAD'])
+def feed(name):
+    """Atom feed of new or featured recipes"""
+    if name not in FEEDS:
+        return jsonify({'error': 'Not found'}), 404
+    return _serve(f"{name}.atom", 'application/atom+xml')
@@ -5,6 +5,7 @@ from models import db
 from models.tag import Tag
 from models.recipe import Recipe
 from sqlalchemy import desc
+from utils.serializers import recipe_dicts, tag_dicts
 
 tag_bp = Blueprint('tags', __name__)
 
@@ -22,7 +23,7 @@ def get_tags():
     tags = query.order_by(desc(Tag.usage_count)).limit(limit).all()
     
     return jsonify({
-        'tags': [tag.to_dict() for tag in tags],
+        'tags': tag_dicts(tags),
         'total': len(tags)
     }), 200
 
@@ -36,7 +37,7 @@ def get_popular_tags():
     ).limit(limit).all()
     
     return jsonify({
-        'tags': [tag.to_dict() for tag in tags],
+        'tags': tag_dicts(tags),
         'total': len(tags)
     }), 200
 
@@ -59,7 +60,7 @@ def get_tag_recipes(tag_id):
     
     return jsonify({
         'tag': tag.to_dict(),
-        'recipes': [recipe.to_dict(include_relations=True) for recipe in recipes.items],
+        'recipes': recipe_dicts(recipes.items, include_relations=True),
         'pagination': {
             'page': page,
             'pages': recipes.pages,
@@ -2,12 +2,15 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from marshmallow import ValidationError
 from datetime import datetime
+from functools import partial
 
 from models import db
 from models.user import User
 from models.recipe import Recipe
 from sqlalchemy import desc
-from utils.helpers import save_picture, allowed_file, log_audit_event
+from services.image_pipeline import discard_staged, stage_image, submit_staged
+from utils.helpers import allowed_file, log_audit_event, sniff_image_type, IMAGE_SNIFF_BYTES
+from utils.serializers import recipe_dicts
 
 user_bp = Blueprint('users', __name__)
 
@@ -98,22 +101,43 @@ def upload_profile_image():
     if file.filename == '' or not allowed_file(file.filename):
         return jsonify({'error': 'Invalid file type'}), 400
     
+    # The stored type comes from the file's first bytes, not its name
+    ext = sniff_image_type(file.stream.read(IMAGE_SNIFF_BYTES))
+    file.stream.seek(0)
+    if not ext:
+        return jsonify({'error': 'File is not a supported image type'}), 400
+    
+    staged = None
     try:
-        # Save the image
-        filename = save_picture(file, 'profile_pics')
+        image_url, staged = stage_image(file, 'profile_pics', ext)
         
         # Update user profile
-        user.profile_image_url = f'/static/profile_pics/{filename}'
+        user_id, previous_url = user.id, user.profile_image_url
+        user.profile_image_url = image_url
         db.session.commit()
-        
-        return jsonify({
-            'message': 'Profile image updated successfully',
-            'image_url': user.profile_image_url
-        }), 200
-        
     except Exception as e:
         db.session.rollback()
+        discard_staged(staged)
         return jsonify({'error': 'Image upload failed', 'details': str(e)}), 500
+    
+    if staged:
+        # Resizing happens in the image process pool; the URL is final but
+        # may 404 briefly while the variants are written
+        submit_staged(staged, on_failure=partial(_restore_profile_image, user_id, image_url, previous_url))
+    
+    status = 'pending' if staged else 'ready'
+    return jsonify({
+        'message': 'Profile image updated successfully',
+        'image_url': image_url,
+        'status': status
+    }), 202 if status == 'pending' else 200
+
+def _restore_profile_image(user_id, failed_url, previous_url, error):
+    """The variants will never exist; go back to the previous image unless another upload replaced it"""
+    User.query.filter_by(id=user_id, profile_image_url=failed_url).update(
+        {'profile_image_url': previous_url}, synchronize_session=False
+    )
+    db.session.commit()
 
 @user_bp.route('/<user_id>', methods=['GET'])
 def get_user_public_profile(user_id):
@@ -152,7 +176,7 @@ def get_user_recipes(user_id):
     )
     
     return jsonify({
-        'recipes': [recipe.to_dict(include_relations=True) for recipe in recipes.items],
+        'recipes': recipe_dicts(recipes.items, include_relations=True),
         'user': user.to_dict(include_sensitive=False),
         'pagination': {
             'page': page,
@@ -0,0 +1,235 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import current_app
+
+from extensions import get_gemini_client, get_redis_client
+from models import db
+from models.ai_request import AIRequest
+from models.user import User
+from services.ai_usage import (
+    compute_cost, estimate_tokens, extract_usage, record_usage, release_tokens, reserve_tokens, utc_today
+)
+from services.gemini_guard import gemini_guard, UpstreamUnavailable
+from services.prompt_cache import prompt_cache
+from services.task_queue import TaskQueue
+from utils.helpers import log_audit_event
+from utils.metrics import track_external
+
+logger = logging.getLogger(__name__)
+
+# Generations need no ordering; each worker runs as many as Gemini may take at once
+ai_queue = TaskQueue('ai', max_attempts=1, consumers='GEMINI_MAX_CONCURRENCY')
+
+STREAM_TTL = 600
+# Buffers kept in memory when Redis is unavailable
+LOCAL_STREAM_LIMIT = 1000
+
+
+def build_prompt(prompt):
+    return (
+        f"You are a professional chef assistant. Create a detailed recipe for: {prompt}. "
+        f"Include ingredients, instructions, prep time, cook time, difficulty level."
+    )
+
+
+def get_model():
+    """The configured Gemini model, or the offline fake when GEMINI_FAKE is set"""
+    if current_app.config.get('GEMINI_FAKE'):
+        from services.gemini_fake import FakeGeminiModel
+        model = current_app.extensions.get('gemini_fake')
+        if model is None:
+            model = current_app.extensions['gemini_fake'] = FakeGeminiModel()
+        return model
+    return get_gemini_client()
+
+
+class _LocalStreams:
+    """In-process stream buffers for the no-Redis fallback"""
+
+    def __init__(self):
+        self.buffers = OrderedDict()
+        self.condition = threading.Condition()
+
+    def push(self, request_id, event):
+        with self.condition:
+            self.buffers.setdefault(request_id, []).append(event)
+            self.buffers.move_to_end(request_id)
+            while len(self.buffers) > LOCAL_STREAM_LIMIT:
+                self.buffers.popitem(last=False)
+            self.condition.notify_all()
+
+    def read(self, request_id, start, timeout):
+        with self.condition:
+            events = self.buffers.get(request_id, [])
+            if len(events) <= start:
+                self.condition.wait(timeout)
+                events = self.buffers.get(request_id, [])
+            return events[start:]
+
+    def exists(self, request_id):
+        return request_id in self.buffers
+
+
+_local_streams = _LocalStreams()
+
+
+class TokenStream:
+    """Partial output of one generation, readable while it is being produced"""
+
+    def __init__(self, request_id):
+        self.request_id = str(request_id)
+        self.key = f"ai:stream:{self.request_id}"
+
+    def push(self, event):
+        message = json.dumps(event)
+        redis_client = get_redis_client()
+        if redis_client:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.rpush(self.key, message)
+            pipe.expire(self.key, STREAM_TTL)
+            pipe.execute()
+        else:
+            _local_streams.push(self.request_id, message)
+
+    def token(self, text):
+        self.push({'type': 'token', 'text': text})
+
+    def finish(self, status, error=None):
+        self.push({'type': 'done', 'status': status, 'error': error})
+
+    def exists(self):
+        redis_client = get_redis_client()
+        if redis_client:
+            return bool(redis_client.exists(self.key))
+        return _local_streams.exists(self.request_id)
+
+    def read(self, start, timeout=0.25):
+        """Events from index `start` on; waits briefly when there are none yet"""
+        redis_client = get_redis_client()
+        if redis_client:
+            events = redis_client.lrange(self.key, start, -1)
+            if not events:
+                time.sleep(timeout)
+            return [json.loads(event) for event in events]
+        return [json.loads(event) for event in _local_streams.read(self.request_id, start, timeout)]
+
+
+def submit_generation(ai_request, priority=0):
+    """Queue a committed AIRequest for generation"""
+    ai_queue.enqueue(
+        'generate_recipe_job',
+        {'request_id': str(ai_request.id), 'priority': priority}
+    )
+
+
+def _mark_finished(request_id, status, error=None, queue_wait_ms=None, upstream_latency_ms=None):
+    ai_request = db.session.get(AIRequest, uuid.UUID(request_id))
+    ai_request.status = status
+    ai_request.error_message = error
+    ai_request.queue_wait_ms = queue_wait_ms
+    ai_request.upstream_latency_ms = upstream_latency_ms
+    return ai_request
+
+
+@ai_queue.task
+def generate_recipe_job(request_id, priority=0):
+    """Run one generation outside the request cycle, streaming partial tokens"""
+    ai_request = db.session.get(AIRequest, uuid.UUID(request_id))
+    if not ai_request or ai_request.status != 'pending':
+        return
+
+    prompt = ai_request.prompt
+    model_used = ai_request.model_used
+    user_id = ai_request.user_id
+    stream = TokenStream(request_id)
+
+    # Submission only saw finished generations; hold this one's share of the
+    # allowance before anything is sent upstream
+    day = utc_today()
+    reserved = estimate_tokens(build_prompt(prompt)) + current_app.config['AI_QUOTA_RESERVE_TOKENS']
+    allowed, used, quota = reserve_tokens(db.session.get(User, user_id), model_used, reserved, day)
+    if not allowed:
+        error = 'Monthly AI token quota exceeded'
+        _mark_finished(request_id, 'failed', error)
+        db.session.commit()
+        stream.finish('failed', error)
+        return
+    if quota is None:
+        reserved = 0
+    # Release the pooled connection before the slow upstream call
+    db.session.commit()
+    parts = []
+    queue_wait_ms = None
+    latency_ms = None
+    response = None
+    try:
+        with gemini_guard.slot(priority) as slot:
+            queue_wait_ms = slot.wait_ms
+            started = time.monotonic()
+            try:
+                with track_external('gemini', 'generate_content'):
+                    response = get_model().generate_content(
+                        build_prompt(prompt),
+                        stream=True,
+                        request_options={'timeout': current_app.config['GEMINI_CALL_TIMEOUT']}
+                    )
+                    for chunk in response:
+                        slot.check_deadline()
+                        text = getattr(chunk, 'text', '') or ''
+                        if text:
+                            parts.append(text)
+                            stream.token(text)
+            finally:
+                latency_ms = (time.monotonic() - started) * 1000
+        gemini_guard.record(True)
+    except UpstreamUnavailable as e:
+        # Circuit open, queue full/timed out, or the call ran past its deadline
+        if latency_ms is not None:
+            gemini_guard.record(False)
+        logger.warning(f"AI generation timed out for {request_id} : {e}")
+        _mark_finished(request_id, 'timeout', str(e), queue_wait_ms, latency_ms)
+        if reserved:
+            release_tokens(user_id, model_used, reserved, day)
+        db.session.commit()
+        stream.finish('timeout', str(e))
+        return
+    except Exception as e:
+        gemini_guard.record(False)
+        logger.error(f"AI generation failed for {request_id} : {e}")
+        _mark_finished(request_id, 'failed', str(e), queue_wait_ms, latency_ms)
+        if reserved:
+            release_tokens(user_id, model_used, reserved, day)
+        db.session.commit()
+        stream.finish('failed', str(e))
+        return
+
+    result = ''.join(parts)
+    prompt_cache.put(prompt, model_used, result, latency_ms)
+
+    prompt_tokens, completion_tokens, estimated = extract_usage(response, build_prompt(prompt), result)
+    cost = compute_cost(model_used, prompt_tokens, completion_tokens)
+
+    ai_request = _mark_finished(request_id, 'completed', None, queue_wait_ms, latency_ms)
+    ai_request.response = result
+    ai_request.prompt_tokens = prompt_tokens
+    ai_request.completion_tokens = completion_tokens
+    ai_request.token_used = prompt_tokens + completion_tokens
+    ai_request.tokens_estimated = estimated
+    ai_request.cost = cost
+    record_usage(user_id, model_used, prompt_tokens, completion_tokens, cost)
+    if reserved:
+        release_tokens(user_id, model_used, reserved, day)
+    log_audit_event(
+        user_id=user_id,
+        action='AI_REQUEST',
+        table_name='ai_requests',
+        record_id=ai_request.id,
+        commit=False
+    )
+    db.session.commit()
+    stream.finish('completed')
@@ -0,0 +1,133 @@
+import math
+import re
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from models import db
+from models.ai_usage import AIUsageRollup
+from models.user import User
+
+# Words, numbers and individual punctuation marks, roughly how BPE tokenizers split text
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+# Long words are split into sub-word pieces of about this many characters
+_SUBWORD_CHARS = 4
+
+
+def estimate_tokens(text):
+    """Local token estimate for when the model reports no usage metadata"""
+    if not text:
+        return 0
+    return sum(
+        max(1, math.ceil(len(piece) / _SUBWORD_CHARS)) if len(piece) > 6 else 1
+        for piece in _TOKEN_PATTERN.findall(text)
+    )
+
+
+def extract_usage(response, prompt_text, output_text):
+    """
+    (prompt_tokens, completion_tokens, estimated) for a finished generation,
+    from Gemini's usage_metadata when present and the local estimate otherwise.
+    """
+    usage = getattr(response, 'usage_metadata', None)
+    prompt_tokens = getattr(usage, 'prompt_token_count', None) if usage else None
+    completion_tokens = getattr(usage, 'candidates_token_count', None) if usage else None
+
+    if prompt_tokens is not None and completion_tokens is not None:
+        return prompt_tokens, completion_tokens, False
+    return estimate_tokens(prompt_text), estimate_tokens(output_text), True
+
+
+def compute_cost(model, prompt_tokens, completion_tokens):
+    """Cost from AI_PRICE_TABLE, priced per 1K input and output tokens"""
+    table = current_app.config['AI_PRICE_TABLE']
+    prices = table.get(model) or table.get('default') or {}
+    return round(
+        prompt_tokens / 1000 * prices.get('input', 0.0)
+        + completion_tokens / 1000 * prices.get('output', 0.0),
+        8
+    )
+
+
+def utc_today():
+    """Rollup days are UTC calendar days, like every other timestamp in the database"""
+    return datetime.utcnow().date()
+
+
+def record_usage(user_id, model, prompt_tokens=0, completion_tokens=0, cost=0.0, cache_hit=False, day=None,
+                 requests=1):
+    """Add one request to the user's daily rollup; runs in the caller's transaction"""
+    stmt = insert(AIUsageRollup).values(
+        user_id=user_id,
+        day=day or utc_today(),
+        model_used=model,
+        requests=requests,
+        cache_hits=1 if cache_hit else 0,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        cost=cost
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['user_id', 'day', 'model_used'],
+        set_={
+            'requests': AIUsageRollup.requests + stmt.excluded.requests,
+            'cache_hits': AIUsageRollup.cache_hits + stmt.excluded.cache_hits,
+            'prompt_tokens': AIUsageRollup.prompt_tokens + stmt.excluded.prompt_tokens,
+            'completion_tokens': AIUsageRollup.completion_tokens + stmt.excluded.completion_tokens,
+            'cost': AIUsageRollup.cost + stmt.excluded.cost
+        }
+    )
+    db.session.execute(stmt)
+
+
+def monthly_quota_for(user):
+    """Token allowance per calendar month for a user's plan; None means unlimited"""
+    quotas = current_app.config['AI_MONTHLY_TOKEN_QUOTA']
+    if getattr(user, 'is_admin', False):
+        return quotas.get('admin')
+    return quotas.get('premium' if user.is_premium else 'free')
+
+
+def tokens_used_this_month(user_id):
+    month_start = utc_today().replace(day=1)
+    return db.session.query(
+        func.coalesce(func.sum(AIUsageRollup.prompt_tokens + AIUsageRollup.completion_tokens), 0)
+    ).filter(
+        AIUsageRollup.user_id == user_id,
+        AIUsageRollup.day >= month_start
+    ).scalar()
+
+
+def check_quota(user):
+    """(allowed, used, quota) for the user's monthly token allowance"""
+    quota = monthly_quota_for(user)
+    if quota is None:
+        return True, None, None
+    used = tokens_used_this_month(user.id)
+    return used < quota, used, quota
+
+
+def reserve_tokens(user, model, tokens, day):
+    """
+    Re-check the allowance right before an upstream call and hold `tokens` of
+    it on `day` until release_tokens, so generations already running count
+    against the quota. The user row stays locked until the caller commits,
+    so concurrent jobs for one user check one at a time. Returns
+    (allowed, used, quota); nothing is held unless allowed with a quota.
+    """
+    quota = monthly_quota_for(user)
+    if quota is None:
+        return True, None, None
+    db.session.execute(select(User.id).where(User.id == user.id).with_for_update())
+    used = tokens_used_this_month(user.id)
+    if used >= quota:
+        return False, used, quota
+    record_usage(user.id, model, prompt_tokens=tokens, day=day, requests=0)
+    return True, used, quota
+
+
+def release_tokens(user_id, model, tokens, day):
+    """Return tokens held by reserve_tokens; runs in the caller's transaction"""
+    record_usage(user_id, model, prompt_tokens=-tokens, day=day, requests=0)
@@ -0,0 +1,257 @@
+"""
+Archive and restore for soft-deleted recipes and comments.
+
+Rows deleted more than ARCHIVE_AFTER_DAYS ago leave the hot tables for
+<table>_archive in batches of one transaction each. A recipe takes its
+comments, ratings and tag links with it. A comment is only archived once it
+has no replies left, so threads empty from the leaves up over successive
+batches. Each move is a single statement:
+
+    WITH moved AS (DELETE FROM recipes WHERE ... RETURNING ...)
+    INSERT INTO recipes_archive SELECT ... FROM moved
+
+Restoring runs the same move in the other direction.
+"""
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import any_, bindparam, delete, exists, false, func, insert, literal, null, or_, select, update
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+
+from models import db
+from models.archive import comments_archive, ratings_archive, recipe_tags_archive, recipes_archive
+from models.comment import Comment
+from models.ratings import Rating
+from models.recipe import Recipe
+from models.recipe_tag import RecipeTag
+from models.tag import Tag
+from utils.helpers import log_audit_events
+
+ARCHIVABLE = ('recipes', 'comments')
+
+recipes = Recipe.__table__
+comments = Comment.__table__
+ratings = Rating.__table__
+recipe_tags = RecipeTag.__table__
+
+
+def _uuid_array(name, values):
+    return bindparam(name, values, type_=ARRAY(UUID(as_uuid=True)))
+
+
+def move_rows(source, target, where, archived_at=None, overrides=None, returning=None):
+    """
+    Move the rows of `source` matching `where` into `target` in one statement.
+    Columns are matched by name; `overrides` maps column names to the SQL
+    values written instead. Returns the moved `returning` column values, or
+    the number of rows moved.
+    """
+    overrides = overrides or {}
+    names = [column.name for column in target.c if column.name in source.c]
+    moved = delete(source).where(*where).returning(*(source.c[name] for name in names)).cte('moved')
+    values = [overrides[name] if name in overrides else moved.c[name] for name in names]
+    if archived_at is not None:
+        names.append('archived_at')
+        values.append(literal(archived_at, target.c.archived_at.type))
+
+    stmt = insert(target).from_select(names, select(*values).select_from(moved))
+    if returning is None:
+        return db.session.execute(stmt).rowcount
+    return db.session.execute(stmt.returning(target.c[returning])).scalars().all()
+
+
+def _adjust_tag_usage(links, recipe_ids, sign):
+    """Shift tags.usage_count by the links of `recipe_ids` now held in `links`"""
+    counts = select(
+        links.c.tag_id, func.count().label('recipes')
+    ).where(
+        links.c.recipe_id == any_(_uuid_array('tag_recipe_ids', recipe_ids))
+    ).group_by(links.c.tag_id).subquery()
+    db.session.execute(
+        update(Tag).where(Tag.id == counts.c.tag_id).values(
+            usage_count=func.greatest(func.coalesce(Tag.usage_count, 0) + sign * counts.c.recipes, 0)
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def archive_recipe_batch(recipe_ids, archived_at):
+    """Move recipes and everything hanging off them; returns (recipe ids, comments moved)"""
+    def of_recipes(column):
+        return [column == any_(_uuid_array('recipe_ids', recipe_ids))]
+
+    move_rows(recipe_tags, recipe_tags_archive, of_recipes(recipe_tags.c.recipe_id), archived_at)
+    _adjust_tag_usage(recipe_tags_archive, recipe_ids, -1)
+    move_rows(ratings, ratings_archive, of_recipes(ratings.c.recipe_id), archived_at)
+    comment_count = move_rows(comments, comments_archive, of_recipes(comments.c.recipe_id), archived_at)
+    moved = move_rows(recipes, recipes_archive, of_recipes(recipes.c.id), archived_at, returning='id')
+    return moved, comment_count
+
+
+def archive_comment_batch(comment_ids, archived_at):
+    return move_rows(
+        comments, comments_archive,
+        [comments.c.id == any_(_uuid_array('comment_ids', comment_ids))],
+        archived_at, returning='id'
+    )
+
+
+def _due_recipes(cutoff, batch_size):
+    return select(recipes.c.id).where(
+        recipes.c.is_deleted == True,  # noqa: E712
+        recipes.c.deleted_at < cutoff
+    ).order_by(recipes.c.deleted_at).limit(batch_size).with_for_update(skip_locked=True)
+
+
+def _due_comments(cutoff, batch_size):
+    reply = comments.alias('reply')
+    return select(comments.c.id).where(
+        comments.c.is_deleted == True,  # noqa: E712
+        comments.c.deleted_at < cutoff,
+        ~exists().where(reply.c.parent_id == comments.c.id)
+    ).order_by(comments.c.deleted_at).limit(batch_size).with_for_update(of=comments, skip_locked=True)
+
+
+def archive_deleted(table, older_than, batch_size=500, progress=None):
+    """
+    Archive rows of `table` soft-deleted before now - `older_than`, one
+    committed batch at a time, until none are left. Rows locked by another
+    transaction are skipped and picked up on the next run.
+    """
+    cutoff = datetime.utcnow() - older_than
+    due = _due_recipes if table == 'recipes' else _due_comments
+    stats = {'table': table, 'archived': 0, 'comments': 0, 'batches': 0}
+    started = time.monotonic()
+
+    while True:
+        ids = db.session.execute(due(cutoff, batch_size)).scalars().all()
+        if not ids:
+            db.session.commit()
+            break
+        archived_at = datetime.utcnow()
+        try:
+            if table == 'recipes':
+                moved, comment_count = archive_recipe_batch(ids, archived_at)
+                stats['comments'] += comment_count
+            else:
+                moved = archive_comment_batch(ids, archived_at)
+            log_audit_events(user_id=None, action='ARCHIVE', table_name=table, record_ids=moved)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        stats['archived'] += len(moved)
+        stats['batches'] += 1
+        stats['elapsed'] = time.monotonic() - started
+        if progress:
+            progress(stats)
+
+    stats['elapsed'] = time.monotonic() - started
+    return stats
+
+
+def restore_recipes(recipe_ids):
+    """
+    Bring archived recipes back live, with their comments, ratings and tag
+    links. Comments keep their own deleted state. Returns the restored ids.
+    """
+    restored = move_rows(
+        recipes_archive, recipes,
+        [recipes_archive.c.id == any_(_uuid_array('recipe_ids', recipe_ids))],
+        overrides={'is_deleted': false(), 'deleted_at': null()},
+        returning='id'
+    )
+    if not restored:
+        return []
+
+    def of_restored(column):
+        return [column == any_(_uuid_array('restored_ids', restored))]
+
+    move_rows(comments_archive, comments, of_restored(comments_archive.c.recipe_id))
+    move_rows(ratings_archive, ratings, of_restored(ratings_archive.c.recipe_id))
+    move_rows(recipe_tags_archive, recipe_tags, of_restored(recipe_tags_archive.c.recipe_id))
+    _adjust_tag_usage(recipe_tags, restored, 1)
+    return restored
+
+
+def restore_comments(comment_ids):
+    """
+    Bring archived comments back live. A comment is only restored while its
+    recipe is in the hot table and its parent is either there or restored
+    alongside it. Returns the restored ids.
+    """
+    ids = _uuid_array('comment_ids', comment_ids)
+    parent = comments.alias('parent')
+    return move_rows(
+        comments_archive, comments,
+        [
+            comments_archive.c.id == any_(ids),
+            exists().where(recipes.c.id == comments_archive.c.recipe_id),
+            or_(
+                comments_archive.c.parent_id.is_(None),
+                comments_archive.c.parent_id == any_(ids),
+                exists().where(parent.c.id == comments_archive.c.parent_id)
+            )
+        ],
+        overrides={'is_deleted': false(), 'deleted_at': null()},
+        returning='id'
+    )
+
+
+def restore(table, record_ids, user_id=None, ip_address=None):
+    """Restore archived rows of `table` in one transaction; returns the restored ids"""
+    restorer = restore_recipes if table == 'recipes' else restore_comments
+    try:
+        restored = restorer(list(record_ids))
+        log_audit_events(
+            user_id=user_id,
+            action='RESTORE',
+            table_name=table,
+            record_ids=restored,
+            ip_address=ip_address
+        )
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return restored
+
+
+@click.command('archive-deleted')
+@click.option('--table', 'tables', type=click.Choice(ARCHIVABLE), multiple=True,
+              help='Table to archive (repeatable); default all')
+@click.option('--older-than', type=int, default=None, help='Days since deletion; default ARCHIVE_AFTER_DAYS')
+@click.option('--batch-size', type=int, default=None, help='Rows per transaction; default ARCHIVE_BATCH_SIZE')
+@with_appcontext
+def archive_deleted_command(tables, older_than, batch_size):
+    """Move long-deleted recipes and comments into the archive tables (e.g. from cron)"""
+    config = current_app.config
+    older_than = timedelta(days=config['ARCHIVE_AFTER_DAYS'] if older_than is None else older_than)
+    batch_size = batch_size or config['ARCHIVE_BATCH_SIZE']
+
+    def progress(stats):
+        click.echo(
+            f"{stats['table']} batch {stats['batches']}: archived={stats['archived']} "
+            f"comments={stats['comments']} elapsed={stats['elapsed']:.1f}s"
+        )
+
+    # Recipes first: their comments go with them instead of one thread level per batch
+    for table in tables or ARCHIVABLE:
+        stats = archive_deleted(table, older_than, batch_size, progress=progress)
+        click.echo(f"{table}: archived {stats['archived']} rows in {stats['batches']} batches")
+
+
+@click.command('restore-archived')
+@click.argument('table', type=click.Choice(ARCHIVABLE))
+@click.argument('record_ids', nargs=-1, required=True, type=click.UUID)
+@with_appcontext
+def restore_archived_command(table, record_ids):
+    """Move archived recipes or comments back into the live tables"""
+    restored = restore(table, record_ids)
+    missing = set(record_ids) - set(restored)
+    click.echo(f"{table}: restored {len(restored)}")
+    for record_id in sorted(missing, key=str):
+        click.echo(f"not restored: {record_id}", err=True)
@@ -0,0 +1,79 @@
+"""
+Offline stand-in for `genai.GenerativeModel`, for tests and local development.
+
+Enable it with `GEMINI_FAKE = True` in the app config, or pass an instance
+wherever a Gemini model is expected.
+"""
+import time
+
+
+class FakeUsageMetadata:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeResponse:
+    """Mimics GenerateContentResponse: iterable when streamed, `.text` when resolved"""
+
+    def __init__(self, chunks, usage_metadata, delay=0.0):
+        self._chunks = chunks
+        self._delay = delay
+        self.usage_metadata = usage_metadata
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            if self._delay:
+                time.sleep(self._delay)
+            yield FakeChunk(chunk)
+
+    @property
+    def text(self):
+        return ''.join(self._chunks)
+
+
+class FakeGeminiModel:
+    """
+    Deterministic model: echoes a canned recipe for the prompt, split into
+    word-sized chunks. `delay` is the total response time, spread across the
+    chunks when streaming; `error` makes every call raise.
+    """
+
+    def __init__(self, model_name='gemini-pro', delay=0.0, error=None, reply=None):
+        self.model_name = model_name
+        self.delay = delay
+        self.error = error
+        self.reply = reply
+        self.calls = []
+
+    def _reply_for(self, prompt):
+        if self.reply is not None:
+            return self.reply
+        return (
+            f"Recipe for: {prompt}\n\n"
+            "Ingredients:\n- 2 cups of something good\n- 1 pinch of salt\n\n"
+            "Instructions:\n1. Combine everything.\n2. Cook until done.\n\n"
+            "Prep time: 10 minutes\nCook time: 20 minutes\nDifficulty: easy"
+        )
+
+    def generate_content(self, contents, stream=False, **kwargs):
+        self.calls.append({'contents': contents, 'stream': stream, **kwargs})
+        if self.error:
+            raise self.error if isinstance(self.error, Exception) else RuntimeError(self.error)
+
+        text = self._reply_for(contents)
+        words = text.split(' ')
+        chunks = [word + ' ' for word in words[:-1]] + [words[-1]]
+        usage = FakeUsageMetadata(len(str(contents).split()), len(words))
+
+        if stream:
+            return FakeResponse(chunks, usage, delay=self.delay / max(len(chunks), 1))
+        if self.delay:
+            time.sleep(self.delay)
+        return FakeResponse(chunks, usage)
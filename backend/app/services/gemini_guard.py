@@ -0,0 +1,287 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from flask import current_app
+
+from extensions import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+HOLDERS_KEY = 'gemini:sem:holders'
+WAITERS_KEY = 'gemini:sem:waiters'
+WAITER_PREFIX = 'gemini:sem:waiter:'
+BREAKER_OPEN_KEY = 'gemini:cb:open'
+BREAKER_BUCKET_PREFIX = 'gemini:cb:bucket:'
+BREAKER_BUCKET_SECONDS = 10
+
+POLL_INTERVAL = 0.05
+
+# KEYS: holders, waiters   ARGV: token, now, lease_expiry, limit, waiter_prefix
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[2])
+while true do
+    local head = redis.call('ZRANGE', KEYS[2], 0, 0)[1]
+    if not head or head == ARGV[1] or redis.call('EXISTS', ARGV[5] .. head) == 1 then
+        break
+    end
+    redis.call('ZREM', KEYS[2], head)
+end
+local free = tonumber(ARGV[4]) - redis.call('ZCARD', KEYS[1])
+if free <= 0 then
+    return 0
+end
+local rank = redis.call('ZRANK', KEYS[2], ARGV[1])
+if rank and rank < free then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('ZADD', KEYS[1], ARGV[3], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# KEYS: waiters, waiter heartbeat   ARGV: token, score, max_waiters, heartbeat_ttl
+_ENQUEUE_SCRIPT = """
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('SET', KEYS[2], 1, 'EX', ARGV[4])
+return 1
+"""
+
+
+class UpstreamUnavailable(Exception):
+    """Gemini was not called; the request should be marked as timed out"""
+
+
+class CircuitOpen(UpstreamUnavailable):
+    pass
+
+
+class QueueFull(UpstreamUnavailable):
+    pass
+
+
+class QueueTimeout(UpstreamUnavailable):
+    pass
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    pass
+
+
+class Slot:
+    """A held concurrency slot"""
+
+    def __init__(self, wait_ms, deadline):
+        self.wait_ms = wait_ms
+        self.deadline = deadline
+
+    def check_deadline(self):
+        if time.monotonic() > self.deadline:
+            raise DeadlineExceeded("Gemini call exceeded its deadline")
+
+
+class _LocalLimiter:
+    """Per-process priority semaphore used when Redis is unavailable"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.active = 0
+        self.waiters = []
+        self.sequence = itertools.count()
+
+    def acquire(self, priority, limit, max_waiters, timeout):
+        with self.condition:
+            if len(self.waiters) >= max_waiters:
+                raise QueueFull("Gemini wait queue is full")
+            entry = (-priority, next(self.sequence))
+            heapq.heappush(self.waiters, entry)
+            deadline = time.monotonic() + timeout
+            try:
+                while self.active >= limit or self.waiters[0] != entry:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise QueueTimeout("Timed out waiting for a Gemini slot")
+                    self.condition.wait(remaining)
+                self.active += 1
+            finally:
+                if entry in self.waiters:
+                    self.waiters.remove(entry)
+                    heapq.heapify(self.waiters)
+                self.condition.notify_all()
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+
+class GeminiGuard:
+    """
+    Protects the Gemini upstream across all workers.
+
+    - A Redis semaphore caps concurrent calls at GEMINI_MAX_CONCURRENCY.
+      Callers beyond that wait in a bounded queue (GEMINI_MAX_QUEUE) ordered by
+      plan priority, then arrival; slot leases expire so a crashed worker
+      can't leak capacity.
+    - A circuit breaker opens for GEMINI_BREAKER_COOLDOWN seconds when the
+      error rate over GEMINI_BREAKER_WINDOW crosses GEMINI_BREAKER_THRESHOLD,
+      failing calls fast instead of queueing them behind a sick upstream.
+    - Every call gets a deadline of GEMINI_CALL_TIMEOUT seconds.
+    """
+
+    def __init__(self):
+        self._local = _LocalLimiter()
+        self._local_outcomes = deque()
+        self._local_open_until = 0.0
+        self._lock = threading.Lock()
+        self._acquire = None
+        self._enqueue = None
+        self._script_client = None
+
+    def _scripts(self, redis_client):
+        # Scripts are bound to the client that registered them; re-register after a fork
+        if self._script_client is not redis_client:
+            self._acquire = redis_client.register_script(_ACQUIRE_SCRIPT)
+            self._enqueue = redis_client.register_script(_ENQUEUE_SCRIPT)
+            self._script_client = redis_client
+        return self._acquire, self._enqueue
+
+    def priority_for(self, user):
+        """Queue priority for a user's plan"""
+        priorities = current_app.config['GEMINI_PLAN_PRIORITY']
+        if getattr(user, 'is_admin', False):
+            return priorities.get('admin', 0)
+        return priorities.get('premium' if user.is_premium else 'free', 0)
+
+    # Circuit breaker
+
+    def is_open(self):
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                return bool(redis_client.exists(BREAKER_OPEN_KEY))
+            except Exception as e:
+                logger.error(f"Circuit breaker check failed : {e}")
+                return False
+        return time.monotonic() < self._local_open_until
+
+    def record(self, success):
+        """Feed one call outcome into the error-rate window"""
+        config = current_app.config
+        window = config['GEMINI_BREAKER_WINDOW']
+        field = 'ok' if success else 'error'
+        redis_client = get_redis_client()
+
+        if not redis_client:
+            now = time.monotonic()
+            with self._lock:
+                self._local_outcomes.append((now, success))
+                while self._local_outcomes and self._local_outcomes[0][0] < now - window:
+                    self._local_outcomes.popleft()
+                total = len(self._local_outcomes)
+                errors = sum(1 for _, ok in self._local_outcomes if not ok)
+                if self._should_open(total, errors):
+                    self._local_open_until = now + config['GEMINI_BREAKER_COOLDOWN']
+            return
+
+        try:
+            bucket = int(time.time() // BREAKER_BUCKET_SECONDS)
+            key = f"{BREAKER_BUCKET_PREFIX}{bucket}"
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.hincrby(key, field, 1)
+            pipe.expire(key, window + BREAKER_BUCKET_SECONDS)
+            pipe.execute()
+            if success:
+                return
+
+            buckets = range(bucket - window // BREAKER_BUCKET_SECONDS + 1, bucket + 1)
+            pipe = redis_client.pipeline(transaction=False)
+            for index in buckets:
+                pipe.hmget(f"{BREAKER_BUCKET_PREFIX}{index}", 'ok', 'error')
+            counts = pipe.execute()
+            ok = sum(int(item[0] or 0) for item in counts)
+            errors = sum(int(item[1] or 0) for item in counts)
+            if self._should_open(ok + errors, errors):
+                redis_client.set(BREAKER_OPEN_KEY, 1, ex=config['GEMINI_BREAKER_COOLDOWN'], nx=True)
+                logger.warning(f"Gemini circuit opened ({errors}/{ok + errors} failed)")
+        except Exception as e:
+            logger.error(f"Circuit breaker update failed : {e}")
+
+    def _should_open(self, total, errors):
+        config = current_app.config
+        return (
+            total >= config['GEMINI_BREAKER_MIN_REQUESTS']
+            and errors / total >= config['GEMINI_BREAKER_THRESHOLD']
+        )
+
+    # Concurrency limiting
+
+    @contextmanager
+    def slot(self, priority=0):
+        """Wait for a concurrency slot; yields a Slot carrying the call deadline"""
+        if self.is_open():
+            raise CircuitOpen("Gemini circuit is open")
+
+        config = current_app.config
+        limit = config['GEMINI_MAX_CONCURRENCY']
+        max_waiters = config['GEMINI_MAX_QUEUE']
+        queue_timeout = config['GEMINI_QUEUE_TIMEOUT']
+        call_timeout = config['GEMINI_CALL_TIMEOUT']
+
+        started = time.monotonic()
+        redis_client = get_redis_client()
+        if redis_client:
+            token = uuid.uuid4().hex
+            self._acquire_redis(redis_client, token, priority, limit, max_waiters, queue_timeout, call_timeout)
+            release = lambda: redis_client.zrem(HOLDERS_KEY, token)
+        else:
+            self._local.acquire(priority, limit, max_waiters, queue_timeout)
+            release = self._local.release
+
+        acquired = time.monotonic()
+        try:
+            yield Slot((acquired - started) * 1000, acquired + call_timeout)
+        finally:
+            try:
+                release()
+            except Exception as e:
+                logger.error(f"Releasing Gemini slot failed : {e}")
+
+    def _acquire_redis(self, redis_client, token, priority, limit, max_waiters, queue_timeout, call_timeout):
+        acquire, enqueue = self._scripts(redis_client)
+        heartbeat_key = WAITER_PREFIX + token
+        heartbeat_ttl = max(int(POLL_INTERVAL * 40), 2)
+        # Higher priority sorts first; arrival time breaks ties
+        score = -priority * 1e10 + time.time()
+
+        if not enqueue(keys=[WAITERS_KEY, heartbeat_key], args=[token, score, max_waiters, heartbeat_ttl]):
+            raise QueueFull("Gemini wait queue is full")
+
+        deadline = time.monotonic() + queue_timeout
+        try:
+            while True:
+                now = time.time()
+                lease_expiry = now + call_timeout + 5
+                if acquire(keys=[HOLDERS_KEY, WAITERS_KEY],
+                           args=[token, now, lease_expiry, limit, WAITER_PREFIX]):
+                    return
+                if time.monotonic() > deadline:
+                    raise QueueTimeout("Timed out waiting for a Gemini slot")
+                redis_client.expire(heartbeat_key, heartbeat_ttl)
+                time.sleep(POLL_INTERVAL)
+        finally:
+            pipe = redis_client.pipeline(transaction=False)
+            pipe.zrem(WAITERS_KEY, token)
+            pipe.delete(heartbeat_key)
+            pipe.execute()
+
+
+gemini_guard = GeminiGuard()
@@ -0,0 +1,224 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+# Pillow format names for the original-format fallback variant
+ORIGINAL_FORMATS = {
+    'jpg': 'JPEG',
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+    'gif': 'GIF',
+    'webp': 'WEBP'
+}
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process pool for Pillow work, created lazily once per process"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=current_app.config['IMAGE_PROCESS_WORKERS'])
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def folder_path(folder):
+    path = os.path.join(current_app.root_path, 'static', folder)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def staging_path():
+    path = current_app.config['IMAGE_STAGING_FOLDER']
+    if not os.path.isabs(path):
+        path = os.path.join(current_app.root_path, path)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def variant_name(digest, width, ext):
+    return f"{digest}_{width}.{ext}"
+
+
+def normalized_ext(filename):
+    ext = os.path.splitext(filename)[1].lower().lstrip('.')
+    return 'jpg' if ext == 'jpeg' else ext
+
+
+def stage_upload(file_storage):
+    """
+    Copy an upload to the staging area in fixed-size chunks, hashing as it
+    goes. Returns (staged_path, sha256 hex digest).
+    """
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(dir=staging_path(), suffix='.upload')
+    with os.fdopen(fd, 'wb') as out:
+        stream = file_storage.stream
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            out.write(chunk)
+    return path, digest.hexdigest()
+
+
+def _save_atomic(image, path, fmt, **params):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            image.save(out, fmt, **params)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def process_image(source_path, out_dir, digest, ext, widths, remove_source=True):
+    """
+    Render every width as WebP plus the original format. Runs in a worker
+    process. Re-encoding drops EXIF and other metadata; orientation is
+    applied to the pixels first so photos don't come out rotated.
+    """
+    from PIL import Image, ImageOps
+
+    try:
+        with Image.open(source_path) as opened:
+            image = ImageOps.exif_transpose(opened)
+            image.load()
+
+        original_format = ORIGINAL_FORMATS.get(ext, 'PNG')
+        written = []
+        # Largest first, each variant downscaled from the previous one
+        for width in sorted(widths, reverse=True):
+            image.thumbnail((width, width), Image.LANCZOS)
+
+            webp = image if image.mode in ('RGB', 'RGBA') else image.convert('RGBA')
+            path = os.path.join(out_dir, variant_name(digest, width, 'webp'))
+            _save_atomic(webp, path, 'WEBP', quality=82, method=4)
+            written.append(path)
+
+            original = image
+            if original_format == 'JPEG' and image.mode != 'RGB':
+                original = image.convert('RGB')
+            params = {'quality': 85, 'optimize': True, 'progressive': True} if original_format == 'JPEG' else {}
+            path = os.path.join(out_dir, variant_name(digest, width, ext))
+            _save_atomic(original, path, original_format, **params)
+            written.append(path)
+        return written
+    finally:
+        if remove_source and os.path.exists(source_path):
+            os.unlink(source_path)
+
+
+def render_thumbnail(source_path, dest_path, width, height, fit, fmt):
+    """
+    Resize one image into a width x height box. Runs in a worker process.
+
+    'contain' scales to fit inside the box; 'cover' crops to the box's aspect
+    ratio around the centre first. A missing dimension leaves that side
+    unbounded. Images are never upscaled.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as opened:
+        image = ImageOps.exif_transpose(opened)
+        image.load()
+
+    if fit == 'cover' and width and height:
+        target_ratio = width / height
+        current_width, current_height = image.size
+        if current_width / current_height > target_ratio:
+            crop_width = round(current_height * target_ratio)
+            left = (current_width - crop_width) // 2
+            image = image.crop((left, 0, left + crop_width, current_height))
+        else:
+            crop_height = round(current_width / target_ratio)
+            top = (current_height - crop_height) // 2
+            image = image.crop((0, top, current_width, top + crop_height))
+
+    image.thumbnail((width or image.width, height or image.height), Image.LANCZOS)
+
+    output_format = ORIGINAL_FORMATS.get(fmt, 'PNG')
+    params = {}
+    if output_format == 'WEBP':
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        params = {'quality': 80, 'method': 4}
+    elif output_format == 'JPEG':
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        params = {'quality': 85, 'optimize': True, 'progressive': True}
+    _save_atomic(image, dest_path, output_format, **params)
+    return os.path.getsize(dest_path)
+
+
+# An upload waiting in the staging area for its variants to be rendered
+StagedImage = namedtuple('StagedImage', 'path out_dir digest ext')
+
+
+def stage_image(file_storage, folder, ext):
+    """
+    Stage an upload whose type has already been sniffed. Returns (url, staged),
+    where staged is None for a duplicate of an already-processed image.
+    """
+    config = current_app.config
+    widths = config['IMAGE_VARIANT_WIDTHS']
+    ext = 'jpg' if ext == 'jpeg' else ext
+
+    path, digest = stage_upload(file_storage)
+    out_dir = folder_path(folder)
+    url = f"/img/{folder}/{variant_name(digest, config['IMAGE_DEFAULT_WIDTH'], ext)}"
+
+    # Content-addressed names: identical uploads share the stored variants
+    if all(os.path.exists(os.path.join(out_dir, variant_name(digest, width, ext))) for width in widths):
+        os.unlink(path)
+        return url, None
+    return url, StagedImage(path, out_dir, digest, ext)
+
+
+def discard_staged(staged):
+    if staged and os.path.exists(staged.path):
+        os.unlink(staged.path)
+
+
+def submit_staged(staged, on_failure=None):
+    """
+    Render a staged upload's variants in the process pool. When that fails,
+    `on_failure(error)` runs in an app context, e.g. to stop pointing at the
+    URL that will never exist.
+    """
+    app = current_app._get_current_object()
+
+    def done(future):
+        error = future.exception()
+        if not error:
+            return
+        logger.error(f"Image processing failed : {error}")
+        if on_failure:
+            with app.app_context():
+                try:
+                    on_failure(error)
+                except Exception as e:
+                    logger.error(f"Image failure handler failed : {e}")
+
+    future = get_pool().submit(
+        process_image, staged.path, staged.out_dir, staged.digest, staged.ext,
+        app.config['IMAGE_VARIANT_WIDTHS']
+    )
+    future.add_done_callback(done)
+    return future
@@ -0,0 +1,156 @@
+import hashlib
+import hmac
+import logging
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy.dialects.postgresql import insert
+
+from models import db
+from models.payment import Payment
+from models.payment_event import PaymentEvent
+from models.user import User
+from services.task_queue import TaskQueue
+from utils.helpers import log_audit_event
+
+logger = logging.getLogger(__name__)
+
+payment_queue = TaskQueue('payments', shards=4)
+
+COMPLETED_EVENTS = {'payment.captured', 'order.paid'}
+FAILED_EVENTS = {'payment.failed'}
+# Minutes a received event may wait before a sweep queues it again
+REQUEUE_AFTER_MINUTES = 5
+
+
+def verify_webhook_signature(body, signature, secret):
+    """Constant-time check of Razorpay's HMAC-SHA256 over the raw body"""
+    if not signature or not secret:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def extract_order_id(event):
+    """Razorpay order id an event refers to; used as the ordering key"""
+    payload = event.get('payload', {})
+    payment = payload.get('payment', {}).get('entity', {})
+    order = payload.get('order', {}).get('entity', {})
+    return payment.get('order_id') or order.get('id')
+
+
+def store_event(event_id, event):
+    """
+    Persist a raw event once. Returns False when the event id was already
+    stored, which makes provider retries no-ops.
+    """
+    order_id = extract_order_id(event)
+    stmt = insert(PaymentEvent).values(
+        event_id=event_id,
+        event_type=event.get('event', 'unknown'),
+        order_id=order_id,
+        payload=event,
+        status='received',
+        received_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=['event_id']).returning(PaymentEvent.id)
+
+    inserted = db.session.execute(stmt).first() is not None
+    db.session.commit()
+
+    if inserted:
+        payment_queue.enqueue('process_payment_event', {'event_id': event_id}, key=order_id)
+    return inserted
+
+
+def apply_completion(payment, razorpay_payment_id, payment_method=None):
+    """Mark a payment completed and upgrade the user for premium purchases"""
+    payment.status = 'completed'
+    payment.payment_id = razorpay_payment_id
+    if payment_method:
+        payment.payment_method = payment_method
+
+    if payment.description and 'premium' in payment.description.lower():
+        User.query.filter_by(id=payment.user_id).update(
+            {'is_premium': True}, synchronize_session=False
+        )
+
+
+@payment_queue.task
+def process_payment_event(event_id):
+    """Apply a stored webhook event to its payment, at most once"""
+    event = PaymentEvent.query.filter_by(event_id=event_id).with_for_update().first()
+    if not event or event.status != 'received':
+        return
+
+    entity = event.payload.get('payload', {}).get('payment', {}).get('entity', {})
+    razorpay_payment_id = entity.get('id')
+
+    candidates = [value for value in (event.order_id, razorpay_payment_id) if value]
+    payment = Payment.query.filter(
+        Payment.payment_id.in_(candidates)
+    ).with_for_update().first() if candidates else None
+
+    if not payment:
+        event.status = 'ignored'
+        event.error_message = 'No matching payment'
+    elif event.event_type in COMPLETED_EVENTS:
+        if payment.status != 'completed':
+            apply_completion(payment, razorpay_payment_id, entity.get('method'))
+            log_audit_event(
+                user_id=payment.user_id,
+                action='UPDATE',
+                table_name='payments',
+                record_id=payment.id,
+                changes={'status': 'completed', 'source': 'webhook', 'event_id': event_id},
+                commit=False
+            )
+        event.status = 'processed'
+    elif event.event_type in FAILED_EVENTS:
+        # A late failure never overrides a capture for the same order
+        if payment.status == 'pending':
+            payment.status = 'failed'
+            payment.failure_reason = (entity.get('error_description') or 'Payment failed')[:200]
+            log_audit_event(
+                user_id=payment.user_id,
+                action='UPDATE',
+                table_name='payments',
+                record_id=payment.id,
+                changes={'status': 'failed', 'source': 'webhook', 'event_id': event_id},
+                commit=False
+            )
+        event.status = 'processed'
+    else:
+        event.status = 'ignored'
+
+    event.processed_at = datetime.utcnow()
+    db.session.commit()
+
+
+def requeue_received_events(limit=1000, older_than=None):
+    """
+    Re-enqueue events that were stored but never processed, e.g. because the
+    enqueue failed or the process running them inline died. `older_than`
+    leaves alone events received so recently they may still be queued;
+    processing is idempotent either way. Returns how many were queued.
+    """
+    query = PaymentEvent.query.filter_by(status='received')
+    if older_than is not None:
+        query = query.filter(PaymentEvent.received_at < datetime.utcnow() - older_than)
+    events = query.order_by(PaymentEvent.received_at).limit(limit).all()
+    for event in events:
+        payment_queue.enqueue('process_payment_event', {'event_id': event.event_id}, key=event.order_id)
+    return len(events)
+
+
+payment_queue.on_start = requeue_received_events
+
+
+@click.command('requeue-payment-events')
+@click.option('--older-than', default=REQUEUE_AFTER_MINUTES, show_default=True, help='Minutes an event must have waited')
+@click.option('--limit', default=1000, show_default=True)
+@with_appcontext
+def requeue_payment_events_command(older_than, limit):
+    """Retry webhook events stuck in 'received' (e.g. from cron when running without a worker)"""
+    count = requeue_received_events(limit=limit, older_than=timedelta(minutes=older_than))
+    click.echo(f"Requeued {count} payment events")
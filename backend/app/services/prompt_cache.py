@@ -0,0 +1,172 @@
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+
+from flask import current_app
+
+from extensions import get_redis_client
+from utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# Dropped from cache keys: they never change what is asked for
+FILLER_WORDS = frozenset({'a', 'an', 'the', 'please', 'recipe'})
+FILLER_PHRASES = frozenset({('give', 'me'), ('make', 'me')})
+
+_PUNCTUATION = re.compile(r'[^\w\s]+')
+
+ENTRY_PREFIX = 'aicache:entry:'
+LRU_KEY = 'aicache:lru'
+EXPIRY_KEY = 'aicache:expiry'
+PRUNE_BATCH = 1000
+STATS_KEY = 'aicache:stats'
+
+PROMPT_CACHE_LOOKUPS = Counter(
+    'ai_prompt_cache_lookups_total',
+    'AI prompt cache lookups by outcome (hit, miss)',
+    ['result']
+)
+
+
+def normalize_prompt(prompt):
+    """
+    Fold case, punctuation, whitespace and filler words so near-duplicates
+    collide. Only words that never change the dish are dropped; connectives
+    such as 'and', 'or', 'with' and 'without' are kept.
+    """
+    text = unicodedata.normalize('NFKC', prompt).casefold()
+    words = _PUNCTUATION.sub(' ', text).split()
+    kept = []
+    index = 0
+    while index < len(words):
+        if tuple(words[index:index + 2]) in FILLER_PHRASES:
+            index += 2
+            continue
+        if words[index] not in FILLER_WORDS:
+            kept.append(words[index])
+        index += 1
+    return ' '.join(kept or words)
+
+
+def cache_digest(prompt, model):
+    normalized = normalize_prompt(prompt)
+    return hashlib.sha256(f"{model}\0{normalized}".encode()).hexdigest()
+
+
+class PromptCache:
+    """
+    Gemini responses in Redis, keyed by model and normalized prompt.
+
+    Entries expire after AI_CACHE_TTL seconds. A sorted set scored by last
+    access time bounds the cache to AI_CACHE_MAX_ENTRIES, evicting the least
+    recently used entries first; a second one scored by expiry time lets
+    members whose entry has expired be dropped from both. Without Redis
+    every lookup is a miss.
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+
+    @property
+    def redis(self):
+        return self.client or get_redis_client()
+
+    def get(self, prompt, model):
+        """Cached entry ({'response', 'latency_ms'}) or None"""
+        if not self.redis:
+            return None
+
+        digest = cache_digest(prompt, model)
+        try:
+            raw = self.redis.get(ENTRY_PREFIX + digest)
+            pipe = self.redis.pipeline(transaction=False)
+            if raw is None:
+                pipe.zrem(LRU_KEY, digest)
+                pipe.zrem(EXPIRY_KEY, digest)
+                pipe.hincrby(STATS_KEY, 'misses', 1)
+                pipe.execute()
+                PROMPT_CACHE_LOOKUPS.labels('miss').inc()
+                return None
+
+            entry = json.loads(raw)
+            pipe.zadd(LRU_KEY, {digest: time.time()})
+            pipe.hincrby(STATS_KEY, 'hits', 1)
+            pipe.hincrbyfloat(STATS_KEY, 'saved_ms', entry.get('latency_ms') or 0)
+            pipe.execute()
+            PROMPT_CACHE_LOOKUPS.labels('hit').inc()
+            return entry
+        except Exception as e:
+            logger.error(f"Prompt cache lookup failed : {e}")
+            return None
+
+    def put(self, prompt, model, response, latency_ms):
+        """Store a response and evict the least recently used overflow"""
+        if not self.redis:
+            return
+
+        config = current_app.config
+        digest = cache_digest(prompt, model)
+        entry = json.dumps({'response': response, 'latency_ms': latency_ms, 'model': model})
+        now = time.time()
+        try:
+            self.prune_expired(now)
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.set(ENTRY_PREFIX + digest, entry, ex=config['AI_CACHE_TTL'])
+            pipe.zadd(LRU_KEY, {digest: now})
+            pipe.zadd(EXPIRY_KEY, {digest: now + config['AI_CACHE_TTL']})
+            pipe.zcard(LRU_KEY)
+            size = pipe.execute()[-1]
+
+            overflow = size - config['AI_CACHE_MAX_ENTRIES']
+            if overflow > 0:
+                evicted = [member for member, _ in self.redis.zpopmin(LRU_KEY, overflow)]
+                if evicted:
+                    pipe = self.redis.pipeline(transaction=False)
+                    pipe.zrem(EXPIRY_KEY, *evicted)
+                    pipe.unlink(*[ENTRY_PREFIX + member for member in evicted])
+                    pipe.hincrby(STATS_KEY, 'evictions', len(evicted))
+                    pipe.execute()
+        except Exception as e:
+            logger.error(f"Prompt cache store failed : {e}")
+
+    def prune_expired(self, now=None):
+        """
+        Drop up to PRUNE_BATCH members whose entries Redis has already expired.
+        Anything not accessed for a whole TTL has expired as well.
+        """
+        now = time.time() if now is None else now
+        expired = self.redis.zrangebyscore(EXPIRY_KEY, '-inf', now, start=0, num=PRUNE_BATCH)
+        pipe = self.redis.pipeline(transaction=False)
+        if expired:
+            pipe.zrem(LRU_KEY, *expired)
+            pipe.zrem(EXPIRY_KEY, *expired)
+        pipe.zremrangebyscore(LRU_KEY, '-inf', now - current_app.config['AI_CACHE_TTL'])
+        pipe.execute()
+        return len(expired)
+
+    def stats(self):
+        """Hit rate and latency saved since the counters were last reset"""
+        if not self.redis:
+            return {'enabled': False}
+
+        while self.prune_expired() == PRUNE_BATCH:
+            pass
+        raw = self.redis.hgetall(STATS_KEY)
+        hits = int(raw.get('hits', 0))
+        misses = int(raw.get('misses', 0))
+        lookups = hits + misses
+        return {
+            'enabled': True,
+            'entries': self.redis.zcard(LRU_KEY),
+            'hits': hits,
+            'misses': misses,
+            'evictions': int(raw.get('evictions', 0)),
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'saved_latency_ms': round(float(raw.get('saved_ms', 0)), 1)
+        }
+
+
+prompt_cache = PromptCache()
@@ -0,0 +1,186 @@
+"""
+Local stand-in for Razorpay, for tests and local development.
+
+`FakeRazorpayWebhooks` builds and signs webhook deliveries the way Razorpay
+does and posts them to the app, through a Flask test client or over HTTP.
+`FakeRazorpayServer` serves the read-only payment lookups used by payment
+reconciliation on a local port.
+"""
+import hashlib
+import hmac
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def sign_webhook(body, secret):
+    """Razorpay's X-Razorpay-Signature for a raw body"""
+    return hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def build_event(event_type, order_id, payment_id=None, amount=49900, currency='INR',
+                method='upi', error_description=None):
+    """A webhook payload shaped like Razorpay's payment events"""
+    payment_id = payment_id or f"pay_{uuid.uuid4().hex[:14]}"
+    status = 'failed' if event_type == 'payment.failed' else 'captured'
+    return {
+        'entity': 'event',
+        'account_id': 'acc_fake',
+        'event': event_type,
+        'contains': ['payment'],
+        'created_at': int(time.time()),
+        'payload': {
+            'payment': {
+                'entity': {
+                    'id': payment_id,
+                    'entity': 'payment',
+                    'amount': amount,
+                    'currency': currency,
+                    'status': status,
+                    'order_id': order_id,
+                    'method': method,
+                    'captured': status == 'captured',
+                    'error_description': error_description,
+                    'created_at': int(time.time())
+                }
+            }
+        }
+    }
+
+
+class FakeRazorpayWebhooks:
+    """Deliver signed webhooks to the app"""
+
+    def __init__(self, secret, client=None, url=None, path='/api/payments/webhook'):
+        if client is None and url is None:
+            raise ValueError("Provide a Flask test client or a base url")
+        self.secret = secret
+        self.client = client
+        self.url = url
+        self.path = path
+
+    def deliver(self, event, event_id=None, signature=None):
+        """Post one event; re-using an event_id simulates a provider retry"""
+        body = json.dumps(event, separators=(',', ':')).encode()
+        headers = {
+            'Content-Type': 'application/json',
+            'X-Razorpay-Event-Id': event_id or f"evt_{uuid.uuid4().hex[:14]}",
+            'X-Razorpay-Signature': signature or sign_webhook(body, self.secret)
+        }
+
+        if self.client is not None:
+            return self.client.post(self.path, data=body, headers=headers)
+
+        import requests
+        return requests.post(f"{self.url.rstrip('/')}{self.path}", data=body, headers=headers, timeout=10)
+
+    def payment_captured(self, order_id, **kwargs):
+        event_id = kwargs.pop('event_id', None)
+        return self.deliver(build_event('payment.captured', order_id, **kwargs), event_id=event_id)
+
+    def payment_failed(self, order_id, **kwargs):
+        event_id = kwargs.pop('event_id', None)
+        kwargs.setdefault('error_description', 'Payment was declined')
+        return self.deliver(build_event('payment.failed', order_id, **kwargs), event_id=event_id)
+
+
+class FakeRazorpayServer:
+    """
+    Threaded HTTP server answering GET /v1/orders/<id>/payments and
+    GET /v1/payments/<id> from an in-memory table.
+
+        with FakeRazorpayServer() as fake:
+            fake.add_payment('order_1', status='captured')
+            reconcile_payments(api_base=fake.url)
+    """
+
+    ORDER_PAYMENTS = re.compile(r'^/v1/orders/([^/]+)/payments$')
+    PAYMENT = re.compile(r'^/v1/payments/([^/]+)$')
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.orders = {}
+        self.payments = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    def add_payment(self, order_id, status='captured', method='upi', payment_id=None, amount=49900):
+        payment_id = payment_id or f"pay_{uuid.uuid4().hex[:14]}"
+        entity = {
+            'id': payment_id,
+            'entity': 'payment',
+            'amount': amount,
+            'currency': 'INR',
+            'status': status,
+            'order_id': order_id,
+            'method': method,
+            'captured': status == 'captured',
+            'created_at': int(time.time())
+        }
+        with self._lock:
+            self.orders.setdefault(order_id, []).append(entity)
+            self.payments[payment_id] = entity
+        return entity
+
+    def _lookup(self, path):
+        match = self.ORDER_PAYMENTS.match(path)
+        if match:
+            items = self.orders.get(match.group(1))
+            if items is None:
+                return 400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'The id provided does not exist'}}
+            return 200, {'entity': 'collection', 'count': len(items), 'items': items}
+
+        match = self.PAYMENT.match(path)
+        if match and match.group(1) in self.payments:
+            return 200, self.payments[match.group(1)]
+        return 400, {'error': {'code': 'BAD_REQUEST_ERROR', 'description': 'The id provided does not exist'}}
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with fake._lock:
+                    fake.requests += 1
+                if fake.latency:
+                    time.sleep(fake.latency)
+                status, body = fake._lookup(self.path.split('?', 1)[0])
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,400 @@
+import csv
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from itertools import islice
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import func, insert, select, text, update
+
+from models import db
+from models.recipe import Recipe
+from models.recipe_tag import RecipeTag
+from models.tag import Tag
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+RECIPE_COLUMNS = (
+    'id', 'title', 'description', 'ingredients', 'instructions', 'image_url', 'prep_time',
+    'cook_time', 'servings', 'difficulty_level', 'is_featured', 'view_count', 'author_id', 'created_at'
+)
+TAG_COLUMNS = ('id', 'name', 'color', 'usage_count', 'created_at')
+RECIPE_TAG_COLUMNS = ('recipe_id', 'tag_id', 'created_at')
+DIFFICULTY_LEVELS = ('easy', 'medium', 'hard')
+# COPY skips Python-side column defaults
+TAG_COLOR = Tag.__table__.c.color.default.arg
+# Recipes without an id of their own get one derived from the source and record number,
+# so importing the same file twice skips what is already there. The source is the
+# file's content hash unless named explicitly.
+IMPORT_NAMESPACE = uuid.UUID('6f1c2d9e-3b8a-4c57-9e0d-2a7b5c4e8f13')
+
+
+def read_records(path, fmt=None):
+    """Yield recipe dicts from a JSONL or CSV file (format taken from the extension unless given)"""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    with open(path, newline='' if fmt == 'csv' else None, encoding='utf-8') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _text(record, key, required=True):
+    value = record.get(key)
+    if isinstance(value, list):
+        value = '\n'.join(str(item) for item in value)
+    value = value.strip() if isinstance(value, str) else value
+    if required and not value:
+        raise ValueError(f"{key} is required")
+    return value or None
+
+
+def _positive_int(record, key):
+    value = record.get(key)
+    if value in (None, ''):
+        return None
+    value = int(value)
+    if value <= 0:
+        raise ValueError(f"{key} must be positive number")
+    return value
+
+
+def _tag_names(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split('|' if '|' in value else ',')
+    names = []
+    for name in value:
+        name = str(name).strip().lower()
+        if len(name) > 50:
+            raise ValueError(f"Tag too long: {name[:50]}...")
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def normalize(record, source_key, index, author_id):
+    """
+    One input record as a recipes row plus its tag names, checked against
+    the same rules as the model validators. Raises ValueError when invalid.
+    """
+    title = _text(record, 'title')
+    if len(title) > 150:
+        raise ValueError("title too long (max 150 characters)")
+    difficulty = (record.get('difficulty_level') or 'medium').lower()
+    if difficulty not in DIFFICULTY_LEVELS:
+        raise ValueError(f"Difficulty must be one of: {','.join(DIFFICULTY_LEVELS)}")
+    image_url = _text(record, 'image_url', required=False)
+    if image_url and len(image_url) > 255:
+        raise ValueError("image_url too long (max 255 characters)")
+
+    recipe_id = record.get('id')
+    recipe_id = uuid.UUID(str(recipe_id)) if recipe_id else uuid.uuid5(IMPORT_NAMESPACE, f"{source_key}:{index}")
+
+    row = {
+        'id': recipe_id,
+        'title': title,
+        'description': _text(record, 'description'),
+        'ingredients': _text(record, 'ingredients'),
+        'instructions': _text(record, 'instructions'),
+        'image_url': image_url,
+        'prep_time': _positive_int(record, 'prep_time'),
+        'cook_time': _positive_int(record, 'cook_time'),
+        'servings': _positive_int(record, 'servings'),
+        'difficulty_level': difficulty,
+        'is_featured': str(record.get('is_featured', '')).lower() in ('1', 'true', 'yes'),
+        'view_count': 0,
+        'author_id': author_id,
+        'created_at': datetime.fromisoformat(record['created_at']) if record.get('created_at') else None
+    }
+    return row, _tag_names(record.get('tags'))
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_checkpoint(path, source_key):
+    if not path or not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        data = json.load(f)
+    if data['source'] != source_key:
+        raise click.ClickException(f"Checkpoint {path} belongs to {data['source']}; remove it to start over")
+    return data['records']
+
+
+def save_checkpoint(path, source_key, records):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'source': source_key, 'records': records}, f)
+    os.replace(tmp_path, path)
+
+
+def _is_postgres():
+    return db.session.get_bind().dialect.name == 'postgresql'
+
+
+def copy_rows(table, columns, rows):
+    """
+    Bulk-load dict rows into a table inside the session's transaction:
+    COPY on Postgres, a multi-row INSERT elsewhere (e.g. SQLite in development).
+    """
+    if not rows:
+        return
+    if not _is_postgres():
+        db.session.execute(insert(table), rows)
+        return
+
+    buffer = io.StringIO()
+    # CSV format: None is written as an unquoted empty field, which COPY reads as NULL
+    csv.writer(buffer).writerows([row.get(column) for column in columns] for row in rows)
+    buffer.seek(0)
+    statement = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+
+    cursor = db.session.connection().connection.cursor()
+    try:
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(statement, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(statement) as copy:
+                copy.write(buffer.getvalue())
+    finally:
+        cursor.close()
+
+
+class AuthorResolver:
+    """
+    Maps author_id / author_email values to existing user ids, querying only
+    values not seen before, so a bad reference rejects one record instead
+    of failing the batch's COPY.
+    """
+
+    def __init__(self):
+        self.emails = {}
+        self.ids = {}
+
+    def prefetch(self, records):
+        emails, ids = set(), set()
+        for record in records:
+            if record.get('author_id'):
+                try:
+                    ids.add(uuid.UUID(str(record['author_id'])))
+                except ValueError:
+                    pass
+            elif record.get('author_email'):
+                emails.add(record['author_email'].strip().lower())
+        emails -= self.emails.keys()
+        ids -= self.ids.keys()
+        if emails:
+            self.emails.update({email: None for email in emails})
+            self.emails.update(db.session.execute(
+                select(func.lower(User.email), User.id).where(func.lower(User.email).in_(emails))
+            ).all())
+        if ids:
+            found = set(db.session.execute(select(User.id).where(User.id.in_(ids))).scalars())
+            self.ids.update({user_id: user_id in found for user_id in ids})
+
+    def resolve(self, record, default=None):
+        if record.get('author_id'):
+            user_id = uuid.UUID(str(record['author_id']))
+            if not self.ids.get(user_id):
+                raise ValueError(f"Unknown author_id: {user_id}")
+            return user_id
+        if record.get('author_email'):
+            user_id = self.emails.get(record['author_email'].strip().lower())
+            if user_id is None:
+                raise ValueError(f"Unknown author_email: {record['author_email']}")
+            return user_id
+        if default is None:
+            raise ValueError("No author; set author_id or author_email, or pass --author")
+        return default
+
+
+def import_batch(records, start, source_key, tags, authors, default_author_id, rejects):
+    """Validate and load one batch in a single transaction; returns (imported, skipped)"""
+    authors.prefetch(records)
+    recipes, links, new_tags = [], [], []
+    seen = set()
+    for offset, record in enumerate(records):
+        index = start + offset
+        try:
+            row, tag_names = normalize(record, source_key, index, authors.resolve(record, default_author_id))
+            if row['id'] in seen:
+                raise ValueError(f"Duplicate id in batch: {row['id']}")
+        except (ValueError, TypeError) as e:
+            rejects(index, record, str(e))
+            continue
+        seen.add(row['id'])
+        recipes.append(row)
+        for name in tag_names:
+            tag_id = tags.get(name)
+            if tag_id is None:
+                tag_id = tags[name] = uuid.uuid4()
+                new_tags.append({
+                    'id': tag_id, 'name': name, 'color': TAG_COLOR, 'usage_count': 0, 'created_at': datetime.utcnow()
+                })
+            links.append({'recipe_id': row['id'], 'tag_id': tag_id})
+
+    # Already imported by an earlier (interrupted) run of the same source
+    existing = set()
+    if recipes:
+        existing = set(db.session.execute(
+            select(Recipe.id).where(Recipe.id.in_([row['id'] for row in recipes]))
+        ).scalars())
+    if existing:
+        recipes = [row for row in recipes if row['id'] not in existing]
+        links = [link for link in links if link['recipe_id'] not in existing]
+
+    now = datetime.utcnow()
+    for row in recipes:
+        row['created_at'] = row['created_at'] or now
+    for link in links:
+        link['created_at'] = now
+
+    try:
+        copy_rows(Tag.__table__, TAG_COLUMNS, new_tags)
+        copy_rows(Recipe.__table__, RECIPE_COLUMNS, recipes)
+        copy_rows(RecipeTag.__table__, RECIPE_TAG_COLUMNS, links)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # Tags from the failed transaction were never stored
+        for tag in new_tags:
+            tags.pop(tag['name'], None)
+        raise
+    return len(recipes), len(existing)
+
+
+def rebuild_derived():
+    """Recompute data the COPY bypassed, once for the whole import, and refresh planner statistics"""
+    counts = select(RecipeTag.tag_id, func.count().label('recipes')).group_by(RecipeTag.tag_id).subquery()
+    db.session.execute(
+        update(Tag).where(Tag.id == counts.c.tag_id).values(usage_count=counts.c.recipes)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if _is_postgres():
+        # ANALYZE can't run inside a transaction block
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            for table in ('recipes', 'tags', 'recipe_tags'):
+                connection.execute(text(f"ANALYZE {table}"))
+
+
+def import_recipes(path, fmt=None, batch_size=10000, default_author=None, checkpoint_path=None,
+                   rejects_path=None, progress=None, source=None):
+    """
+    Stream recipes from a JSONL or CSV file into the database in batches,
+    one transaction per batch. Resumes after the last committed batch when a
+    checkpoint file is given, and skips recipes that already exist. `source`
+    names the feed for generated ids; it defaults to the file's content hash,
+    so only the same file is recognised as imported before.
+    """
+    source_key = source or file_digest(path)
+    default_author_id = None
+    if default_author:
+        default_author_id = db.session.execute(
+            select(User.id).where((func.lower(User.email) == default_author.lower()) | (User.username == default_author))
+        ).scalar()
+        if default_author_id is None:
+            raise click.ClickException(f"No user with email or username {default_author}")
+
+    # Every tag fits in memory; new ones are added as batches create them
+    tags = dict(db.session.execute(select(Tag.name, Tag.id)).all())
+    db.session.commit()
+    authors = AuthorResolver()
+
+    position = load_checkpoint(checkpoint_path, source_key)
+    stats = {'imported': 0, 'skipped': 0, 'rejected': 0, 'batches': 0, 'resumed_at': position}
+    rejects_file = open(rejects_path, 'a') if rejects_path else None
+
+    def reject(index, record, reason):
+        stats['rejected'] += 1
+        if rejects_file:
+            rejects_file.write(json.dumps({'record': index, 'error': reason, 'data': record}, default=str) + '\n')
+
+    started = time.monotonic()
+    records = islice(read_records(path, fmt), position, None)
+    try:
+        while True:
+            batch = list(islice(records, batch_size))
+            if not batch:
+                break
+            imported, skipped = import_batch(batch, position, source_key, tags, authors, default_author_id, reject)
+            position += len(batch)
+            save_checkpoint(checkpoint_path, source_key, position)
+
+            stats['imported'] += imported
+            stats['skipped'] += skipped
+            stats['batches'] += 1
+            stats['elapsed'] = time.monotonic() - started
+            stats['per_second'] = stats['imported'] / stats['elapsed'] if stats['elapsed'] else 0.0
+            if progress:
+                progress(stats)
+    finally:
+        if rejects_file:
+            rejects_file.close()
+
+    rebuild_derived()
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    stats['elapsed'] = time.monotonic() - started
+    stats['per_second'] = stats['imported'] / stats['elapsed'] if stats['elapsed'] else 0.0
+    logger.info(f"Imported {stats['imported']} recipes from {path}")
+    return stats
+
+
+@click.command('import-recipes')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['jsonl', 'csv']), default=None,
+              help='Defaults to the file extension')
+@click.option('--batch-size', default=10000, show_default=True, help='Recipes per transaction')
+@click.option('--author', default=None, help='Email or username for records without author_id/author_email')
+@click.option('--checkpoint', default=None, help='Resume file; default <path>.checkpoint, removed once done')
+@click.option('--rejects', default=None, help='Append invalid records here as JSON lines')
+@click.option('--source', default=None,
+              help='Stable feed name for records without an id, e.g. when a partner re-exports '
+                   'a file with new rows appended; default the file content hash')
+@with_appcontext
+def import_recipes_command(path, fmt, batch_size, author, checkpoint, rejects, source):
+    """Bulk-load recipes and their tags from a JSONL or CSV file"""
+    def progress(stats):
+        click.echo(
+            f"batch {stats['batches']}: imported={stats['imported']} skipped={stats['skipped']} "
+            f"rejected={stats['rejected']} rate={stats['per_second']:.0f}/s"
+        )
+
+    stats = import_recipes(
+        path,
+        fmt=fmt,
+        batch_size=batch_size,
+        default_author=author,
+        checkpoint_path=checkpoint or f"{path}.checkpoint",
+        rejects_path=rejects,
+        progress=progress,
+        source=source
+    )
+    click.echo(
+        f"Imported {stats['imported']} recipes in {stats['elapsed']:.1f}s ({stats['per_second']:.0f}/s); "
+        f"{stats['skipped']} already present, {stats['rejected']} rejected"
+    )
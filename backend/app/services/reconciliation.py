@@ -0,0 +1,295 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+import requests
+from flask import current_app
+from flask.cli import with_appcontext
+from requests.adapters import HTTPAdapter
+from sqlalchemy import String, any_, bindparam, column, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from urllib3.util.retry import Retry
+
+from models import db
+from models.payment import Payment
+from models.user import User
+from services.payment_events import REQUEUE_AFTER_MINUTES, requeue_received_events
+from utils.helpers import log_audit_events
+from utils.metrics import track_external
+
+logger = logging.getLogger(__name__)
+
+
+def build_session(concurrency, key_id, key_secret):
+    """One pooled HTTP session shared by all reconciliation threads"""
+    session = requests.Session()
+    session.auth = (key_id, key_secret)
+    adapter = HTTPAdapter(
+        pool_connections=1,
+        pool_maxsize=concurrency,
+        max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def fetch_provider_status(session, api_base, provider_id, timeout=10):
+    """
+    Ask Razorpay what happened to a pending payment.
+    Returns (status, razorpay_payment_id, method) or None when still pending.
+    An order nobody ever attempted to pay is reported as cancelled. Error
+    answers, including Razorpay's 400 for an id it does not know, raise and
+    leave the payment pending.
+    """
+    if provider_id.startswith('pay_'):
+        url = f"{api_base}/v1/payments/{provider_id}"
+    else:
+        url = f"{api_base}/v1/orders/{provider_id}/payments"
+
+    with track_external('razorpay', 'payment.fetch'):
+        response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+
+    body = response.json()
+    items = body['items'] if 'items' in body else [body]
+    if not items:
+        return ('cancelled', None, None)
+
+    for item in items:
+        if item.get('status') == 'captured':
+            return ('completed', item.get('id'), item.get('method'))
+    if all(item.get('status') == 'failed' for item in items):
+        return ('failed', items[-1].get('id'), items[-1].get('method'))
+    return None
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    return datetime.fromisoformat(data['created_at']), uuid.UUID(data['id'])
+
+
+def save_checkpoint(path, created_at, payment_id):
+    if not path:
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'created_at': created_at.isoformat(), 'id': str(payment_id)}, f)
+    os.replace(tmp_path, path)
+
+
+def _uuid_array(name, values):
+    return bindparam(name, values, type_=ARRAY(UUID(as_uuid=True)))
+
+
+def apply_results(rows, results):
+    """
+    Apply one chunk of provider answers in a single transaction. Only rows
+    still pending are changed, so payments a webhook settled in the meantime
+    get neither an audit entry nor a second premium upgrade.
+    """
+    completed = []
+    closed = {'failed': [], 'cancelled': []}
+
+    for row, result in zip(rows, results):
+        if result is None:
+            continue
+        status, razorpay_payment_id, method = result
+        if status == 'completed':
+            completed.append((row.id, razorpay_payment_id or row.payment_id, method))
+        else:
+            closed[status].append(row.id)
+
+    premium_users = set()
+    completed_ids = []
+    if completed:
+        answers = values(
+            column('id', UUID(as_uuid=True)),
+            column('payment_id', String(50)),
+            column('method', String(50)),
+            name='answers'
+        ).data(completed)
+        settled = db.session.execute(
+            update(Payment).where(
+                Payment.id == answers.c.id,
+                Payment.status == 'pending'
+            ).values(
+                status='completed',
+                payment_id=answers.c.payment_id,
+                payment_method=answers.c.method
+            ).returning(
+                Payment.id, Payment.user_id, Payment.description
+            ).execution_options(synchronize_session=False)
+        ).all()
+        completed_ids = [row.id for row in settled]
+        premium_users = {
+            row.user_id for row in settled
+            if row.description and 'premium' in row.description.lower()
+        }
+        log_audit_events(
+            user_id=None,
+            action='RECONCILE',
+            table_name='payments',
+            record_ids=completed_ids,
+            changes={'status': 'completed'}
+        )
+
+    closed_count = 0
+    for status, payment_ids in closed.items():
+        if not payment_ids:
+            continue
+        closed_ids = db.session.execute(
+            update(Payment).where(
+                Payment.id == any_(_uuid_array('payment_ids', payment_ids)),
+                Payment.status == 'pending'
+            ).values(
+                status=status, failure_reason='Not captured by provider'
+            ).returning(Payment.id).execution_options(synchronize_session=False)
+        ).scalars().all()
+        closed_count += len(closed_ids)
+        log_audit_events(
+            user_id=None,
+            action='RECONCILE',
+            table_name='payments',
+            record_ids=closed_ids,
+            changes={'status': status}
+        )
+
+    if premium_users:
+        db.session.execute(
+            update(User).where(
+                User.id == any_(_uuid_array('premium_ids', list(premium_users)))
+            ).values(is_premium=True).execution_options(synchronize_session=False)
+        )
+
+    db.session.commit()
+    return len(completed_ids), closed_count
+
+
+def reconcile_payments(older_than=timedelta(hours=1), chunk_size=200, concurrency=8,
+                       checkpoint_path=None, api_base=None, progress=None,
+                       cancel_after=timedelta(hours=24)):
+    """
+    Walk stale pending payments in (created_at, id) order, chunk by chunk,
+    and settle each chunk against the provider. Orders with no payment
+    attempt are only cancelled once older than `cancel_after`; a customer
+    may still be paying before that. Resumes after the last committed chunk
+    when a checkpoint file is given.
+    """
+    config = current_app.config
+    api_base = (api_base or config.get('RAZORPAY_API_BASE')).rstrip('/')
+    session = build_session(
+        concurrency,
+        os.getenv('RAZORPAY_KEY_ID'),
+        os.getenv('RAZORPAY_KEY_SECRET')
+    )
+
+    cutoff = datetime.utcnow() - older_than
+    cancel_cutoff = datetime.utcnow() - cancel_after
+    position = load_checkpoint(checkpoint_path)
+    stats = {'checked': 0, 'completed': 0, 'closed': 0, 'errors': 0, 'chunks': 0}
+    started = time.monotonic()
+    errors_lock = threading.Lock()
+
+    def check(row):
+        try:
+            result = fetch_provider_status(session, api_base, row.payment_id)
+        except Exception as e:
+            logger.warning(f"Reconciliation lookup failed for payment {row.id} : {e}")
+            with errors_lock:
+                stats['errors'] += 1
+            return None
+        if result and result[0] == 'cancelled' and row.created_at >= cancel_cutoff:
+            return None
+        return result
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        while True:
+            stmt = select(
+                Payment.id, Payment.payment_id, Payment.user_id,
+                Payment.description, Payment.created_at
+            ).where(
+                Payment.status == 'pending',
+                Payment.created_at < cutoff,
+                Payment.payment_id.isnot(None)
+            ).order_by(Payment.created_at, Payment.id).limit(chunk_size)
+            if position:
+                stmt = stmt.where(tuple_(Payment.created_at, Payment.id) > tuple_(*position))
+
+            rows = db.session.execute(stmt).all()
+            # Don't hold the read transaction open during provider calls
+            db.session.commit()
+            if not rows:
+                break
+
+            results = list(executor.map(check, rows))
+            completed, closed = apply_results(rows, results)
+
+            position = (rows[-1].created_at, rows[-1].id)
+            save_checkpoint(checkpoint_path, *position)
+
+            stats['checked'] += len(rows)
+            stats['completed'] += completed
+            stats['closed'] += closed
+            stats['chunks'] += 1
+            stats['elapsed'] = time.monotonic() - started
+            stats['per_second'] = stats['checked'] / stats['elapsed'] if stats['elapsed'] else 0.0
+            if progress:
+                progress(stats)
+
+    session.close()
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    stats['elapsed'] = time.monotonic() - started
+    stats['per_second'] = stats['checked'] / stats['elapsed'] if stats['elapsed'] else 0.0
+    return stats
+
+
+@click.command('reconcile-payments')
+@click.option('--older-than', default=60, show_default=True, help='Minutes a payment must have been pending')
+@click.option('--cancel-after', default=1440, show_default=True,
+              help='Minutes before an order with no payment attempt is cancelled')
+@click.option('--chunk-size', default=200, show_default=True)
+@click.option('--concurrency', default=8, show_default=True, help='Parallel provider lookups')
+@click.option('--checkpoint', default='reconcile_payments.checkpoint', show_default=True,
+              help='Resume file; removed once a run finishes')
+@click.option('--api-base', default=None, help='Override RAZORPAY_API_BASE (e.g. a local fake)')
+@with_appcontext
+def reconcile_payments_command(older_than, cancel_after, chunk_size, concurrency, checkpoint, api_base):
+    """Settle stale pending payments against Razorpay"""
+    # Stuck webhook events are cheaper to apply than a provider lookup, and
+    # without a worker nothing else retries them
+    requeued = requeue_received_events(older_than=timedelta(minutes=REQUEUE_AFTER_MINUTES))
+    if requeued:
+        click.echo(f"Requeued {requeued} payment events")
+
+    def progress(stats):
+        click.echo(
+            f"chunk {stats['chunks']}: checked={stats['checked']} completed={stats['completed']} "
+            f"failed/cancelled={stats['closed']} errors={stats['errors']} rate={stats['per_second']:.1f}/s"
+        )
+
+    stats = reconcile_payments(
+        older_than=timedelta(minutes=older_than),
+        cancel_after=timedelta(minutes=cancel_after),
+        chunk_size=chunk_size,
+        concurrency=concurrency,
+        checkpoint_path=checkpoint,
+        api_base=api_base,
+        progress=progress
+    )
+    click.echo(
+        f"Reconciled {stats['checked']} payments in {stats['elapsed']:.1f}s "
+        f"({stats['per_second']:.1f}/s): {stats['completed']} completed, "
+        f"{stats['closed']} failed or cancelled, {stats['errors']} lookup errors"
+    )
@@ -0,0 +1,289 @@
+import gzip
+import hashlib
+import io
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import desc, func, select, tuple_
+
+from models import db
+from models.recipe import Recipe
+from models.user import User
+
+logger = logging.getLogger(__name__)
+
+STATE_FILE = 'state.json'
+INDEX_FILE = 'sitemap.xml'
+SHARD_NAME = 'sitemap-recipes-{:04d}.xml.gz'
+FEEDS = ('recipes', 'featured')
+SUMMARY_CHARS = 300
+
+
+def output_folder():
+    path = current_app.config['SITEMAP_FOLDER']
+    if not os.path.isabs(path):
+        path = os.path.join(current_app.root_path, path)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _w3c(moment):
+    return moment.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def _recipe_url(recipe_id):
+    config = current_app.config
+    return config['SITE_URL'].rstrip('/') + config['SITE_RECIPE_PATH'].format(id=recipe_id)
+
+
+def _write(folder, name, data):
+    """Atomically replace a file; returns its ETag (a content hash)"""
+    path = os.path.join(folder, name)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def _gzip(data):
+    # Fixed mtime so unchanged content gives identical bytes and the same ETag
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0, filename='') as f:
+        f.write(data)
+    return buffer.getvalue()
+
+
+def load_state(folder):
+    path = os.path.join(folder, STATE_FILE)
+    if not os.path.exists(path):
+        return {'shards': [], 'feeds': {}, 'index': None}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_state(folder, state):
+    _write(folder, STATE_FILE, json.dumps(state, indent=2).encode())
+
+
+def _key(values):
+    return (datetime.fromisoformat(values[0]), uuid.UUID(values[1])) if values else None
+
+
+def _shard_filter(start, end):
+    """Recipes in [start, end) by (created_at, id); None means unbounded"""
+    order_key = tuple_(Recipe.created_at, Recipe.id)
+    clauses = [Recipe.is_deleted == False]  # noqa: E712
+    if start:
+        clauses.append(order_key >= tuple_(*start))
+    if end:
+        clauses.append(order_key < tuple_(*end))
+    return clauses
+
+
+def _shard_range(shards, position):
+    """(start, end) keys of a shard; it ends where the next one starts"""
+    following = shards[position + 1]['start'] if position + 1 < len(shards) else None
+    return _key(shards[position]['start']), _key(following)
+
+
+def _split_shard(shards, position, shard_size):
+    """
+    Move everything past the first shard_size rows of a shard into a new
+    shard right after it.
+
+    Shards are ranges of (created_at, id) with fixed starting keys, so
+    deleting a recipe never moves others between shards. New recipes land
+    in the last shard, but backdated ones (imports) land in whichever shard
+    covers their created_at, so any shard can outgrow the limit.
+    """
+    start, end = _shard_range(shards, position)
+    boundary = db.session.execute(
+        select(Recipe.created_at, Recipe.id).where(*_shard_filter(start, end))
+        .order_by(Recipe.created_at, Recipe.id).offset(shard_size).limit(1)
+    ).one()
+    shards.insert(position + 1, {
+        'name': SHARD_NAME.format(len(shards) + 1),
+        'start': [boundary.created_at.isoformat(), str(boundary.id)],
+        'fingerprint': None
+    })
+
+
+def _fingerprint(start, end):
+    """Row count and newest change in a shard; a shard is rewritten only when this changes"""
+    count, lastmod = db.session.execute(
+        select(func.count(), func.max(func.coalesce(Recipe.updated_at, Recipe.created_at)))
+        .where(*_shard_filter(start, end))
+    ).one()
+    return [count, lastmod.isoformat() if lastmod else None]
+
+
+def _render_shard(start, end):
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+    ]
+    rows = db.session.execute(
+        select(Recipe.id, Recipe.created_at, Recipe.updated_at).where(*_shard_filter(start, end))
+        .order_by(Recipe.created_at, Recipe.id).execution_options(yield_per=5000)
+    )
+    for row in rows:
+        lines.append(
+            f"<url><loc>{escape(_recipe_url(row.id))}</loc>"
+            f"<lastmod>{_w3c(row.updated_at or row.created_at)}</lastmod></url>"
+        )
+    lines.append('</urlset>')
+    return _gzip('\n'.join(lines).encode())
+
+
+def _render_index(shards):
+    base = current_app.config['SITEMAP_BASE_URL'].rstrip('/')
+    lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+    ]
+    for shard in shards:
+        lastmod = shard['fingerprint'][1]
+        lines.append(
+            f"<sitemap><loc>{escape(base)}/sitemaps/{shard['name']}</loc>"
+            + (f"<lastmod>{_w3c(datetime.fromisoformat(lastmod))}</lastmod>" if lastmod else '')
+            + '</sitemap>'
+        )
+    lines.append('</sitemapindex>')
+    return '\n'.join(lines).encode()
+
+
+def _feed_query(name, limit):
+    query = select(Recipe, User.username).join(User, Recipe.author_id == User.id).where(
+        Recipe.is_deleted == False  # noqa: E712
+    )
+    if name == 'featured':
+        query = query.where(Recipe.is_featured == True)  # noqa: E712
+    return query.order_by(desc(Recipe.created_at), desc(Recipe.id)).limit(limit)
+
+
+def _render_feed(name, rows):
+    config = current_app.config
+    base = config['SITEMAP_BASE_URL'].rstrip('/')
+    title = 'Featured recipes' if name == 'featured' else 'New recipes'
+    updated = max(
+        ((recipe.updated_at or recipe.created_at) for recipe, _ in rows),
+        default=datetime(1970, 1, 1)
+    )
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        '<feed xmlns="http://www.w3.org/2005/Atom">',
+        f"<id>{escape(base)}/feeds/{name}.atom</id>",
+        f"<title>{escape(title)}</title>",
+        f"<updated>{_w3c(updated)}</updated>",
+        f'<link rel="self" href="{escape(base)}/feeds/{name}.atom"/>',
+        f'<link rel="alternate" href="{escape(config["SITE_URL"])}"/>'
+    ]
+    for recipe, username in rows:
+        description = recipe.description or ''
+        summary = description if len(description) <= SUMMARY_CHARS else description[:SUMMARY_CHARS - 3] + '...'
+        lines.extend([
+            '<entry>',
+            f"<id>urn:uuid:{recipe.id}</id>",
+            f"<title>{escape(recipe.title)}</title>",
+            f'<link href="{escape(_recipe_url(recipe.id))}"/>',
+            f"<published>{_w3c(recipe.created_at)}</published>",
+            f"<updated>{_w3c(recipe.updated_at or recipe.created_at)}</updated>",
+            f"<author><name>{escape(username)}</name></author>",
+            f"<summary>{escape(summary)}</summary>",
+            '</entry>'
+        ])
+    lines.append('</feed>')
+    return '\n'.join(lines).encode()
+
+
+def generate(force=False):
+    """
+    Bring the sitemap shards, sitemap index and Atom feeds up to date,
+    rewriting only the files whose content changed. Returns what was
+    written.
+    """
+    config = current_app.config
+    folder = output_folder()
+    state = load_state(folder)
+    stats = {'shards': 0, 'shards_written': 0, 'feeds_written': 0, 'index_written': False}
+    started = time.monotonic()
+
+    shards = state['shards'] or [{'name': SHARD_NAME.format(1), 'start': None, 'fingerprint': None}]
+    shard_size = config['SITEMAP_SHARD_SIZE']
+
+    # Shards split off during the loop are checked when it reaches them
+    position = 0
+    while position < len(shards):
+        shard = shards[position]
+        fingerprint = _fingerprint(*_shard_range(shards, position))
+        if fingerprint[0] > shard_size:
+            _split_shard(shards, position, shard_size)
+            fingerprint = _fingerprint(*_shard_range(shards, position))
+        start, end = _shard_range(shards, position)
+        missing = not os.path.exists(os.path.join(folder, shard['name']))
+        if force or missing or fingerprint != shard['fingerprint']:
+            shard['etag'] = _write(folder, shard['name'], _render_shard(start, end))
+            shard['fingerprint'] = fingerprint
+            stats['shards_written'] += 1
+        position += 1
+    db.session.commit()
+    stats['shards'] = len(shards)
+    state['shards'] = shards
+
+    index = _render_index(shards)
+    index_etag = hashlib.sha256(index).hexdigest()[:32]
+    if force or index_etag != state.get('index') or not os.path.exists(os.path.join(folder, INDEX_FILE)):
+        state['index'] = _write(folder, INDEX_FILE, index)
+        stats['index_written'] = True
+
+    for name in FEEDS:
+        rows = db.session.execute(_feed_query(name, config['FEED_SIZE'])).all()
+        fingerprint = hashlib.sha256(json.dumps([
+            [str(recipe.id), (recipe.updated_at or recipe.created_at).isoformat()] for recipe, _ in rows
+        ]).encode()).hexdigest()
+        filename = f"{name}.atom"
+        previous = state['feeds'].get(name) or {}
+        if force or fingerprint != previous.get('fingerprint') or not os.path.exists(os.path.join(folder, filename)):
+            etag = _write(folder, filename, _render_feed(name, rows))
+            state['feeds'][name] = {'fingerprint': fingerprint, 'etag': etag}
+            stats['feeds_written'] += 1
+    db.session.commit()
+
+    save_state(folder, state)
+    stats['elapsed'] = time.monotonic() - started
+    return stats
+
+
+def etag_for(name):
+    """ETag recorded for a generated file, None if unknown"""
+    state = load_state(output_folder())
+    if name == INDEX_FILE:
+        return state.get('index')
+    for shard in state['shards']:
+        if shard['name'] == name:
+            return shard.get('etag')
+    for feed, entry in state['feeds'].items():
+        if f"{feed}.atom" == name:
+            return entry.get('etag')
+    return None
+
+
+@click.command('generate-sitemaps')
+@click.option('--force', is_flag=True, help='Rewrite every file, not just changed ones')
+@with_appcontext
+def generate_sitemaps_command(force):
+    """Incrementally regenerate sitemap shards, the sitemap index and Atom feeds"""
+    stats = generate(force=force)
+    click.echo(
+        f"{stats['shards_written']}/{stats['shards']} sitemap shards and {stats['feeds_written']} feeds "
+        f"rewritten{', index updated' if stats['index_written'] else ''} in {stats['elapsed']:.1f}s"
+    )
@@ -0,0 +1,230 @@
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from flask import current_app
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Raised when an upload chunk can't be accepted"""
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, expected):
+        super().__init__(f"Upload offset mismatch, expected {expected}")
+        self.expected = expected
+
+
+class UploadGone(UploadError):
+    """Raised when an upload's data no longer exists (cleaned up or already finalized)"""
+    def __init__(self, upload_id):
+        super().__init__("Upload no longer exists")
+        self.upload_id = upload_id
+
+
+class StorageBackend(ABC):
+    """
+    Interface for file storage with offset-based resumable uploads.
+
+    An upload is created with its expected size, receives chunks appended at
+    the current offset, and is finalized under a permanent name once
+    complete.
+    """
+
+    @abstractmethod
+    def create_upload(self, upload_id, meta):
+        """Start an empty upload and store its metadata"""
+
+    @abstractmethod
+    def upload_meta(self, upload_id):
+        """Metadata of an upload, or None if unknown"""
+
+    @abstractmethod
+    def update_meta(self, upload_id, **changes):
+        """Merge changes into an upload's metadata and return it"""
+
+    @abstractmethod
+    def upload_offset(self, upload_id):
+        """Bytes received so far; raises UploadGone when the data is missing"""
+
+    @abstractmethod
+    def append(self, upload_id, offset, chunks, limit):
+        """Append chunks at `offset` and return the new offset"""
+
+    @abstractmethod
+    def finalize(self, upload_id, ext):
+        """Store a complete upload under its permanent name and return the name"""
+
+    @abstractmethod
+    def delete_upload(self, upload_id):
+        """Discard an upload and its metadata"""
+
+    @abstractmethod
+    def url(self, name):
+        """Public URL of a stored file"""
+
+    def local_path(self, name):
+        """Filesystem path of a stored file, or None for remote backends"""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """
+    Stores files under `root`, served from `url_prefix`. In-progress uploads
+    live in `uploads_dir`, outside the served tree.
+    """
+
+    def __init__(self, root, url_prefix, uploads_dir):
+        self.root = root
+        self.url_prefix = url_prefix.rstrip('/')
+        self.uploads = uploads_dir
+        os.makedirs(self.root, exist_ok=True)
+        os.makedirs(self.uploads, exist_ok=True)
+
+    def _part(self, upload_id):
+        return os.path.join(self.uploads, f"{upload_id}.part")
+
+    def _meta(self, upload_id):
+        return os.path.join(self.uploads, f"{upload_id}.json")
+
+    @contextmanager
+    def _locked(self, upload_id):
+        """Serialise writers of one upload, across threads and processes"""
+        try:
+            # No O_CREAT: a removed upload must not come back empty
+            fd = os.open(self._part(upload_id), os.O_WRONLY | os.O_APPEND)
+        except FileNotFoundError:
+            raise UploadGone(upload_id)
+        with os.fdopen(fd, 'ab') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield handle
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def create_upload(self, upload_id, meta):
+        open(self._part(upload_id), 'xb').close()
+        self._write_meta(upload_id, dict(meta, created_at=time.time()))
+
+    def _write_meta(self, upload_id, meta):
+        tmp_path = f"{self._meta(upload_id)}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta(upload_id))
+
+    def upload_meta(self, upload_id):
+        try:
+            with open(self._meta(upload_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def update_meta(self, upload_id, **changes):
+        meta = self.upload_meta(upload_id) or {}
+        meta.update(changes)
+        self._write_meta(upload_id, meta)
+        return meta
+
+    def upload_offset(self, upload_id):
+        try:
+            return os.path.getsize(self._part(upload_id))
+        except FileNotFoundError:
+            raise UploadGone(upload_id)
+
+    def append(self, upload_id, offset, chunks, limit):
+        """
+        Append chunks at `offset`. Writes at most `limit` bytes in total and
+        raises UploadError if the body carries more. Returns the new offset.
+        """
+        with self._locked(upload_id) as handle:
+            current = os.path.getsize(self._part(upload_id))
+            if current != offset:
+                raise OffsetMismatch(current)
+
+            written = 0
+            try:
+                for chunk in chunks:
+                    written += len(chunk)
+                    if written > limit:
+                        raise UploadError("Upload exceeds its declared size")
+                    handle.write(chunk)
+            finally:
+                # Keep whatever arrived intact; a dropped connection resumes from here
+                handle.flush()
+            return os.path.getsize(self._part(upload_id))
+
+    def finalize(self, upload_id, ext):
+        """Move a complete upload to its content-addressed name"""
+        part = self._part(upload_id)
+        digest = hashlib.sha256()
+        try:
+            with open(part, 'rb') as f:
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            raise UploadGone(upload_id)
+
+        name = f"{digest.hexdigest()}.{ext}"
+        target = os.path.join(self.root, name)
+        if os.path.exists(target):
+            os.unlink(part)
+        else:
+            shutil.move(part, target)
+        os.unlink(self._meta(upload_id))
+        return name
+
+    def delete_upload(self, upload_id):
+        for path in (self._part(upload_id), self._meta(upload_id)):
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def cleanup_stale_uploads(self, max_age=24 * 3600):
+        """Remove uploads nobody resumed within `max_age` seconds"""
+        cutoff = time.time() - max_age
+        removed = 0
+        for entry in os.scandir(self.uploads):
+            if entry.name.endswith('.part') and entry.stat().st_mtime < cutoff:
+                self.delete_upload(entry.name[:-len('.part')])
+                removed += 1
+        return removed
+
+    def url(self, name):
+        return f"{self.url_prefix}/{name}"
+
+    def local_path(self, name):
+        return os.path.join(self.root, name)
+
+
+def _local_storage():
+    config = current_app.config
+    folder = config['RECIPE_IMAGE_FOLDER']
+    uploads_dir = config['IMAGE_STAGING_FOLDER']
+    if not os.path.isabs(uploads_dir):
+        uploads_dir = os.path.join(current_app.root_path, uploads_dir)
+    return LocalStorage(
+        os.path.join(current_app.root_path, 'static', folder),
+        f"/img/{folder}",
+        os.path.join(uploads_dir, 'resumable')
+    )
+
+
+# Backend factories by STORAGE_BACKEND name
+STORAGE_BACKENDS = {
+    'local': _local_storage,
+}
+
+
+def get_storage():
+    """Storage backend configured for this app, built once per app"""
+    storage = current_app.extensions.get('storage')
+    if storage is None:
+        factory = STORAGE_BACKENDS[current_app.config['STORAGE_BACKEND']]
+        storage = current_app.extensions['storage'] = factory()
+    return storage
@@ -0,0 +1,194 @@
+import json
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from extensions import get_redis_client
+from utils.tracing import continued_span, current_carrier
+
+logger = logging.getLogger(__name__)
+
+# Every queue created in the process, by name, so the worker command can find it
+QUEUES = {}
+
+
+class TaskQueue:
+    """
+    Small sharded task queue.
+
+    Tasks carry an optional ordering key; all tasks with the same key land on
+    the same shard and, with one consumer per shard, run in the order they
+    were enqueued. Queues whose tasks need no ordering can give each shard
+    several consumers instead: `consumers` is a count, or the name of the
+    config value holding it. Shards are Redis lists consumed by
+    `flask worker <queue>`. Without Redis each shard is an executor with that
+    many threads inside the web process.
+    """
+
+    def __init__(self, name, shards=1, max_attempts=3, consumers=1):
+        self.name = name
+        self.shards = shards
+        self.max_attempts = max_attempts
+        self.consumers = consumers
+        self.handlers = {}
+        # Optional callable run once by `flask worker` before consuming
+        self.on_start = None
+        self._executors = {}
+        self._lock = threading.Lock()
+        QUEUES[name] = self
+
+    def task(self, fn):
+        """Register a handler under its function name"""
+        self.handlers[fn.__name__] = fn
+        return fn
+
+    def shard_for(self, key):
+        """Stable shard for an ordering key"""
+        if key is None or self.shards == 1:
+            return 0
+        return zlib.crc32(str(key).encode()) % self.shards
+
+    def consumer_count(self):
+        """Consumers per shard; needs an app context when read from config"""
+        if isinstance(self.consumers, str):
+            return max(int(current_app.config[self.consumers]), 1)
+        return self.consumers
+
+    def list_key(self, shard):
+        return f"queue:{self.name}:{shard}"
+
+    @property
+    def dead_letter_key(self):
+        return f"queue:{self.name}:dead"
+
+    def enqueue(self, task_name, payload, key=None):
+        """Queue a task; returns immediately"""
+        if task_name not in self.handlers:
+            raise ValueError(f"Unknown task {task_name} for queue {self.name}")
+
+        shard = self.shard_for(key)
+        # The trace context travels with the task so its spans join the enqueuing request's trace
+        message = json.dumps({
+            'task': task_name,
+            'payload': payload,
+            'attempts': 0,
+            'trace': current_carrier()
+        })
+
+        redis_client = get_redis_client()
+        if redis_client:
+            try:
+                redis_client.lpush(self.list_key(shard), message)
+                return
+            except Exception as e:
+                logger.error(f"Enqueue to Redis failed, running in-process : {e}")
+
+        app = current_app._get_current_object()
+        self._executor(shard).submit(self._run_in_app, app, message)
+
+    def _executor(self, shard):
+        with self._lock:
+            executor = self._executors.get(shard)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=self.consumer_count(), thread_name_prefix=f"{self.name}-{shard}"
+                )
+                self._executors[shard] = executor
+            return executor
+
+    def _run_in_app(self, app, message):
+        with app.app_context():
+            self.execute(message)
+
+    def execute(self, message):
+        """Run one message, retrying in place so later tasks keep their order"""
+        data = json.loads(message)
+        handler = self.handlers.get(data['task'])
+        if handler is None:
+            logger.error(f"No handler for task {data['task']} on queue {self.name}")
+            return False
+
+        from models import db
+
+        with continued_span(f"task {self.name}.{data['task']}", data.get('trace'), queue=self.name):
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    handler(**data['payload'])
+                    return True
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(
+                        f"Task {self.name}.{data['task']} failed (attempt {attempt}/{self.max_attempts}) : {e}"
+                    )
+                    if attempt < self.max_attempts:
+                        time.sleep(min(2 ** attempt * 0.1, 2))
+                finally:
+                    db.session.remove()
+
+        data['attempts'] = self.max_attempts
+        redis_client = get_redis_client()
+        if redis_client:
+            redis_client.lpush(self.dead_letter_key, json.dumps(data))
+        logger.error(f"Task {self.name}.{data['task']} moved to dead letter : {data['payload']}")
+        return False
+
+    def work(self, shard, block_timeout=5, stop=None):
+        """Consume one shard until `stop` is set"""
+        redis_client = get_redis_client()
+        if not redis_client:
+            raise RuntimeError("Redis is required to run a standalone worker")
+
+        key = self.list_key(shard)
+        logger.info(f"Worker consuming {key}")
+        while not (stop and stop.is_set()):
+            item = redis_client.brpop(key, timeout=block_timeout)
+            if item is None:
+                continue
+            self.execute(item[1])
+
+
+@click.command('worker')
+@click.argument('queue')
+@click.option('--shard', type=int, multiple=True, help='Shard(s) to consume, default all')
+@with_appcontext
+def worker_command(queue, shard):
+    """Run a task queue worker"""
+    # Importing the services registers their queues and handlers
+    import services.payment_events  # noqa: F401
+    import services.ai_jobs  # noqa: F401
+
+    task_queue = QUEUES.get(queue)
+    if task_queue is None:
+        raise click.BadParameter(f"Unknown queue {queue}, expected one of: {', '.join(QUEUES)}")
+
+    if task_queue.on_start:
+        task_queue.on_start()
+
+    shards = shard or range(task_queue.shards)
+    app = current_app._get_current_object()
+    stop = threading.Event()
+
+    def consume(index):
+        with app.app_context():
+            task_queue.work(index, stop=stop)
+
+    threads = [
+        threading.Thread(target=consume, args=(index,), name=f"{queue}-{index}-{consumer}", daemon=True)
+        for index in shards
+        for consumer in range(task_queue.consumer_count())
+    ]
+    for thread in threads:
+        thread.start()
+
+    click.echo(f"Consuming {queue} shards {list(shards)}")
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop.set()
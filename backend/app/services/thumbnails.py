@@ -0,0 +1,230 @@
+import fcntl
+import hashlib
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from flask import current_app
+
+from services.image_pipeline import get_pool, render_thumbnail
+from utils.metrics import Counter, Histogram, counter_value
+
+logger = logging.getLogger(__name__)
+
+# A cache hit only rewrites the file's mtime (our recency stamp) this often
+TOUCH_INTERVAL = 300
+# Eviction trims the cache to this fraction of IMAGE_THUMB_CACHE_BYTES
+EVICT_TARGET = 0.9
+# Bytes written since the last eviction scan that trigger the next one
+EVICT_SCAN_FRACTION = 0.05
+
+THUMBNAIL_LOOKUPS = Counter(
+    'image_thumbnail_lookups_total',
+    'Thumbnail requests by outcome (hit, miss, coalesced)',
+    ['result']
+)
+THUMBNAIL_EVICTIONS = Counter(
+    'image_thumbnail_evictions_total',
+    'Thumbnails removed from the disk cache to stay under its size limit'
+)
+RESIZE_SECONDS = Histogram(
+    'image_thumbnail_resize_seconds',
+    'Time to render a thumbnail in the image process pool',
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+)
+
+
+class ThumbnailCache:
+    """
+    On-disk LRU cache of resized images.
+
+    Entries are named by a hash of the source file's identity and the
+    requested size, so a replaced source never serves a stale thumbnail.
+    Recency is the entry's mtime, refreshed on hits. Once enough new bytes
+    have been written, a background scan deletes least recently used entries
+    until the cache is back under its size limit.
+
+    Concurrent requests for one entry are coalesced: threads in this process
+    wait on the leader's future, and other processes wait on a per-entry file
+    lock, then find the finished file.
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._written = 0
+        self._evicting = False
+
+    def directory(self):
+        path = current_app.config['IMAGE_THUMB_CACHE_FOLDER']
+        if not os.path.isabs(path):
+            path = os.path.join(current_app.root_path, path)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def entry_name(self, source_path, width, height, fit, fmt):
+        stat = os.stat(source_path)
+        identity = f"{source_path}:{stat.st_mtime_ns}:{stat.st_size}:{width}:{height}:{fit}:{fmt}"
+        return f"{hashlib.sha256(identity.encode()).hexdigest()}.{fmt}"
+
+    def get(self, source_path, width, height, fit, fmt):
+        """Path of the cached thumbnail, rendering it first if needed"""
+        path = os.path.join(self.directory(), self.entry_name(source_path, width, height, fit, fmt))
+        if self._touch(path):
+            THUMBNAIL_LOOKUPS.labels('hit').inc()
+            return path
+
+        with self._lock:
+            future = self._inflight.get(path)
+            leader = future is None
+            if leader:
+                future = self._inflight[path] = Future()
+
+        if not leader:
+            THUMBNAIL_LOOKUPS.labels('coalesced').inc()
+            return future.result(timeout=current_app.config['IMAGE_THUMB_TIMEOUT'])
+
+        try:
+            self._render_locked(source_path, path, width, height, fit, fmt)
+            future.set_result(path)
+            return path
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(path, None)
+
+    def _touch(self, path):
+        """True if the entry exists; refreshes its recency at most every TOUCH_INTERVAL"""
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            return False
+        if time.time() - mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def _render_locked(self, source_path, path, width, height, fit, fmt):
+        lock_path = f"{path}.lock"
+        with open(lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another worker process may have rendered it while we waited
+                if os.path.exists(path):
+                    THUMBNAIL_LOOKUPS.labels('coalesced').inc()
+                    return
+                THUMBNAIL_LOOKUPS.labels('miss').inc()
+
+                started = time.perf_counter()
+                size = get_pool().submit(
+                    render_thumbnail, source_path, path, width, height, fit, fmt
+                ).result(timeout=current_app.config['IMAGE_THUMB_TIMEOUT'])
+                RESIZE_SECONDS.observe(time.perf_counter() - started)
+            finally:
+                # Waiters re-check for the file after locking, so unlinking here is safe
+                try:
+                    os.unlink(lock_path)
+                except FileNotFoundError:
+                    pass
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+        self._account(size)
+
+    def _account(self, size):
+        max_bytes = current_app.config['IMAGE_THUMB_CACHE_BYTES']
+        with self._lock:
+            self._written += size
+            if self._evicting or self._written < max_bytes * EVICT_SCAN_FRACTION:
+                return
+            self._written = 0
+            self._evicting = True
+
+        thread = threading.Thread(
+            target=self._evict_in_background,
+            args=(self.directory(), max_bytes),
+            daemon=True
+        )
+        thread.start()
+
+    def _evict_in_background(self, directory, max_bytes):
+        try:
+            self.evict(directory, max_bytes)
+        except Exception as e:
+            logger.error(f"Thumbnail cache eviction failed : {e}")
+        finally:
+            with self._lock:
+                self._evicting = False
+
+    def evict(self, directory, max_bytes):
+        """Delete least recently used entries until the cache fits. Returns the count removed."""
+        with open(os.path.join(directory, '.evict.lock'), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another process is already evicting
+                return 0
+
+            try:
+                entries, total = self._scan(directory)
+                if total <= max_bytes:
+                    return 0
+
+                target = max_bytes * EVICT_TARGET
+                removed = 0
+                for mtime, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        continue
+                    total -= size
+                    removed += 1
+                THUMBNAIL_EVICTIONS.inc(removed)
+                return removed
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _scan(self, directory):
+        entries = []
+        total = 0
+        for entry in os.scandir(directory):
+            if entry.name.startswith('.') or entry.name.endswith(('.lock', '.tmp')):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+        return entries, total
+
+    def stats(self):
+        """Disk usage of the cache and this process's hit ratio and resize latency"""
+        entries, total = self._scan(self.directory())
+        hits = counter_value(THUMBNAIL_LOOKUPS, result='hit')
+        misses = counter_value(THUMBNAIL_LOOKUPS, result='miss')
+        coalesced = counter_value(THUMBNAIL_LOOKUPS, result='coalesced')
+        lookups = hits + misses + coalesced
+        resizes = RESIZE_SECONDS.labels().get()
+        return {
+            'entries': len(entries),
+            'bytes': total,
+            'max_bytes': current_app.config['IMAGE_THUMB_CACHE_BYTES'],
+            'hits': int(hits),
+            'misses': int(misses),
+            'coalesced': int(coalesced),
+            'evictions': int(THUMBNAIL_EVICTIONS.labels().get()['value']),
+            'hit_rate': round((hits + coalesced) / lookups, 4) if lookups else 0.0,
+            'resizes': resizes['count'],
+            'avg_resize_ms': round(resizes['sum'] / resizes['count'] * 1000, 1) if resizes['count'] else 0.0
+        }
+
+
+thumbnail_cache = ThumbnailCache()
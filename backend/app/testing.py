@@ -0,0 +1,46 @@
+"""
+Test helpers. Import the fixture into a conftest.py to use it:
+
+    from testing import query_budget
+
+    def test_recipe_list(client, query_budget):
+        with query_budget(3):
+            client.get('/api/recipes')
+"""
+from contextlib import contextmanager
+
+from utils.sql_profiler import capture
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def assert_query_budget(max_queries, allow_n_plus_one=False, n_plus_one_threshold=5):
+    """Fail if the block runs more than `max_queries` statements, or an N+1 pattern unless allowed"""
+    with capture(n_plus_one_threshold) as profile:
+        yield profile
+
+    problems = []
+    if profile.count > max_queries:
+        problems.append(f"{profile.count} queries ran, budget is {max_queries}")
+    if not allow_n_plus_one and profile.n_plus_one():
+        problems.append("possible N+1 queries")
+    if problems:
+        details = '\n'.join(
+            f"  {item['count']}x {item['shape']}" for item in profile.n_plus_one()
+        ) or '\n'.join(f"  {item['ms']}ms {item['shape']}" for item in profile.summary()['slowest'])
+        raise QueryBudgetExceeded(f"{'; '.join(problems)}\n{details}")
+
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture
+    def query_budget():
+        """assert_query_budget, as a fixture"""
+        return assert_query_budget
@@ -0,0 +1,222 @@
+import time
+import zlib
+
+from flask import current_app, request
+
+from utils.metrics import Counter, Histogram
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_SECONDS = Histogram(
+    'http_response_compression_seconds',
+    'CPU time spent compressing one response body, by encoding',
+    ['encoding'],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+)
+COMPRESSION_RATIO = Histogram(
+    'http_response_compression_ratio',
+    'Compressed size as a fraction of the original, by encoding',
+    ['encoding'],
+    buckets=(0.05, 0.1, 0.15, 0.2, 0.3, 0.4, 0.5, 0.7, 0.9, 1.0)
+)
+COMPRESSION_BYTES = Counter(
+    'http_response_compression_bytes_total',
+    'Response bytes before (in) and after (out) compression, by encoding',
+    ['encoding', 'direction']
+)
+COMPRESSION_SKIPPED = Counter(
+    'http_response_compression_skipped_total',
+    'Compressible responses sent uncompressed, by reason',
+    ['reason']
+)
+
+
+class _Gzip:
+    def __init__(self, level):
+        # wbits 31: gzip container rather than a bare zlib stream
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class _Brotli:
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class _Zstd:
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+# Content-Encoding token -> compressor, for the libraries that are installed
+COMPRESSORS = {'gzip': _Gzip}
+if brotli is not None:
+    COMPRESSORS['br'] = _Brotli
+if zstandard is not None:
+    COMPRESSORS['zstd'] = _Zstd
+
+
+def negotiate(accept_encodings, preference):
+    """
+    The encoding to use for a request's Accept-Encoding, or None. Highest
+    client q-value wins; ties go to the earliest in `preference`.
+    """
+    best, best_quality = None, 0
+    for encoding in preference:
+        if encoding not in COMPRESSORS:
+            continue
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def _compressible(response, config):
+    mimetype = response.mimetype or ''
+    return mimetype.startswith('text/') or mimetype in config['COMPRESSION_MIMETYPES']
+
+
+def _record(encoding, cpu_seconds, size_in, size_out):
+    COMPRESSION_SECONDS.labels(encoding).observe(cpu_seconds)
+    COMPRESSION_BYTES.labels(encoding, 'in').inc(size_in)
+    COMPRESSION_BYTES.labels(encoding, 'out').inc(size_out)
+    if size_in:
+        COMPRESSION_RATIO.labels(encoding).observe(size_out / size_in)
+
+
+def _compress_body(response, encoding, level):
+    data = response.get_data()
+    started = time.thread_time()
+    compressor = COMPRESSORS[encoding](level)
+    compressed = compressor.compress(data) + compressor.finish()
+    _record(encoding, time.thread_time() - started, len(data), len(compressed))
+    response.set_data(compressed)
+
+
+def _compress_stream(response, encoding, level, flush_bytes):
+    """
+    Wrap a streamed body in an incremental compressor. Output is flushed per
+    chunk for server-sent events, and otherwise once `flush_bytes` of input
+    has built up, so clients keep receiving data as it is produced.
+    """
+    source = response.response
+    chunks = response.iter_encoded()
+    flush_every_chunk = response.mimetype == 'text/event-stream'
+
+    def generate():
+        compressor = COMPRESSORS[encoding](level)
+        cpu_seconds, size_in, size_out, pending = 0.0, 0, 0, 0
+        try:
+            for chunk in chunks:
+                started = time.thread_time()
+                output = compressor.compress(chunk)
+                pending += len(chunk)
+                if flush_every_chunk or pending >= flush_bytes:
+                    output += compressor.flush()
+                    pending = 0
+                cpu_seconds += time.thread_time() - started
+                size_in += len(chunk)
+                size_out += len(output)
+                if output:
+                    yield output
+            started = time.thread_time()
+            output = compressor.finish()
+            cpu_seconds += time.thread_time() - started
+            size_out += len(output)
+            yield output
+            _record(encoding, cpu_seconds, size_in, size_out)
+        finally:
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
+
+    response.response = generate()
+    response.headers.pop('Content-Length', None)
+
+
+def compress_response(response):
+    """Compress the body when the client accepts an encoding we have and the content benefits"""
+    config = current_app.config
+    if (
+        request.method == 'HEAD'
+        or response.status_code in (204, 206, 304)
+        or response.status_code < 200
+        or response.direct_passthrough
+        or 'Content-Encoding' in response.headers
+        or not _compressible(response, config)
+    ):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if 'no-transform' in response.headers.get('Cache-Control', ''):
+        COMPRESSION_SKIPPED.labels('no-transform').inc()
+        return response
+
+    encoding = negotiate(request.accept_encodings, config['COMPRESSION_ALGORITHMS'])
+    if encoding is None:
+        COMPRESSION_SKIPPED.labels('not-accepted').inc()
+        return response
+
+    level = config['COMPRESSION_LEVELS'][encoding]
+    if response.is_streamed:
+        _compress_stream(response, encoding, level, config['COMPRESSION_STREAM_FLUSH_BYTES'])
+    else:
+        if len(response.get_data()) < config['COMPRESSION_MIN_SIZE']:
+            COMPRESSION_SKIPPED.labels('below-threshold').inc()
+            return response
+        _compress_body(response, encoding, level)
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # A different representation needs its own validator
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return response
+
+
+def init_compression(app):
+    """
+    Negotiated gzip/brotli/zstd compression of text, JSON, NDJSON, CSV and
+    event-stream responses, including streamed ones. File responses
+    (send_file) and bodies that are already encoded are left alone.
+    """
+    if not app.config['COMPRESSION_ENABLED']:
+        return
+    unknown = set(app.config['COMPRESSION_ALGORITHMS']) - {'gzip', 'br', 'zstd'}
+    if unknown:
+        raise ValueError(f"Unknown COMPRESSION_ALGORITHMS: {', '.join(sorted(unknown))}")
+    app.after_request(compress_response)
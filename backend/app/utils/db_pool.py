@@ -0,0 +1,135 @@
+import logging
+import time
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+from utils.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+POOL_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CHECKOUT_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds',
+    'Time spent waiting for a pooled connection',
+    buckets=POOL_BUCKETS
+)
+HOLD_TIME = Histogram(
+    'db_pool_hold_seconds',
+    'Time a connection was checked out, by endpoint',
+    ['endpoint'],
+    buckets=POOL_BUCKETS
+)
+OVERFLOW_CHECKOUTS = Counter(
+    'db_pool_overflow_total',
+    'Checkouts served by an overflow connection beyond pool_size'
+)
+CHECKOUT_TIMEOUTS = Counter(
+    'db_pool_timeouts_total',
+    'Checkouts that gave up after pool_timeout'
+)
+SLOW_HOLDS = Counter(
+    'db_pool_slow_holds_total',
+    'Connections held longer than DB_SLOW_HOLD_SECONDS, by endpoint',
+    ['endpoint']
+)
+
+
+def _current_endpoint():
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'background'
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait, and timeouts and overflow"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            CHECKOUT_TIMEOUTS.inc()
+            logger.warning(
+                f"Connection pool exhausted after {time.perf_counter() - started:.1f}s "
+                f"(endpoint {_current_endpoint()}, {self.status()})"
+            )
+            raise
+        CHECKOUT_WAIT.observe(time.perf_counter() - started)
+        if self.overflow() > 0:
+            OVERFLOW_CHECKOUTS.inc()
+        return connection
+
+
+@event.listens_for(InstrumentedQueuePool, 'checkout')
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info['checked_out_at'] = time.perf_counter()
+    connection_record.info['endpoint'] = _current_endpoint()
+
+
+@event.listens_for(InstrumentedQueuePool, 'checkin')
+def _on_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop('checked_out_at', None)
+    endpoint = connection_record.info.pop('endpoint', 'unknown')
+    if checked_out_at is None:
+        return
+
+    held = time.perf_counter() - checked_out_at
+    HOLD_TIME.labels(endpoint).observe(held)
+
+    threshold = current_app.config.get('DB_SLOW_HOLD_SECONDS') if has_app_context() else None
+    if threshold and held > threshold:
+        SLOW_HOLDS.labels(endpoint).inc()
+        logger.warning(f"{endpoint} held a database connection for {held:.2f}s")
+
+
+def instrument_app(app):
+    """Build this app's engines with the instrumented pool; call before db.init_app"""
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('poolclass', InstrumentedQueuePool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def _summary(values):
+    count = values['count']
+    return {
+        'count': count,
+        'avg_ms': round(values['sum'] / count * 1000, 2) if count else 0.0
+    }
+
+
+def pool_stats(engine, include_metrics=True):
+    """
+    Current pool occupancy plus this process's wait, hold, overflow and
+    timeout figures. The figures cover every engine in the process.
+    """
+    pool = engine.pool
+    stats = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'timeout': pool.timeout()
+        })
+    if not include_metrics:
+        return stats
+
+    holds = {
+        sample['labels']['endpoint']: _summary(sample)
+        for sample in HOLD_TIME.samples()
+    }
+    slow = {sample['labels']['endpoint']: int(sample['value']) for sample in SLOW_HOLDS.samples()}
+    for endpoint, summary in holds.items():
+        summary['slow'] = slow.get(endpoint, 0)
+
+    stats.update({
+        'checkout_wait': _summary(CHECKOUT_WAIT.labels().get()),
+        'overflow_checkouts': int(OVERFLOW_CHECKOUTS.labels().get()['value']),
+        'timeouts': int(CHECKOUT_TIMEOUTS.labels().get()['value']),
+        'hold_by_endpoint': dict(sorted(holds.items(), key=lambda item: item[1]['avg_ms'], reverse=True))
+    })
+    return stats
@@ -0,0 +1,261 @@
+import itertools
+import logging
+import re
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.elements import TextClause
+
+from utils.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+REPLICA_BIND_PREFIX = 'replica_'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+REPLICA_STRATEGIES = ('round-robin', 'least-connections')
+PRIMARY_COOKIE = 'db_primary_until'
+PRIMARY_MARKER_PREFIX = 'db:primary:'
+
+# Seconds behind the primary, 0 when the replica has replayed everything it received
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+# Raw SQL a replica can answer; anything else, or any row lock, goes to the primary
+READ_ONLY_SQL = re.compile(r'^\s*(SELECT|SHOW|EXPLAIN)\b', re.IGNORECASE)
+LOCKING_SQL = re.compile(r'\bFOR\s+(NO\s+KEY\s+UPDATE|UPDATE|KEY\s+SHARE|SHARE)\b', re.IGNORECASE)
+
+ROUTED_READS = Counter(
+    'db_routed_requests_total',
+    'Requests by the database they read from, and why',
+    ['target', 'reason']
+)
+
+
+class ReplicaSet:
+    """
+    Read replicas of one app, picked round-robin or by fewest checked-out
+    connections. Health and lag are re-checked at most every
+    REPLICA_HEALTH_INTERVAL seconds; a replica that is down or lags more
+    than REPLICA_MAX_LAG_SECONDS is skipped until a later check passes.
+    """
+
+    def __init__(self, names, strategy, max_lag, interval, check_timeout=2):
+        self.names = list(names)
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.interval = interval
+        self.check_timeout = check_timeout
+        # Replicas take reads only once a check has passed; requests racing the
+        # first check read from the primary
+        self.state = {
+            name: {'healthy': False, 'lag': None, 'checked_at': 0.0, 'error': 'not checked yet'}
+            for name in names
+        }
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def mark_down(self, name, error):
+        with self._lock:
+            self.state[name].update(healthy=False, checked_at=time.monotonic(), error=str(error))
+        logger.warning(f"Replica {name} marked down : {error}")
+
+    def _refresh(self, engines):
+        now = time.monotonic()
+        with self._lock:
+            due = [name for name in self.names if now - self.state[name]['checked_at'] >= self.interval]
+            # Claim the checks so concurrent requests don't repeat them
+            for name in due:
+                self.state[name]['checked_at'] = now
+
+        for name in due:
+            try:
+                with engines[name].connect() as connection:
+                    # Connecting is bounded by the bind's connect_timeout, the query by this
+                    connection.execute(text(f"SET LOCAL statement_timeout = {int(self.check_timeout * 1000)}"))
+                    lag = float(connection.execute(LAG_QUERY).scalar() or 0)
+                healthy = lag <= self.max_lag
+                error = None if healthy else f"lagging {lag:.1f}s"
+            except Exception as e:
+                lag, healthy, error = None, False, str(e)
+            with self._lock:
+                self.state[name].update(healthy=healthy, lag=lag, error=error)
+            if not healthy:
+                logger.warning(f"Replica {name} unavailable for reads : {error}")
+
+    def pick(self, engines):
+        """Name of the replica to read from, or None to use the primary"""
+        self._refresh(engines)
+        healthy = [name for name in self.names if self.state[name]['healthy']]
+        if not healthy:
+            return None
+        if self.strategy == 'least-connections':
+            return min(healthy, key=lambda name: engines[name].pool.checkedout())
+        return healthy[next(self._counter) % len(healthy)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {'healthy': state['healthy'], 'lag': state['lag'], 'error': state['error']}
+                for name, state in self.state.items()
+            }
+
+
+def is_write(clause):
+    """
+    True for statements a replica can't run: DML, SELECT ... FOR UPDATE/SHARE,
+    and raw SQL other than a plain SELECT, SHOW or EXPLAIN.
+    """
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, TextClause):
+        return not READ_ONLY_SQL.match(clause.text) or bool(LOCKING_SQL.search(clause.text))
+    return getattr(clause, '_for_update_arg', None) is not None
+
+
+class RoutingSession(Session):
+    """
+    Sends reads to the replica chosen for the current request and everything
+    else to the primary. Once the session flushes or runs a write, the rest
+    of the request reads from the primary too, so it sees its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            return bind
+        if has_request_context():
+            replica = g.get('db_replica')
+            if replica:
+                if self._flushing or is_write(clause):
+                    g.db_replica = None
+                else:
+                    return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def replica_binds(urls, engine_options=None, connect_timeout=2):
+    """
+    SQLALCHEMY_BINDS entries for the configured replica URLs. Binds don't
+    inherit SQLALCHEMY_ENGINE_OPTIONS, so the pool settings are copied in,
+    and a short connect timeout keeps an unreachable replica from stalling
+    the health check a request runs before choosing where to read.
+    """
+    options = dict(engine_options or {})
+    connect_args = dict(options.pop('connect_args', {}), connect_timeout=connect_timeout)
+    return {
+        f"{REPLICA_BIND_PREFIX}{index}": dict(options, url=url, connect_args=connect_args)
+        for index, url in enumerate(urls)
+    }
+
+
+def _request_user_id():
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+def _primary_pinned(user_id):
+    """True while a recent write by this client or user must be readable"""
+    # models imports this module for RoutingSession, and extensions imports models
+    from extensions import get_redis_client
+
+    pinned_until = request.cookies.get(PRIMARY_COOKIE, type=float)
+    if pinned_until and pinned_until > time.time():
+        return True
+    redis_client = get_redis_client()
+    if user_id and redis_client:
+        try:
+            return bool(redis_client.exists(f"{PRIMARY_MARKER_PREFIX}{user_id}"))
+        except Exception as e:
+            logger.error(f"Read-your-writes marker lookup failed : {e}")
+    return False
+
+
+def _choose_database():
+    g.db_replica = None
+    replicas = current_app.extensions.get('db_replicas')
+    if not replicas or request.method not in SAFE_METHODS:
+        return
+
+    view = current_app.view_functions.get(request.endpoint)
+    if view is None or getattr(view, '_use_primary_db', False):
+        ROUTED_READS.labels('primary', 'endpoint').inc()
+        return
+    if _primary_pinned(_request_user_id()):
+        ROUTED_READS.labels('primary', 'recent_write').inc()
+        return
+
+    from models import db
+    g.db_replica = replicas.pick(db.engines)
+    ROUTED_READS.labels(g.db_replica or 'primary', 'replica' if g.db_replica else 'replicas_down').inc()
+
+
+def _mark_writes(response):
+    """Pin this client, and its user, to the primary for a while after a write"""
+    if (
+        'db_replicas' not in current_app.extensions
+        or request.method in SAFE_METHODS
+        or response.status_code >= 400
+    ):
+        return response
+
+    from extensions import get_redis_client
+
+    window = current_app.config['DB_READ_YOUR_WRITES_SECONDS']
+    response.set_cookie(PRIMARY_COOKIE, str(time.time() + window), max_age=window, httponly=True, samesite='Lax')
+
+    try:
+        user_id = get_jwt_identity()
+    except Exception:
+        user_id = None
+    redis_client = get_redis_client()
+    if user_id and redis_client:
+        try:
+            redis_client.set(f"{PRIMARY_MARKER_PREFIX}{user_id}", 1, ex=window)
+        except Exception as e:
+            logger.error(f"Setting the read-your-writes marker failed : {e}")
+    return response
+
+
+def init_replicas(app, db):
+    """
+    Route reads to DB_REPLICA_URLS when any are configured. Must run after
+    db.init_app so the replica engines exist.
+    """
+    binds = {
+        name: url for name, url in (app.config.get('SQLALCHEMY_BINDS') or {}).items()
+        if name.startswith(REPLICA_BIND_PREFIX)
+    }
+    if not binds:
+        return
+    if app.config['DB_REPLICA_STRATEGY'] not in REPLICA_STRATEGIES:
+        raise ValueError(f"DB_REPLICA_STRATEGY must be one of: {', '.join(REPLICA_STRATEGIES)}")
+
+    replicas = ReplicaSet(
+        sorted(binds),
+        strategy=app.config['DB_REPLICA_STRATEGY'],
+        max_lag=app.config['DB_REPLICA_MAX_LAG_SECONDS'],
+        interval=app.config['DB_REPLICA_HEALTH_INTERVAL'],
+        check_timeout=app.config['DB_REPLICA_CONNECT_TIMEOUT']
+    )
+    app.extensions['db_replicas'] = replicas
+
+    with app.app_context():
+        for name in binds:
+            def on_error(context, name=name):
+                if context.is_disconnect:
+                    replicas.mark_down(name, context.original_exception)
+            event.listen(db.engines[name], 'handle_error', on_error)
+
+    app.before_request(_choose_database)
+    app.after_request(_mark_writes)
@@ -35,6 +35,11 @@ def admin_required(f):
     
     return decorated_function
 
+def use_primary(f):
+    """Decorator to keep a read endpoint off the replicas, for data written by background workers"""
+    f._use_primary_db = True
+    return f
+
 def rate_limit_by_user(max_requests=100, per_seconds=3600):
     """Rate limiting decorator based on user"""
     def decorator(f):
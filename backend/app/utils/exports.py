@@ -0,0 +1,81 @@
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime
+
+from models import db
+
+
+def _json_default(value):
+    """Encode the column types json.dumps doesn't know about"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _csv_value(value):
+    """Render a single cell for CSV output"""
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_default)
+    return value
+
+
+def iter_ndjson(keys, partitions):
+    """Yield one NDJSON chunk per fetched partition"""
+    for rows in partitions:
+        yield ''.join(
+            json.dumps(dict(zip(keys, row)), default=_json_default) + '\n'
+            for row in rows
+        )
+
+
+def iter_csv(keys, partitions):
+    """Yield a header line and then one CSV chunk per fetched partition"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(keys)
+    yield buffer.getvalue()
+
+    for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+
+
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', iter_ndjson),
+    'csv': ('text/csv', iter_csv),
+}
+
+
+def stream_query(stmt, fmt='ndjson', batch_size=1000):
+    """
+    Stream the result of a column-only select as NDJSON or CSV.
+
+    Rows are fetched through a server-side cursor on a dedicated connection,
+    `batch_size` at a time, so memory stays flat regardless of table size.
+    The connection (and its read-only transaction) is released as soon as the
+    generator is exhausted or closed by a disconnecting client.
+    """
+    _, encoder = EXPORT_FORMATS[fmt]
+    keys = [column.key for column in stmt.selected_columns]
+
+    def generate():
+        with db.engine.connect() as conn:
+            result = conn.execution_options(
+                stream_results=True,
+                yield_per=batch_size,
+                postgresql_readonly=True
+            ).execute(stmt)
+            yield from encoder(keys, result.partitions())
+
+    return generate()
@@ -1,23 +1,7 @@
-import os
-import secrets
-from PIL import Image
+import uuid
+from datetime import datetime
 from flask import current_app
-
-
-def save_picture(form_picture, folder):
-    """Save uploaded picture with random filename"""
-    random_hex = secrets.token_hex(8)
-    _, f_ext = os.path.splitext(form_picture.filename)
-    picture_fn = random_hex + f_ext
-    picture_path = os.path.join(current_app.root_path, 'static', folder, picture_fn)
-    
-    # Resize image
-    output_size = (800, 800)
-    img = Image.open(form_picture)
-    img.thumbnail(output_size)
-    img.save(picture_path)
-    
-    return picture_fn
+from utils.tracing import span
 
 
 def allowed_file(filename):
@@ -26,20 +10,76 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
 
-def log_audit_event(user_id, action, table_name, record_id, changes=None, ip_address=None, user_agent=None):
+# Leading bytes of each accepted image type, checked instead of trusting the filename
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+
+IMAGE_SNIFF_BYTES = 12
+
+
+def sniff_image_type(head):
+    """Image extension for the first bytes of a file, or None if not an allowed image"""
+    for signature, ext in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return ext
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def log_audit_event(user_id, action, table_name, record_id, changes=None, ip_address=None, user_agent=None, commit=True):
     """Log audit events"""
     from models.audit_log import AuditLog
     from models import db
     
-    audit_log = AuditLog(
-        user_id=user_id,
-        action=action,
-        table_name=table_name,
-        record_id=record_id,
-        changes=changes,
-        ip_address=ip_address,
-        user_agent=user_agent
-    )
+    with span('audit.log_event', action=action, table=table_name, commit=commit):
+        audit_log = AuditLog(
+            user_id=user_id,
+            action=action,
+            table_name=table_name,
+            record_id=record_id,
+            changes=changes,
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+        
+        db.session.add(audit_log)
+        if commit:
+            db.session.commit()
+
+
+def log_audit_events(user_id, action, table_name, record_ids, changes=None, ip_address=None, user_agent=None):
+    """
+    Log the same audit event for many records as one multi-row INSERT.
+    Runs inside the caller's transaction; the caller commits.
+    """
+    from sqlalchemy import insert
+    from models.audit_log import AuditLog
+    from models import db
+    
+    if not record_ids:
+        return 0
+    
+    now = datetime.utcnow()
+    rows = [
+        {
+            'id': uuid.uuid4(),
+            'created_at': now,
+            'user_id': user_id,
+            'action': action,
+            'table_name': table_name,
+            'record_id': record_id,
+            'changes': changes,
+            'ip_address': ip_address,
+            'user_agent': user_agent
+        }
+        for record_id in record_ids
+    ]
     
-    db.session.add(audit_log)
-    db.session.commit()
\ No newline at end of file
+    with span('audit.log_events', action=action, table=table_name, records=len(rows)):
+        db.session.execute(insert(AuditLog).values(rows))
+    return len(rows)
\ No newline at end of file
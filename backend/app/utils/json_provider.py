@@ -0,0 +1,91 @@
+import dataclasses
+import decimal
+import json
+import re
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Everything ensure_ascii escapes that orjson writes raw: DEL and all non-ASCII
+_UNESCAPED = re.compile('[\x7f-\U0010ffff]')
+
+
+def _escape(match):
+    code = ord(match.group())
+    if code > 0xFFFF:
+        code -= 0x10000
+        return '\\u{:04x}\\u{:04x}'.format(0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    return '\\u{:04x}'.format(code)
+
+
+def _default(o):
+    """Types neither encoder handles itself; datetimes use ISO 8601 like the model to_dict methods"""
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def _stdlib_dumps(obj):
+    return json.dumps(obj, default=_default, ensure_ascii=True, sort_keys=True, separators=(',', ':'))
+
+
+def dumps_bytes(obj):
+    """
+    Compact, key-sorted, ASCII-only JSON: the same bytes as Flask's default
+    provider, with UUIDs and datetimes encoded natively.
+
+    orjson does the work when installed; its output only needs non-ASCII
+    characters escaped afterwards. Payloads orjson refuses (non-string dict
+    keys, integers beyond 64 bits) go through the standard library instead.
+    Floats in exponent form (below 1e-4 or from 1e16) and NaN/Infinity are
+    the only values orjson writes differently; no model field holds those.
+    """
+    if orjson is None:
+        return _stdlib_dumps(obj).encode()
+    try:
+        body = orjson.dumps(obj, default=_default, option=orjson.OPT_SORT_KEYS)
+    except TypeError:
+        return _stdlib_dumps(obj).encode()
+    if not body.isascii() or b'\x7f' in body:
+        body = _UNESCAPED.sub(_escape, body.decode()).encode()
+    return body
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider for jsonify and request.get_json backed by orjson.
+    Debug mode keeps the standard library's indented output.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            kwargs.setdefault('default', _default)
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # Let the standard library decide: it accepts NaN and Infinity, and its errors are the familiar ones
+            return super().loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
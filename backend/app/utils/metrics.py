@@ -0,0 +1,319 @@
+import bisect
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from utils.tracing import span
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:
+    prometheus_client = None
+
+# Upper bounds in seconds, suited to request and upstream-call latencies
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+class _Metric(ABC):
+    """
+    A named metric with optional labels. The API follows prometheus_client
+    (`metric.labels(...).inc()`).
+
+    Values are kept per process for admin endpoints, and also recorded in
+    prometheus_client when it is installed, which aggregates them across
+    worker processes for /metrics (see render_metrics).
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        self._prometheus = self._build_prometheus() if prometheus_client else None
+        with _registry_lock:
+            if name in _registry:
+                raise ValueError(f"Metric {name} is already registered")
+            _registry[name] = self
+
+    @abstractmethod
+    def _build_prometheus(self):
+        """The prometheus_client metric recording the same values"""
+
+    @abstractmethod
+    def _new_child(self, prometheus_child):
+        """Value holder for one label combination"""
+
+    def labels(self, *values, **kwvalues):
+        if kwvalues:
+            values = tuple(kwvalues[label] for label in self.labelnames)
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is not None:
+            return child
+
+        if len(key) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                prometheus_child = None
+                if self._prometheus is not None:
+                    prometheus_child = self._prometheus.labels(*key) if key else self._prometheus
+                child = self._children[key] = self._new_child(prometheus_child)
+            return child
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} is labelled; call labels() first")
+        return self.labels()
+
+    def samples(self):
+        with self._lock:
+            children = list(self._children.items())
+        return [
+            {'labels': dict(zip(self.labelnames, key)), **child.get()}
+            for key, child in children
+        ]
+
+
+class _CounterValue:
+    def __init__(self, prometheus_child):
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self._prometheus = prometheus_child
+
+    def inc(self, amount=1):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        with self._lock:
+            self._value += amount
+        if self._prometheus is not None:
+            self._prometheus.inc(amount)
+
+    def get(self):
+        return {'value': self._value}
+
+
+class _GaugeValue:
+    def __init__(self, prometheus_child):
+        self._value = 0.0
+        self._lock = threading.Lock()
+        self._prometheus = prometheus_child
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+        if self._prometheus is not None:
+            self._prometheus.inc(amount)
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+        if self._prometheus is not None:
+            self._prometheus.set(value)
+
+    def get(self):
+        return {'value': self._value}
+
+
+class _HistogramValue:
+    def __init__(self, buckets, prometheus_child):
+        self._upper_bounds = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+        self._prometheus = prometheus_child
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._upper_bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+        if self._prometheus is not None:
+            self._prometheus.observe(value)
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def get(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self._upper_bounds + (float('inf'),), counts):
+            cumulative += count
+            buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+        return {'count': cumulative, 'sum': total, 'buckets': buckets}
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _build_prometheus(self):
+        # prometheus_client appends _total itself
+        name = self.name[:-len('_total')] if self.name.endswith('_total') else self.name
+        return prometheus_client.Counter(name, self.documentation, self.labelnames)
+
+    def _new_child(self, prometheus_child):
+        return _CounterValue(prometheus_child)
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _build_prometheus(self):
+        # Sum live processes' values, e.g. in-flight requests across workers
+        return prometheus_client.Gauge(
+            self.name, self.documentation, self.labelnames, multiprocess_mode='livesum'
+        )
+
+    def _new_child(self, prometheus_child):
+        return _GaugeValue(prometheus_child)
+
+    def inc(self, amount=1):
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount=1):
+        self._unlabelled().dec(amount)
+
+    def set(self, value):
+        self._unlabelled().set(value)
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _build_prometheus(self):
+        return prometheus_client.Histogram(self.name, self.documentation, self.labelnames, buckets=self.buckets)
+
+    def _new_child(self, prometheus_child):
+        return _HistogramValue(self.buckets, prometheus_child)
+
+    def observe(self, value):
+        self._unlabelled().observe(value)
+
+    def time(self):
+        return self._unlabelled().time()
+
+
+EXTERNAL_CALL_SECONDS = Histogram(
+    'external_call_duration_seconds',
+    'Latency of calls to external services, by outcome',
+    ['service', 'operation', 'outcome'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+)
+
+
+@contextmanager
+def track_external(service, operation):
+    """
+    Time a call to an external service, in a span of its own. The outcome
+    is 'error' if the block raises.
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        with span(f"{service}.{operation}", **{'peer.service': service}):
+            yield
+        outcome = 'ok'
+    finally:
+        EXTERNAL_CALL_SECONDS.labels(service, operation, outcome).observe(time.perf_counter() - started)
+
+
+def counter_value(metric, **labels):
+    """Current value of one labelled counter series, 0 if never incremented"""
+    key = tuple(str(labels[label]) for label in metric.labelnames)
+    child = metric._children.get(key)
+    return child.get()['value'] if child else 0.0
+
+
+def snapshot():
+    """Every registered metric with its samples, for admin endpoints"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    return {
+        metric.name: {
+            'type': metric.kind,
+            'documentation': metric.documentation,
+            'samples': metric.samples()
+        }
+        for metric in metrics
+    }
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    pairs = dict(labels, **(extra or {}))
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs.items()) + '}'
+
+
+def _render_local():
+    """Text exposition of this process's values, for when prometheus_client isn't installed"""
+    lines = []
+    for name, metric in snapshot().items():
+        lines.append(f"# HELP {name} {metric['documentation']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for sample in metric['samples']:
+            labels = sample['labels']
+            if metric['type'] == 'histogram':
+                for bound, count in sample['buckets'].items():
+                    lines.append(f"{name}_bucket{_format_labels(labels, {'le': bound})} {count}")
+                lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {sample['sum']}")
+            else:
+                lines.append(f"{name}{_format_labels(labels)} {sample['value']}")
+    return ('\n'.join(lines) + '\n').encode(), 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def render_metrics():
+    """
+    (body, content type) for a /metrics scrape.
+
+    Under a pre-fork server set PROMETHEUS_MULTIPROC_DIR to an empty
+    directory before the workers start; every worker then writes its values
+    there and any worker can serve the combined totals.
+    """
+    if prometheus_client is None:
+        return _render_local()
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Drop a dead worker's live gauges; call from the server's child-exit hook"""
+    if prometheus_client is not None and os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
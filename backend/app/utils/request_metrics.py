@@ -0,0 +1,77 @@
+import hmac
+import time
+
+from flask import Response, current_app, g, request
+
+from utils.metrics import Counter, Gauge, Histogram, render_metrics
+
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds',
+    'Request latency by blueprint and endpoint',
+    ['blueprint', 'endpoint', 'method']
+)
+REQUESTS = Counter(
+    'http_requests_total',
+    'Requests by blueprint, endpoint and status code',
+    ['blueprint', 'endpoint', 'method', 'status']
+)
+IN_FLIGHT = Gauge(
+    'http_requests_in_flight',
+    'Requests currently being handled, by blueprint',
+    ['blueprint']
+)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds',
+    'Time spent in SQL per request, by blueprint',
+    ['blueprint'],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+)
+
+
+def _labels():
+    # Unmatched URLs share one label so random 404 paths can't blow up cardinality
+    return request.blueprint or 'app', request.endpoint or 'unmatched'
+
+
+def _start():
+    g.metrics_started = time.perf_counter()
+    g.metrics_blueprint = _labels()[0]
+    IN_FLIGHT.labels(g.metrics_blueprint).inc()
+
+
+def _record(response):
+    started = g.get('metrics_started')
+    if started is None:
+        return response
+
+    blueprint, endpoint = _labels()
+    REQUEST_SECONDS.labels(blueprint, endpoint, request.method).observe(time.perf_counter() - started)
+    REQUESTS.labels(blueprint, endpoint, request.method, response.status_code).inc()
+    REQUEST_DB_SECONDS.labels(blueprint).observe(g.get('db_seconds', 0.0))
+    return response
+
+
+def _finish(error=None):
+    # Teardown runs even when a view raised, so the gauge can't drift upwards
+    blueprint = g.pop('metrics_blueprint', None)
+    if blueprint is not None:
+        IN_FLIGHT.labels(blueprint).dec()
+
+
+def metrics_view():
+    """Prometheus scrape endpoint; requires METRICS_TOKEN as a bearer token when one is set"""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied, f"Bearer {token}"):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    body, content_type = render_metrics()
+    return Response(body, content_type=content_type)
+
+
+def init_request_metrics(app):
+    """Instrument every request and serve /metrics"""
+    app.before_request(_start)
+    app.after_request(_record)
+    app.teardown_request(_finish)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,206 @@
+"""
+Precompiled serializers for API responses.
+
+Each serializer is a generated function that builds a model's response dict
+with one attribute read per field, so it works the same on ORM instances
+and on SQL rows selected with matching column names. Values are left as
+they come from the database: the JSON provider encodes UUIDs and datetimes
+natively, giving the same bytes as the models' to_dict output.
+
+The *_dicts helpers serialize a page of objects and load the related data
+to_dict reaches through lazy relationships (authors, tags, rating and
+comment counts, replies) with one query per relation instead of per row.
+"""
+from collections import defaultdict
+
+from sqlalchemy import func, select
+
+from models import db
+from models.comment import Comment
+from models.ratings import Rating
+from models.recipe_tag import RecipeTag
+from models.tag import Tag
+from models.user import User
+
+
+def compile_serializer(name, fields, extras=()):
+    """
+    Build `name(obj, *extras)` returning a dict. `fields` maps output keys
+    to attribute names, or to None for a constant null; `extras` are output
+    keys whose values are passed in as arguments.
+    """
+    items = []
+    for key, attribute in fields.items():
+        if attribute is None:
+            items.append(f"{key!r}: None")
+        else:
+            if not attribute.isidentifier():
+                raise ValueError(f"Not an attribute name: {attribute!r}")
+            items.append(f"{key!r}: o.{attribute}")
+    for key in extras:
+        if not key.isidentifier():
+            raise ValueError(f"Not an argument name: {key!r}")
+        items.append(f"{key!r}: {key}")
+
+    arguments = ''.join(f", {key}" for key in extras)
+    source = f"def {name}(o{arguments}):\n    return {{{', '.join(items)}}}\n"
+    namespace = {}
+    exec(compile(source, f"<serializer {name}>", 'exec'), namespace)
+    return namespace[name]
+
+
+_USER_FIELDS = {
+    'id': 'id',
+    'username': 'username',
+    'is_premium': 'is_premium',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'bio': 'bio',
+    'profile_image_url': 'profile_image_url',
+    'created_at': 'created_at',
+    'is_active': 'is_active'
+}
+serialize_user = compile_serializer('serialize_user', {**_USER_FIELDS, 'email': None})
+serialize_user_private = compile_serializer('serialize_user_private', {**_USER_FIELDS, 'email': 'email'})
+
+serialize_tag = compile_serializer('serialize_tag', {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'color': 'color',
+    'usage_count': 'usage_count',
+    'created_at': 'created_at'
+})
+
+_RECIPE_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'description': 'description',
+    'ingredients': 'ingredients',
+    'instructions': 'instructions',
+    'image_url': 'image_url',
+    'prep_time': 'prep_time',
+    'cook_time': 'cook_time',
+    'servings': 'servings',
+    'difficulty_level': 'difficulty_level',
+    'is_featured': 'is_featured',
+    'view_count': 'view_count',
+    'author_id': 'author_id',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at'
+}
+_RECIPE_EXTRAS = ('total_time', 'average_rating', 'rating_count')
+serialize_recipe = compile_serializer('serialize_recipe', _RECIPE_FIELDS, _RECIPE_EXTRAS)
+serialize_recipe_relations = compile_serializer(
+    'serialize_recipe_relations', _RECIPE_FIELDS, _RECIPE_EXTRAS + ('author', 'tags', 'comments_count')
+)
+
+_COMMENT_FIELDS = {
+    'id': 'id',
+    'content': 'content',
+    'is_edited': 'is_edited',
+    'edited_at': 'edited_at',
+    'user_id': 'user_id',
+    'recipe_id': 'recipe_id',
+    'parent_id': 'parent_id',
+    'created_at': 'created_at'
+}
+serialize_comment = compile_serializer('serialize_comment', _COMMENT_FIELDS, ('user',))
+serialize_comment_replies = compile_serializer('serialize_comment_replies', _COMMENT_FIELDS, ('user', 'replies'))
+
+serialize_rating = compile_serializer('serialize_rating', {
+    'id': 'id',
+    'score': 'score',
+    'review': 'review',
+    'user_id': 'user_id',
+    'recipe_id': 'recipe_id',
+    'created_at': 'created_at'
+}, ('user',))
+
+
+def _users(user_ids):
+    """Public user dicts by id"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return {}
+    users = db.session.execute(select(User).where(User.id.in_(user_ids))).scalars()
+    return {user.id: serialize_user(user) for user in users}
+
+
+def recipe_dicts(recipes, include_relations=False):
+    """Response dicts for recipes, matching Recipe.to_dict"""
+    if not recipes:
+        return []
+    recipe_ids = [recipe.id for recipe in recipes]
+    ratings = {
+        row.recipe_id: (row.total, row.count)
+        for row in db.session.execute(
+            select(Rating.recipe_id, func.sum(Rating.score).label('total'), func.count().label('count'))
+            .where(Rating.recipe_id.in_(recipe_ids)).group_by(Rating.recipe_id)
+        )
+    }
+
+    if include_relations:
+        authors = _users(recipe.author_id for recipe in recipes)
+        tags = defaultdict(list)
+        for recipe_id, tag in db.session.execute(
+            select(RecipeTag.recipe_id, Tag).join(Tag, Tag.id == RecipeTag.tag_id)
+            .where(RecipeTag.recipe_id.in_(recipe_ids))
+        ):
+            tags[recipe_id].append(serialize_tag(tag))
+        comment_counts = dict(db.session.execute(
+            select(Comment.recipe_id, func.count()).where(Comment.recipe_id.in_(recipe_ids))
+            .group_by(Comment.recipe_id)
+        ).all())
+
+    results = []
+    for recipe in recipes:
+        total, count = ratings.get(recipe.id, (0, 0))
+        # Same arithmetic as Recipe.average_rating, so the float is identical
+        average = total / count if count else 0
+        total_time = (recipe.prep_time or 0) + (recipe.cook_time or 0)
+        if include_relations:
+            results.append(serialize_recipe_relations(
+                recipe, total_time, average, count,
+                authors.get(recipe.author_id), tags.get(recipe.id, []), comment_counts.get(recipe.id, 0)
+            ))
+        else:
+            results.append(serialize_recipe(recipe, total_time, average, count))
+    return results
+
+
+def comment_dicts(comments, include_replies=False):
+    """Response dicts for comments, matching Comment.to_dict"""
+    if not comments:
+        return []
+    replies = defaultdict(list)
+    if include_replies:
+        for reply in db.session.execute(
+            select(Comment).where(Comment.parent_id.in_([comment.id for comment in comments]))
+        ).scalars():
+            replies[reply.parent_id].append(reply)
+
+    users = _users(
+        [comment.user_id for comment in comments]
+        + [reply.user_id for thread in replies.values() for reply in thread]
+    )
+    if not include_replies:
+        return [serialize_comment(comment, users.get(comment.user_id)) for comment in comments]
+    return [
+        serialize_comment_replies(
+            comment,
+            users.get(comment.user_id),
+            [serialize_comment(reply, users.get(reply.user_id)) for reply in replies.get(comment.id, [])]
+        )
+        for comment in comments
+    ]
+
+
+def rating_dicts(ratings):
+    """Response dicts for ratings, matching Rating.to_dict"""
+    users = _users(rating.user_id for rating in ratings)
+    return [serialize_rating(rating, users.get(rating.user_id)) for rating in ratings]
+
+
+def tag_dicts(tags):
+    return [serialize_tag(tag) for tag in tags]
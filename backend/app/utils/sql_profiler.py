@@ -0,0 +1,172 @@
+import heapq
+import logging
+import random
+import re
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+PROFILER_MODES = ('off', 'header', 'log')
+SLOWEST_KEPT = 5
+
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?|:\w+|\$\d+")
+_NUMBER = re.compile(r"\b\d+(\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+# Statements collected outside requests, by capture() blocks on this thread
+_captures = threading.local()
+
+
+def statement_shape(statement):
+    """Statement with literals and bind parameters replaced, so repeats of one query compare equal"""
+    shape = _STRING.sub('?', statement)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('(?)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+
+class QueryProfile:
+    """Statements run during one request or capture block"""
+
+    def __init__(self, n_plus_one_threshold=5):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.count = 0
+        self.total_seconds = 0.0
+        self.shapes = {}
+        self.slowest = []
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.total_seconds += seconds
+        shape = statement_shape(statement)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+        entry = (seconds, shape)
+        if len(self.slowest) < SLOWEST_KEPT:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    @property
+    def total_ms(self):
+        return round(self.total_seconds * 1000, 2)
+
+    def n_plus_one(self):
+        """SELECT shapes repeated often enough to suggest a query per row"""
+        return sorted(
+            (
+                {'shape': shape, 'count': count}
+                for shape, count in self.shapes.items()
+                if count >= self.n_plus_one_threshold and shape.upper().startswith('SELECT')
+            ),
+            key=lambda item: item['count'],
+            reverse=True
+        )
+
+    def summary(self):
+        return {
+            'queries': self.count,
+            'db_ms': self.total_ms,
+            'n_plus_one': self.n_plus_one(),
+            'slowest': [
+                {'ms': round(seconds * 1000, 2), 'shape': shape}
+                for seconds, shape in sorted(self.slowest, reverse=True)
+            ]
+        }
+
+
+def _active_profiles():
+    profiles = list(getattr(_captures, 'stack', ()))
+    if has_request_context():
+        profile = g.get('sql_profile')
+        if profile is not None:
+            profiles.append(profile)
+    return profiles
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['query_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info.pop('query_started', time.perf_counter())
+    if has_request_context():
+        # Per-request DB time for the request metrics, whether or not profiling is on
+        g.db_seconds = g.get('db_seconds', 0.0) + elapsed
+    for profile in _active_profiles():
+        profile.record(statement, elapsed)
+
+
+class capture:
+    """
+    Collect the statements run on this thread inside a with block,
+    including those of test-client requests:
+
+        with capture() as profile:
+            client.get('/api/recipes')
+        assert profile.count <= 3
+    """
+
+    def __init__(self, n_plus_one_threshold=5):
+        self.profile = QueryProfile(n_plus_one_threshold)
+
+    def __enter__(self):
+        if not hasattr(_captures, 'stack'):
+            _captures.stack = []
+        _captures.stack.append(self.profile)
+        return self.profile
+
+    def __exit__(self, *exc_info):
+        _captures.stack.remove(self.profile)
+        return False
+
+
+def _start_profile():
+    g.sql_profile = QueryProfile(current_app.config['SQL_N_PLUS_ONE_THRESHOLD'])
+    g.sql_profile_started = time.perf_counter()
+
+
+def _report_profile(response):
+    profile = g.get('sql_profile')
+    if profile is None:
+        return response
+
+    config = current_app.config
+    n_plus_one = profile.n_plus_one()
+    if config['SQL_PROFILER'] == 'header':
+        response.headers['X-SQL-Queries'] = str(profile.count)
+        response.headers['X-SQL-Time-Ms'] = str(profile.total_ms)
+        if n_plus_one:
+            response.headers['X-SQL-N-Plus-One'] = '; '.join(
+                f"{item['count']}x {item['shape'][:120]}" for item in n_plus_one[:3]
+            )
+        response.headers.add('Server-Timing', f"db;dur={profile.total_ms}")
+        return response
+
+    request_ms = (time.perf_counter() - g.sql_profile_started) * 1000
+    slow = request_ms >= config['SQL_SLOW_REQUEST_MS']
+    if (slow or n_plus_one) and random.random() < config['SQL_PROFILE_SAMPLE_RATE']:
+        logger.warning(
+            f"SQL profile {request.method} {request.endpoint} {request_ms:.0f}ms : {profile.summary()}"
+        )
+    return response
+
+
+def init_sql_profiler(app):
+    """Profile each request's SQL according to SQL_PROFILER: 'header', 'log' or 'off'"""
+    mode = app.config['SQL_PROFILER']
+    if mode not in PROFILER_MODES:
+        raise ValueError(f"SQL_PROFILER must be one of: {', '.join(PROFILER_MODES)}")
+    if mode == 'off':
+        return
+    app.before_request(_start_profile)
+    app.after_request(_report_profile)
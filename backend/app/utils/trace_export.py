@@ -0,0 +1,83 @@
+import random
+import threading
+from collections import OrderedDict
+
+from opentelemetry.sdk.trace import SpanProcessor
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.trace import StatusCode
+
+
+class JsonLinesSpanExporter(SpanExporter):
+    """Appends finished spans to a local file, one JSON object per line; works offline"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans):
+        try:
+            with self._lock, open(self.path, 'a') as f:
+                for span in spans:
+                    f.write(span.to_json(indent=None) + '\n')
+        except OSError:
+            return SpanExportResult.FAILURE
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+
+class KeepSlowSpanProcessor(SpanProcessor):
+    """
+    Tail-based sampling in front of another processor.
+
+    Spans are held per trace until the trace's local root span ends. A
+    trace continued from a sampled remote parent is always passed on: the
+    caller has already decided to keep it, and dropping our part would
+    leave a hole in its trace. A trace that starts here is passed on if the
+    root took at least `slow_seconds`, if any span errored, or otherwise
+    with probability `sample_rate`. At most `max_traces` unfinished traces
+    are buffered; the oldest are dropped beyond that.
+    """
+
+    def __init__(self, delegate, sample_rate, slow_seconds, max_traces=2048):
+        self.delegate = delegate
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.max_traces = max_traces
+        self._traces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def on_start(self, span, parent_context=None):
+        self.delegate.on_start(span, parent_context=parent_context)
+
+    def on_end(self, span):
+        trace_id = span.context.trace_id
+        is_local_root = span.parent is None or span.parent.is_remote
+        with self._lock:
+            buffered = self._traces.setdefault(trace_id, [])
+            buffered.append(span)
+            if not is_local_root:
+                while len(self._traces) > self.max_traces:
+                    self._traces.popitem(last=False)
+                return
+            buffered = self._traces.pop(trace_id)
+
+        if span.parent is not None and span.parent.trace_flags.sampled:
+            keep = True
+        else:
+            duration = (span.end_time - span.start_time) / 1e9
+            errored = any(item.status.status_code == StatusCode.ERROR for item in buffered)
+            keep = duration >= self.slow_seconds or errored or random.random() < self.sample_rate
+        if keep:
+            for item in buffered:
+                self.delegate.on_end(item)
+
+    def shutdown(self):
+        self.delegate.shutdown()
+
+    def force_flush(self, timeout_millis=30000):
+        return self.delegate.force_flush(timeout_millis)
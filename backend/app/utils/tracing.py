@@ -0,0 +1,153 @@
+import logging
+import os
+from contextlib import contextmanager, nullcontext
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+logger = logging.getLogger(__name__)
+
+TRACER_NAME = 'recipe_blog'
+TRACING_EXPORTERS = ('file', 'otlp', 'console')
+
+
+def _tracer():
+    return trace.get_tracer(TRACER_NAME)
+
+
+def span(name, **attributes):
+    """
+    Context manager for a manual span; a no-op when OpenTelemetry isn't
+    installed or no tracer provider has been configured.
+    """
+    if trace is None:
+        return nullcontext()
+    return _span(name, attributes)
+
+
+def current_carrier():
+    """W3C trace-context headers for the active span, to hand work to another thread or process"""
+    if trace is None:
+        return {}
+    from opentelemetry.propagate import inject
+    carrier = {}
+    inject(carrier)
+    return carrier
+
+
+def continued_span(name, carrier, **attributes):
+    """A span parented by the trace in `carrier` (from current_carrier), or a new trace without one"""
+    if trace is None:
+        return nullcontext()
+    if not carrier:
+        return _span(name, attributes)
+    from opentelemetry.propagate import extract
+    return _span(name, attributes, context=extract(carrier))
+
+
+@contextmanager
+def _span(name, attributes, context=None):
+    with _tracer().start_as_current_span(name, context=context) as current:
+        for key, value in attributes.items():
+            if value is not None:
+                current.set_attribute(key, value if isinstance(value, (str, bool, int, float)) else str(value))
+        yield current
+
+
+def _exporter(config):
+    kind = config['TRACING_EXPORTER']
+    if kind == 'otlp':
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        endpoint = config.get('TRACING_OTLP_ENDPOINT')
+        return OTLPSpanExporter(endpoint=endpoint) if endpoint else OTLPSpanExporter()
+    if kind == 'console':
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+
+    from utils.trace_export import JsonLinesSpanExporter
+    path = config['TRACING_FILE']
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return JsonLinesSpanExporter(path)
+
+
+def _instrument_libraries(app, db):
+    """Auto-instrument whichever integrations are installed"""
+    instrumented = []
+    try:
+        from opentelemetry.instrumentation.flask import FlaskInstrumentor
+        FlaskInstrumentor().instrument_app(app, excluded_urls='metrics,api/health')
+        instrumented.append('flask')
+    except ImportError:
+        pass
+    try:
+        from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+        with app.app_context():
+            engines = list(db.engines.values())
+        SQLAlchemyInstrumentor().instrument(engines=engines)
+        instrumented.append('sqlalchemy')
+    except ImportError:
+        pass
+    try:
+        from opentelemetry.instrumentation.redis import RedisInstrumentor
+        RedisInstrumentor().instrument()
+        instrumented.append('redis')
+    except ImportError:
+        pass
+    try:
+        # Outbound HTTP: the Razorpay SDK and reconciliation both use requests.
+        # Also injects the W3C traceparent header into those calls.
+        from opentelemetry.instrumentation.requests import RequestsInstrumentor
+        RequestsInstrumentor().instrument()
+        instrumented.append('requests')
+    except ImportError:
+        pass
+    return instrumented
+
+
+def init_tracing(app, db):
+    """
+    Configure tracing when TRACING_ENABLED is set and the OpenTelemetry SDK
+    is installed. Spans are exported to TRACING_EXPORTER. With
+    TRACING_KEEP_SLOW_MS set, every trace is recorded and kept only when it
+    was slow, errored, or falls in the TRACING_SAMPLE_RATE sample; otherwise
+    TRACING_SAMPLE_RATE is a head-based ratio. Upstream sampling decisions
+    in a W3C traceparent header are honoured either way.
+    """
+    config = app.config
+    if not config['TRACING_ENABLED']:
+        return
+    if config['TRACING_EXPORTER'] not in TRACING_EXPORTERS:
+        raise ValueError(f"TRACING_EXPORTER must be one of: {', '.join(TRACING_EXPORTERS)}")
+    if trace is None:
+        logger.warning("TRACING_ENABLED is set but opentelemetry is not installed")
+        return
+
+    from opentelemetry.propagate import set_global_textmap
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, SimpleSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ALWAYS_ON, ParentBased, TraceIdRatioBased
+    from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+    set_global_textmap(TraceContextTextMapPropagator())
+
+    sample_rate = config['TRACING_SAMPLE_RATE']
+    keep_slow_ms = config['TRACING_KEEP_SLOW_MS']
+    sampler = ParentBased(ALWAYS_ON if keep_slow_ms else TraceIdRatioBased(sample_rate))
+    provider = TracerProvider(
+        resource=Resource.create({'service.name': config['TRACING_SERVICE_NAME']}),
+        sampler=sampler
+    )
+
+    exporter = _exporter(config)
+    processor = BatchSpanProcessor(exporter) if config['TRACING_BATCH'] else SimpleSpanProcessor(exporter)
+    if keep_slow_ms:
+        from utils.trace_export import KeepSlowSpanProcessor
+        processor = KeepSlowSpanProcessor(processor, sample_rate, keep_slow_ms / 1000)
+    provider.add_span_processor(processor)
+    trace.set_tracer_provider(provider)
+
+    instrumented = _instrument_libraries(app, db)
+    logger.info(f"Tracing to {config['TRACING_EXPORTER']} ({', '.join(instrumented) or 'manual spans only'})")
@@ -0,0 +1,64 @@
+"""Word lists and generators for realistic recipe and comment text, shared by the benchmarks"""
+
+INGREDIENTS = (
+    'flour', 'butter', 'sugar', 'eggs', 'milk', 'garlic', 'onion', 'tomatoes', 'olive oil',
+    'basmati rice', 'chickpeas', 'paneer', 'spinach', 'cumin seeds', 'garam masala', 'ginger',
+    'coconut milk', 'lemon juice', 'coriander leaves', 'green chillies', 'yogurt', 'potatoes',
+    'carrots', 'chicken thighs', 'lentils', 'black pepper', 'salt', 'honey', 'cinnamon', 'mint'
+)
+UNITS = ('cups', 'tbsp', 'tsp', 'g', 'ml', 'cloves', 'pinch of', 'medium', 'handful of')
+VERBS = (
+    'Heat', 'Stir in', 'Whisk', 'Fold in', 'Simmer', 'Roast', 'Season', 'Blend', 'Knead',
+    'Saute', 'Toast', 'Marinate', 'Bake', 'Garnish with', 'Temper', 'Mash'
+)
+DISHES = (
+    'Curry', 'Biryani', 'Dal', 'Pancakes', 'Risotto', 'Soup', 'Salad', 'Flatbread', 'Stew',
+    'Pilaf', 'Tart', 'Cookies', 'Noodles', 'Tikka', 'Kebabs', 'Chutney', 'Cake', 'Bowl'
+)
+ADJECTIVES = (
+    'Smoky', 'Creamy', 'Spicy', 'Weeknight', 'Classic', 'Crispy', 'Tangy', 'Rustic', 'Herby',
+    'One-pot', 'Slow-cooked', 'Golden', 'Zesty', 'Hearty', 'Quick'
+)
+FILLER = (
+    'until fragrant', 'over medium heat', 'for about ten minutes', 'until golden brown',
+    'stirring occasionally', 'until the oil separates', 'and set aside', 'until just tender',
+    'so nothing catches on the bottom', 'then taste and adjust the salt'
+)
+TAG_WORDS = (
+    'vegetarian', 'vegan', 'gluten-free', 'quick', 'dessert', 'breakfast', 'indian', 'italian',
+    'spicy', 'healthy', 'comfort', 'baking', 'summer', 'winter', 'party', 'kids', 'budget'
+)
+REMARKS = (
+    'Made this tonight and it was great.', 'Added extra chillies, worked well.',
+    'Could use a little more salt.', 'My family loved it!', 'Took longer than stated for me.',
+    'Swapped the butter for ghee.', 'Perfect for meal prep.', 'Will make this again.',
+    'The timings were spot on.', 'Halved the sugar and it was still sweet enough.'
+)
+
+
+def sentence(rng, words=(8, 20)):
+    parts = [rng.choice(VERBS).lower(), f"the {rng.choice(INGREDIENTS)}", rng.choice(FILLER)]
+    while sum(len(part.split()) for part in parts) < rng.randint(*words):
+        parts.append(f"with the {rng.choice(INGREDIENTS)} {rng.choice(FILLER)}")
+    text = ' '.join(parts)
+    return text[0].upper() + text[1:] + '.'
+
+
+def recipe_text(rng):
+    """Title, description, ingredients and instructions at typical sizes (about 1-3 KB together)"""
+    title = f"{rng.choice(ADJECTIVES)} {rng.choice(INGREDIENTS).title()} {rng.choice(DISHES)}"
+    description = ' '.join(sentence(rng) for _ in range(rng.randint(1, 3)))
+    ingredients = '\n'.join(
+        f"{rng.randint(1, 4)} {rng.choice(UNITS)} {item}"
+        for item in rng.sample(INGREDIENTS, rng.randint(6, 16))
+    )
+    instructions = '\n'.join(
+        f"{step}. {' '.join(sentence(rng) for _ in range(rng.randint(1, 2)))}"
+        for step in range(1, rng.randint(4, 12) + 1)
+    )
+    return title[:150], description, ingredients, instructions
+
+
+def remark(rng, sentences=(1, 3)):
+    """Comment or review text"""
+    return ' '.join(rng.choice(REMARKS) for _ in range(rng.randint(*sentences)))
@@ -0,0 +1,255 @@
+"""
+Seed a synthetic dataset for the load test and the query plan check.
+
+Creates users, tags, recipes with realistic text sizes, ratings, threaded
+comments, payments and AI requests in the Postgres database named by
+DATABASE_URL (the models use Postgres UUID columns, which other databases
+can't bind from the string ids in request paths), then writes a manifest
+of recipe ids, tags and login credentials for load_test.py. The output is
+the same for the same --seed. tests/test_query_plans.py seeds the same
+dataset through seed().
+
+    DATABASE_URL=postgresql://localhost/recipe_bench \\
+        python backend/benchmarks/dataset.py --recipes 5000 --reset
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from sqlalchemy import insert  # noqa: E402
+from werkzeug.security import generate_password_hash  # noqa: E402
+
+from corpus import INGREDIENTS, TAG_WORDS, recipe_text, remark, sentence  # noqa: E402
+
+from app import create_app  # noqa: E402
+from models import db  # noqa: E402
+from models.ai_request import AIRequest  # noqa: E402
+from models.comment import Comment  # noqa: E402
+from models.payment import Payment  # noqa: E402
+from models.ratings import Rating  # noqa: E402
+from models.recipe import Recipe  # noqa: E402
+from models.recipe_tag import RecipeTag  # noqa: E402
+from models.tag import Tag  # noqa: E402
+from models.user import User  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_MANIFEST = os.path.join(RESULTS_DIR, 'dataset.json')
+
+PASSWORD = 'benchmark-password'
+BATCH_SIZE = 1000
+# How many ids of each kind the manifest keeps for the load test to pick from
+MANIFEST_SAMPLE = 500
+
+
+def _insert(table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(insert(table), rows[start:start + BATCH_SIZE])
+
+
+def _created_at(rng, now, days):
+    return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+
+def seed(users=200, recipes=2000, tags=40, ratings_per_recipe=5, comments_per_recipe=4,
+         reply_ratio=0.4, payments_per_user=10, ai_requests_per_user=10, days=365, seed_value=42):
+    """Insert the dataset in the current app context; returns the manifest"""
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    # Hashing is deliberately slow, so every user shares one hash of PASSWORD
+    password_hash = generate_password_hash(PASSWORD)
+
+    user_rows = [
+        {
+            'id': uuid.UUID(int=rng.getrandbits(128)),
+            'username': f"bench_user_{index}",
+            'email': f"bench_user_{index}@example.com",
+            'password_hash': password_hash,
+            'first_name': 'Bench',
+            'last_name': f"User {index}",
+            'bio': sentence(rng) if rng.random() < 0.5 else None,
+            'is_premium': rng.random() < 0.1,
+            'is_active': True,
+            'is_deleted': False,
+            'created_at': _created_at(rng, now, days)
+        }
+        for index in range(users)
+    ]
+    tag_names = []
+    for index in range(tags):
+        word = TAG_WORDS[index % len(TAG_WORDS)]
+        tag_names.append(word if index < len(TAG_WORDS) else f"{word}-{index // len(TAG_WORDS)}")
+    tag_rows = [
+        {'id': uuid.UUID(int=rng.getrandbits(128)), 'name': name, 'usage_count': 0}
+        for name in tag_names
+    ]
+
+    recipe_rows, recipe_tag_rows = [], []
+    for _ in range(recipes):
+        title, description, ingredients, instructions = recipe_text(rng)
+        recipe_id = uuid.UUID(int=rng.getrandbits(128))
+        recipe_rows.append({
+            'id': recipe_id,
+            'title': title,
+            'description': description,
+            'ingredients': ingredients,
+            'instructions': instructions,
+            'prep_time': rng.choice((5, 10, 15, 20, 30, 45)),
+            'cook_time': rng.choice((10, 20, 30, 45, 60, 90)),
+            'servings': rng.randint(1, 8),
+            'difficulty_level': rng.choice(('easy', 'easy', 'medium', 'medium', 'hard')),
+            'is_featured': rng.random() < 0.05,
+            'view_count': int(rng.paretovariate(1.2) * 10),
+            'author_id': rng.choice(user_rows)['id'],
+            'created_at': _created_at(rng, now, days)
+        })
+        for tag in rng.sample(tag_rows, min(len(tag_rows), rng.randint(1, 5))):
+            tag['usage_count'] += 1
+            recipe_tag_rows.append({'recipe_id': recipe_id, 'tag_id': tag['id']})
+
+    rating_rows, comment_rows = [], []
+    for recipe in recipe_rows:
+        # A few popular recipes collect most ratings and comments
+        weight = min(rng.paretovariate(1.5), 10)
+        raters = rng.sample(user_rows, min(len(user_rows), int(ratings_per_recipe * weight / 2)))
+        for user in raters:
+            rating_rows.append({
+                'id': uuid.UUID(int=rng.getrandbits(128)),
+                'score': rng.choices((1, 2, 3, 4, 5), weights=(1, 2, 5, 10, 8))[0],
+                'review': remark(rng, (1, 1)) if rng.random() < 0.3 else None,
+                'user_id': user['id'],
+                'recipe_id': recipe['id'],
+                'created_at': _created_at(rng, now, days)
+            })
+
+        thread = []
+        for _ in range(int(comments_per_recipe * weight / 2)):
+            parent = rng.choice(thread) if thread and rng.random() < reply_ratio else None
+            comment = {
+                'id': uuid.UUID(int=rng.getrandbits(128)),
+                'content': remark(rng),
+                'is_edited': False,
+                'user_id': rng.choice(user_rows)['id'],
+                'recipe_id': recipe['id'],
+                'parent_id': parent['id'] if parent else None,
+                'created_at': (parent['created_at'] if parent else recipe['created_at'])
+                + timedelta(minutes=rng.randint(1, 60 * 24 * 7))
+            }
+            thread.append(comment)
+        comment_rows.extend(thread)
+
+    payment_rows, ai_request_rows = [], []
+    for user in user_rows:
+        for _ in range(rng.randint(0, payments_per_user * 2)):
+            status = rng.choices(('completed', 'pending', 'failed', 'cancelled'), weights=(80, 5, 10, 5))[0]
+            payment_rows.append({
+                'id': uuid.UUID(int=rng.getrandbits(128)),
+                'amount': rng.choice((99.0, 199.0, 499.0)),
+                'currency': 'INR',
+                'status': status,
+                'payment_id': f"order_bench{rng.getrandbits(48):012x}",
+                'description': rng.choice(('Premium subscription', 'Tip')),
+                'failure_reason': 'Not captured by provider' if status in ('failed', 'cancelled') else None,
+                'user_id': user['id'],
+                'created_at': _created_at(rng, now, days)
+            })
+        for _ in range(rng.randint(0, ai_requests_per_user * 2)):
+            prompt_tokens, completion_tokens = rng.randint(20, 200), rng.randint(200, 900)
+            ai_request_rows.append({
+                'id': uuid.UUID(int=rng.getrandbits(128)),
+                'prompt': f"Recipe with {', '.join(rng.sample(INGREDIENTS, 3))}",
+                'response': sentence(rng),
+                'model_used': 'gemini-pro',
+                'token_used': prompt_tokens + completion_tokens,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'status': 'completed',
+                'user_id': user['id'],
+                'created_at': _created_at(rng, now, days)
+            })
+
+    _insert(User.__table__, user_rows)
+    _insert(Tag.__table__, tag_rows)
+    _insert(Recipe.__table__, recipe_rows)
+    _insert(RecipeTag.__table__, recipe_tag_rows)
+    _insert(Rating.__table__, rating_rows)
+    # Parents come before their replies in comment_rows, so batches satisfy the self-reference
+    _insert(Comment.__table__, comment_rows)
+    _insert(Payment.__table__, payment_rows)
+    _insert(AIRequest.__table__, ai_request_rows)
+    db.session.commit()
+
+    sample = random.Random(seed_value)
+    return {
+        'seed': seed_value,
+        'created_at': now.isoformat(),
+        'counts': {
+            'users': len(user_rows),
+            'tags': len(tag_rows),
+            'recipes': len(recipe_rows),
+            'recipe_tags': len(recipe_tag_rows),
+            'ratings': len(rating_rows),
+            'comments': len(comment_rows),
+            'payments': len(payment_rows),
+            'ai_requests': len(ai_request_rows)
+        },
+        'password': PASSWORD,
+        'emails': [row['email'] for row in sample.sample(user_rows, min(len(user_rows), MANIFEST_SAMPLE))],
+        'recipe_ids': [str(row['id']) for row in sample.sample(recipe_rows, min(len(recipe_rows), MANIFEST_SAMPLE))],
+        'author_ids': sorted({str(row['author_id']) for row in recipe_rows[:MANIFEST_SAMPLE]}),
+        'tags': tag_names
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--recipes', type=int, default=2000)
+    parser.add_argument('--tags', type=int, default=40)
+    parser.add_argument('--ratings-per-recipe', type=int, default=5, help='average; popular recipes get more')
+    parser.add_argument('--comments-per-recipe', type=int, default=4, help='average; popular recipes get more')
+    parser.add_argument('--reply-ratio', type=float, default=0.4, help='share of comments that are replies')
+    parser.add_argument('--payments-per-user', type=int, default=10, help='average')
+    parser.add_argument('--ai-requests-per-user', type=int, default=10, help='average')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--reset', action='store_true', help='drop and recreate all tables first')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL', '').startswith('postgresql'):
+        parser.error('set DATABASE_URL to the Postgres database to seed')
+
+    app = create_app('testing')
+    with app.app_context():
+        if args.reset:
+            db.drop_all()
+        db.create_all()
+        started = time.perf_counter()
+        manifest = seed(
+            users=args.users,
+            recipes=args.recipes,
+            tags=args.tags,
+            ratings_per_recipe=args.ratings_per_recipe,
+            comments_per_recipe=args.comments_per_recipe,
+            reply_ratio=args.reply_ratio,
+            payments_per_user=args.payments_per_user,
+            ai_requests_per_user=args.ai_requests_per_user,
+            seed_value=args.seed
+        )
+        elapsed = time.perf_counter() - started
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.manifest)), exist_ok=True)
+    with open(args.manifest, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    counts = ', '.join(f"{count} {name}" for name, count in manifest['counts'].items())
+    print(f"seeded {counts} in {elapsed:.1f}s; manifest at {args.manifest}")
+
+
+if __name__ == '__main__':
+    main()
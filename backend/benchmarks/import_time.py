@@ -0,0 +1,87 @@
+"""
+Import-time budget check for the app.
+
+Imports the application module in a fresh interpreter with -X importtime,
+reports the slowest imports the module makes and fails if the total exceeds the
+budget or if anything opened a network connection while importing.
+
+    python backend/benchmarks/import_time.py --budget 1.5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app')
+
+# Runs in the child: count socket connects made during import via an audit hook
+PROBE = """
+import json, sys, time
+connects = []
+sys.addaudithook(lambda event, args: connects.append(repr(args[1])) if event == 'socket.connect' else None)
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'connects': connects}}))
+"""
+
+
+def parse_importtime(stderr, module):
+    """(module, cumulative seconds) for the imports made directly by module"""
+    children = []
+    pending = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, _, rest = line.partition(':')
+        _, cumulative, name = (part for part in rest.split('|'))
+        # Each level of nesting adds two spaces; a module is reported after everything it imported
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        if depth == 1:
+            pending.append((name.strip(), int(cumulative) / 1e6))
+        elif depth == 0:
+            if name.strip() == module:
+                children = pending
+            pending = []
+    return children
+
+
+def measure(module):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE.format(module=module)],
+        cwd=APP_DIR,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['imports'] = sorted(parse_importtime(result.stderr, module), key=lambda item: item[1], reverse=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='app')
+    parser.add_argument('--budget', type=float, default=1.5, help='Seconds allowed for the import')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    report = measure(args.module)
+    print(f"import {args.module}: {report['seconds']:.3f}s (budget {args.budget:.3f}s)")
+    for name, seconds in report['imports'][:args.top]:
+        print(f"  {seconds:8.3f}s  {name}")
+
+    failed = False
+    if report['connects']:
+        print(f"Network connections opened during import: {', '.join(report['connects'])}")
+        failed = True
+    if report['seconds'] > args.budget:
+        print("Import time is over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,364 @@
+"""
+Load test the main endpoints against a seeded dataset.
+
+Runs a weighted mix of recipe listing (with filters), recipe detail,
+comments, ratings, login and recipe creation from a fixed number of
+concurrent workers. Reports p50/p95/p99 latency, throughput and SQL
+queries per request of the successful requests for each scenario, plus
+error counts, writes the run to a JSON file and, given a baseline run,
+fails if errors, latency or query counts regressed.
+
+Seed first with dataset.py. By default requests go through the Flask test
+client in this process (DATABASE_URL must point at the seeded Postgres
+database);
+--url targets a running server instead, whose X-SQL-Queries headers
+(SQL_PROFILER=header) supply the query counts.
+
+    python backend/benchmarks/load_test.py --concurrency 8 --duration 60
+    python backend/benchmarks/load_test.py --url http://localhost:5000 \\
+        --baseline backend/benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+from corpus import INGREDIENTS, recipe_text, remark
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCH_DIR, '..', 'app')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+DEFAULT_MANIFEST = os.path.join(RESULTS_DIR, 'dataset.json')
+
+# Relative weights of the request mix; roughly a read-heavy public site
+SCENARIOS = {
+    'list_recipes': 35,
+    'recipe_detail': 25,
+    'recipe_comments': 15,
+    'recipe_ratings': 10,
+    'login': 5,
+    'create_recipe': 5,
+    'create_comment': 5
+}
+PERCENTILES = (50, 95, 99)
+
+
+class InProcessClient:
+    """Requests through the Flask test client; one per worker thread"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Authorization': f"Bearer {token}"} if token else {}
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        return response.status_code, response.get_json(silent=True), response.headers.get('X-SQL-Queries')
+
+
+class HttpClient:
+    """Requests to a running server over HTTP"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                status, payload, response_headers = response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            status, payload, response_headers = e.code, e.read(), e.headers
+        try:
+            parsed = json.loads(payload) if payload else None
+        except ValueError:
+            parsed = None
+        return status, parsed, response_headers.get('X-SQL-Queries')
+
+
+def build_request(scenario, rng, manifest):
+    """(method, path, body, needs_token) for one request of a scenario"""
+    recipe_id = rng.choice(manifest['recipe_ids'])
+    if scenario == 'list_recipes':
+        params = rng.choice((
+            {},
+            {'page': rng.randint(2, 5)},
+            {'difficulty': rng.choice(('easy', 'medium', 'hard'))},
+            {'tag': rng.choice(manifest['tags'])},
+            {'search': rng.choice(INGREDIENTS)},
+            {'author_id': rng.choice(manifest['author_ids'])},
+            {'sort_by': 'view_count', 'per_page': 20}
+        ))
+        query = urllib.parse.urlencode(params)
+        return 'GET', '/api/recipes' + (f"?{query}" if query else ''), None, False
+    if scenario == 'recipe_detail':
+        return 'GET', f"/api/recipes/{recipe_id}", None, False
+    if scenario == 'recipe_comments':
+        return 'GET', f"/api/comments/recipe/{recipe_id}", None, False
+    if scenario == 'recipe_ratings':
+        return 'GET', f"/api/ratings/recipe/{recipe_id}", None, False
+    if scenario == 'login':
+        body = {'email': rng.choice(manifest['emails']), 'password': manifest['password']}
+        return 'POST', '/api/auth/login', body, False
+    if scenario == 'create_recipe':
+        title, description, ingredients, instructions = recipe_text(rng)
+        body = {
+            'title': title,
+            'description': description,
+            'ingredients': ingredients,
+            'instructions': instructions,
+            'prep_time': rng.choice((10, 20, 30)),
+            'cook_time': rng.choice((15, 30, 45)),
+            'servings': rng.randint(1, 6),
+            'difficulty_level': rng.choice(('easy', 'medium', 'hard')),
+            'tags': rng.sample(manifest['tags'], min(len(manifest['tags']), 2))
+        }
+        return 'POST', '/api/recipes', body, True
+    if scenario == 'create_comment':
+        return 'POST', f"/api/comments/recipe/{recipe_id}", {'content': remark(rng)}, True
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def login(client, manifest, rng):
+    status, payload, _ = client.request(
+        'POST', '/api/auth/login', {'email': rng.choice(manifest['emails']), 'password': manifest['password']}
+    )
+    if status != 200 or not payload:
+        raise SystemExit(f"Benchmark login failed with status {status}: {payload}")
+    return payload['access_token']
+
+
+def worker(client, manifest, scenarios, weights, seed, deadline, remaining, samples, lock):
+    rng = random.Random(seed)
+    token = login(client, manifest, rng)
+    local = []
+    while time.perf_counter() < deadline:
+        with lock:
+            if remaining[0] == 0:
+                break
+            remaining[0] -= 1
+        scenario = rng.choices(scenarios, weights)[0]
+        method, path, body, needs_token = build_request(scenario, rng, manifest)
+        started = time.perf_counter()
+        try:
+            status, _, queries = client.request(method, path, body, token if needs_token else None)
+        except Exception as e:
+            status, queries = f"{type(e).__name__}", None
+        elapsed = time.perf_counter() - started
+        local.append((scenario, elapsed, status, int(queries) if queries else None))
+    with lock:
+        samples.extend(local)
+
+
+def percentile(sorted_values, pct):
+    """Linear interpolation between closest ranks"""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def _ok(status):
+    return isinstance(status, int) and status < 400
+
+
+def _rounded(value):
+    return round(value, 2) if value is not None else None
+
+
+def summarize(samples, elapsed):
+    """
+    Latency percentiles (ms), throughput and queries per request, per
+    scenario and overall. Failed requests are only counted as errors: an
+    error page or a refused connection is often faster than the real thing.
+    """
+    groups = {'all': samples}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+
+    summary = {}
+    for name, group in sorted(groups.items()):
+        succeeded = [sample for sample in group if _ok(sample[2])]
+        errors = [status for _, _, status, _ in group if not _ok(status)]
+        latencies = sorted(seconds * 1000 for _, seconds, _, _ in succeeded)
+        queries = [count for _, _, _, count in succeeded if count is not None]
+        summary[name] = {
+            'requests': len(group),
+            'errors': len(errors),
+            'error_rate': round(len(errors) / len(group), 4),
+            'error_statuses': sorted({str(status) for status in errors}),
+            'throughput_rps': round(len(succeeded) / elapsed, 2) if elapsed else None,
+            **{f"p{pct}_ms": _rounded(percentile(latencies, pct)) for pct in PERCENTILES},
+            'mean_ms': _rounded(sum(latencies) / len(latencies) if latencies else None),
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None
+        }
+    return summary
+
+
+def _error_rate(row):
+    return row['errors'] / row['requests'] if row['requests'] else 0.0
+
+
+def compare(summary, baseline, tolerance):
+    """Regressions against a baseline run's summary, one line each"""
+    regressions = []
+    for name, current in summary.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        # Latency and throughput only cover successful requests, so more failures must fail on their own
+        if current['errors'] and _error_rate(current) > _error_rate(before):
+            regressions.append(
+                f"{name}: errors {before['errors']}/{before['requests']} -> {current['errors']}/{current['requests']}"
+            )
+        if before['p95_ms'] and current['p95_ms'] is not None and current['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']}ms -> {current['p95_ms']}ms")
+        if name == 'all' and before['throughput_rps'] and \
+                current['throughput_rps'] < before['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"throughput {before['throughput_rps']} -> {current['throughput_rps']} req/s")
+        if before['queries_per_request'] is not None and current['queries_per_request'] is not None and \
+                current['queries_per_request'] > before['queries_per_request']:
+            regressions.append(
+                f"{name}: queries/request {before['queries_per_request']} -> {current['queries_per_request']}"
+            )
+    return regressions
+
+
+def print_summary(summary, baseline=None):
+    def cell(value):
+        return '-' if value is None else value
+
+    print(f"{'scenario':<18}{'reqs':>7}{'errs':>6}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'queries':>9}")
+    for name, row in summary.items():
+        line = (
+            f"{name:<18}{row['requests']:>7}{row['errors']:>6}{row['throughput_rps']:>9}"
+            f"{cell(row['p50_ms']):>9}{cell(row['p95_ms']):>9}{cell(row['p99_ms']):>9}"
+            f"{cell(row['queries_per_request']):>9}"
+        )
+        before = (baseline or {}).get(name)
+        if before and before['p95_ms'] and row['p95_ms'] is not None:
+            line += f"  p95 {(row['p95_ms'] / before['p95_ms'] - 1) * 100:+.1f}%"
+        print(line)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def in_process_app():
+    # Profiler headers supply the query counts; set before the config is imported
+    os.environ.setdefault('SQL_PROFILER', 'header')
+    sys.path.insert(0, APP_DIR)
+    from app import create_app
+    return create_app('testing')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='base URL of a running server; default is in-process')
+    parser.add_argument('--manifest', default=DEFAULT_MANIFEST, help='written by dataset.py')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run')
+    parser.add_argument('--requests', type=int, help='stop after this many requests instead')
+    parser.add_argument('--warmup', type=int, default=50, help='unrecorded requests per worker first')
+    parser.add_argument('--scenarios', help='comma-separated subset of: ' + ', '.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='result file; default results/run-<timestamp>.json')
+    parser.add_argument('--baseline', help='earlier result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='allowed p95/throughput change')
+    args = parser.parse_args()
+
+    with open(args.manifest) as f:
+        manifest = json.load(f)
+    scenarios = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    weights = [SCENARIOS[name] for name in scenarios]
+
+    if args.url:
+        clients = [HttpClient(args.url) for _ in range(args.concurrency)]
+    else:
+        if not os.environ.get('DATABASE_URL', '').startswith('postgresql'):
+            parser.error('set DATABASE_URL to the seeded Postgres database, or pass --url')
+        app = in_process_app()
+        clients = [InProcessClient(app) for _ in range(args.concurrency)]
+
+    def run(duration, requests, seed):
+        samples, lock = [], threading.Lock()
+        remaining = [requests if requests is not None else -1]
+        deadline = time.perf_counter() + duration
+        threads = [
+            threading.Thread(
+                target=worker,
+                args=(client, manifest, scenarios, weights, seed + index, deadline, remaining, samples, lock)
+            )
+            for index, client in enumerate(clients)
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return samples, time.perf_counter() - started
+
+    if args.warmup:
+        run(float('inf'), args.warmup * args.concurrency, args.seed + 10_000)
+    duration = float('inf') if args.requests else args.duration
+    samples, elapsed = run(duration, args.requests, args.seed)
+    if not samples:
+        raise SystemExit('No requests completed')
+    summary = summarize(samples, elapsed)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['summary']
+    print_summary(summary, baseline)
+
+    result = {
+        'started_at': datetime.utcnow().isoformat(),
+        'revision': git_revision(),
+        'target': args.url or 'in-process',
+        'python': platform.python_version(),
+        'concurrency': args.concurrency,
+        'elapsed_seconds': round(elapsed, 2),
+        'scenarios': {name: SCENARIOS[name] for name in scenarios},
+        'dataset': manifest['counts'],
+        'summary': summary
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"run-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {output}")
+
+    if baseline is not None:
+        regressions = compare(summary, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Per-request cost of the request metrics hooks.
+
+Serves a trivial view through the Flask test client with and without
+init_request_metrics and reports the difference per request. The view does
+no work, so the difference is the instrumentation overhead alone.
+
+    python backend/benchmarks/metrics_overhead.py --requests 20000
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from flask import Blueprint, Flask  # noqa: E402
+
+from utils.request_metrics import init_request_metrics  # noqa: E402
+
+
+def build_app(instrumented):
+    app = Flask(__name__)
+    bench_bp = Blueprint('bench', __name__)
+
+    @bench_bp.route('/ping')
+    def ping():
+        return 'ok'
+
+    app.register_blueprint(bench_bp, url_prefix='/bench')
+    if instrumented:
+        init_request_metrics(app)
+    return app
+
+
+def run(app, requests):
+    client = app.test_client()
+    for _ in range(min(requests // 10, 1000)):
+        client.get('/bench/ping')
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get('/bench/ping')
+    return (time.perf_counter() - started) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+
+    plain, instrumented = build_app(False), build_app(True)
+    baseline, measured = [], []
+    # Alternate rounds so drift (CPU frequency, caches) hits both sides equally
+    for _ in range(args.rounds):
+        baseline.append(run(plain, args.requests))
+        measured.append(run(instrumented, args.requests))
+
+    base = statistics.median(baseline)
+    with_metrics = statistics.median(measured)
+    print(f"without metrics: {base:8.1f} us/request")
+    print(f"with metrics:    {with_metrics:8.1f} us/request")
+    print(f"overhead:        {with_metrics - base:8.1f} us/request ({(with_metrics / base - 1) * 100:.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Serialization cost per model: to_dict plus Flask's default JSON provider
+against the precompiled serializers plus the orjson provider.
+
+Builds unsaved model instances with realistic text (no database needed),
+checks that both paths produce byte-identical JSON, and reports the time
+per object for each.
+
+    python backend/benchmarks/serialization.py --objects 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+
+from flask import Flask  # noqa: E402
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+
+from corpus import TAG_WORDS, recipe_text, remark, sentence  # noqa: E402
+# User's relationships resolve by class name, so every related model must be imported
+from models.ai_request import AIRequest  # noqa: E402,F401
+from models.comment import Comment  # noqa: E402
+from models.payment import Payment  # noqa: E402,F401
+from models.ratings import Rating  # noqa: E402
+from models.recipe import Recipe  # noqa: E402
+from models.tag import Tag  # noqa: E402
+from models.user import User  # noqa: E402
+from utils import json_provider  # noqa: E402
+from utils.serializers import (  # noqa: E402
+    serialize_comment, serialize_comment_replies, serialize_rating, serialize_recipe,
+    serialize_recipe_relations, serialize_tag, serialize_user
+)
+
+
+def _moment(rng):
+    return datetime(2024, 1, 1) + timedelta(seconds=rng.randint(0, 30_000_000), microseconds=rng.randint(0, 999999))
+
+
+def build(rng, count):
+    users = [
+        User(
+            id=uuid.uuid4(), username=f"cook_{index}", email=f"cook_{index}@example.com", password_hash='x',
+            first_name='Priyā', last_name=f"Cook {index}", bio=sentence(rng), is_premium=index % 7 == 0,
+            is_active=True, created_at=_moment(rng)
+        )
+        for index in range(50)
+    ]
+    tags = [Tag(id=uuid.uuid4(), name=name, usage_count=rng.randint(0, 500), created_at=_moment(rng)) for name in TAG_WORDS]
+
+    recipes = []
+    for _ in range(count):
+        title, description, ingredients, instructions = recipe_text(rng)
+        recipe = Recipe(
+            id=uuid.uuid4(), title=title, description=description, ingredients=ingredients,
+            instructions=instructions, prep_time=rng.choice((10, 20)), cook_time=rng.choice((15, 45, None)),
+            servings=4, difficulty_level='medium', is_featured=False, view_count=rng.randint(0, 9999),
+            author_id=None, created_at=_moment(rng), updated_at=rng.choice((None, _moment(rng)))
+        )
+        recipe.author = rng.choice(users)
+        recipe.author_id = recipe.author.id
+        recipe.tags = rng.sample(tags, 3)
+        recipe.ratings = [
+            Rating(id=uuid.uuid4(), score=rng.randint(1, 5), review=remark(rng), user=user, user_id=user.id,
+                   recipe_id=recipe.id, created_at=_moment(rng))
+            for user in rng.sample(users, rng.randint(0, 6))
+        ]
+        comments = []
+        for _ in range(rng.randint(0, 5)):
+            user = rng.choice(users)
+            comment = Comment(id=uuid.uuid4(), content=remark(rng), is_edited=False, user=user, user_id=user.id,
+                              recipe_id=recipe.id, created_at=_moment(rng))
+            comment.replies = [
+                Comment(id=uuid.uuid4(), content=remark(rng), is_edited=True, edited_at=_moment(rng), user=reply_user,
+                        user_id=reply_user.id, recipe_id=recipe.id, parent_id=comment.id, created_at=_moment(rng))
+                for reply_user in rng.sample(users, rng.randint(0, 2))
+            ]
+            comments.append(comment)
+        recipe.comments = comments
+        recipes.append(recipe)
+    return users, tags, recipes
+
+
+def fast_recipe(recipe):
+    """recipe_dicts without the queries: related data is already in memory here"""
+    scores = [rating.score for rating in recipe.ratings]
+    return serialize_recipe_relations(
+        recipe,
+        (recipe.prep_time or 0) + (recipe.cook_time or 0),
+        sum(scores) / len(scores) if scores else 0,
+        len(scores),
+        serialize_user(recipe.author),
+        [serialize_tag(tag) for tag in recipe.tags],
+        len(recipe.comments)
+    )
+
+
+def cases(users, tags, recipes):
+    comments = [comment for recipe in recipes for comment in recipe.comments]
+    ratings = [rating for recipe in recipes for rating in recipe.ratings]
+    return {
+        'user': (users, lambda u: u.to_dict(), serialize_user),
+        'tag': (tags, lambda t: t.to_dict(), serialize_tag),
+        'recipe': (
+            recipes,
+            lambda r: r.to_dict(),
+            lambda r: serialize_recipe(
+                r, r.total_time, r.average_rating, r.rating_count
+            )
+        ),
+        'recipe+relations': (recipes, lambda r: r.to_dict(include_relations=True), fast_recipe),
+        'rating': (ratings, lambda r: r.to_dict(), lambda r: serialize_rating(r, serialize_user(r.user))),
+        'comment+replies': (
+            comments,
+            lambda c: c.to_dict(include_replies=True),
+            lambda c: serialize_comment_replies(
+                c, serialize_user(c.user), [serialize_comment(reply, serialize_user(reply.user)) for reply in c.replies]
+            )
+        )
+    }
+
+
+def timed(function, rounds):
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--objects', type=int, default=2000, help='recipes to build')
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    stdlib = DefaultJSONProvider(app)
+    users, tags, recipes = build(random.Random(args.seed), args.objects)
+    encoder = 'orjson' if json_provider.orjson else 'stdlib (orjson not installed)'
+    print(f"fast path encoder: {encoder}")
+    print(f"{'model':<18}{'objects':>8}{'to_dict+json':>16}{'serializer':>14}{'speedup':>9}")
+
+    failed = False
+    for name, (objects, old, new) in cases(users, tags, recipes).items():
+        def legacy():
+            return stdlib.dumps({'items': [old(obj) for obj in objects]}, separators=(',', ':')).encode()
+
+        def fast():
+            return json_provider.dumps_bytes({'items': [new(obj) for obj in objects]})
+
+        if legacy() != fast():
+            print(f"{name}: output differs from to_dict")
+            failed = True
+            continue
+        before = timed(legacy, args.rounds) / len(objects) * 1e6
+        after = timed(fast, args.rounds) / len(objects) * 1e6
+        print(f"{name:<18}{len(objects):>8}{before:>13.1f} us{after:>11.1f} us{before / after:>8.1f}x")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
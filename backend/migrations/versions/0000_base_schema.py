@@ -0,0 +1,143 @@
+"""Base schema: the tables as the app first created them
+
+Lets `flask db upgrade` build an empty database; the later revisions alter
+these tables. Databases created by db.create_all() already have them, and
+every statement is IF NOT EXISTS, so the revision is a no-op there.
+
+Revision ID: 0000
+Revises:
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0000'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# In dependency order; downgrade drops them in reverse
+TABLES = {
+    'users': """
+        id UUID PRIMARY KEY,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        updated_at TIMESTAMP WITHOUT TIME ZONE,
+        is_deleted BOOLEAN,
+        username VARCHAR(80) NOT NULL,
+        email VARCHAR(120) NOT NULL,
+        password_hash VARCHAR(128) NOT NULL,
+        is_premium BOOLEAN,
+        first_name VARCHAR(50),
+        last_name VARCHAR(50),
+        bio TEXT,
+        profile_image_url VARCHAR(255),
+        last_login TIMESTAMP WITHOUT TIME ZONE,
+        is_active BOOLEAN
+    """,
+    'recipes': """
+        id UUID PRIMARY KEY,
+        title VARCHAR(150) NOT NULL,
+        description TEXT NOT NULL,
+        ingredients TEXT NOT NULL,
+        instructions TEXT NOT NULL,
+        image_url VARCHAR(255),
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        updated_at TIMESTAMP WITHOUT TIME ZONE,
+        prep_time INTEGER,
+        cook_time INTEGER,
+        servings INTEGER,
+        difficulty_level VARCHAR(20),
+        is_featured BOOLEAN,
+        view_count INTEGER,
+        author_id UUID NOT NULL REFERENCES users (id)
+    """,
+    'comments': """
+        id UUID PRIMARY KEY,
+        content TEXT NOT NULL,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        is_edited BOOLEAN,
+        edited_at TIMESTAMP WITHOUT TIME ZONE,
+        user_id UUID NOT NULL REFERENCES users (id),
+        recipe_id UUID NOT NULL REFERENCES recipes (id),
+        parent_id UUID REFERENCES comments (id)
+    """,
+    'ratings': """
+        id UUID PRIMARY KEY,
+        score INTEGER NOT NULL,
+        review TEXT,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        user_id UUID NOT NULL REFERENCES users (id),
+        recipe_id UUID NOT NULL REFERENCES recipes (id),
+        CONSTRAINT unique_user_recipe_rating UNIQUE (user_id, recipe_id)
+    """,
+    'tags': """
+        id UUID PRIMARY KEY,
+        name VARCHAR(50) NOT NULL,
+        description VARCHAR(200),
+        color VARCHAR(7),
+        usage_count INTEGER
+    """,
+    'recipe_tags': """
+        recipe_id UUID REFERENCES recipes (id),
+        tag_id UUID REFERENCES tags (id),
+        created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+        PRIMARY KEY (recipe_id, tag_id)
+    """,
+    'payments': """
+        id UUID PRIMARY KEY,
+        amount DOUBLE PRECISION NOT NULL,
+        currency VARCHAR(10),
+        status VARCHAR(20),
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        payment_id VARCHAR(50),
+        payment_method VARCHAR(50),
+        description VARCHAR(200),
+        failure_reason VARCHAR(200),
+        user_id UUID NOT NULL REFERENCES users (id)
+    """,
+    'ai_requests': """
+        id UUID PRIMARY KEY,
+        prompt TEXT NOT NULL,
+        response TEXT,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        model_used VARCHAR(50),
+        token_used INTEGER,
+        cost DOUBLE PRECISION,
+        status VARCHAR(20),
+        error_message TEXT,
+        user_id UUID NOT NULL REFERENCES users (id)
+    """,
+    # Keyed by user_id until 0002 gives it an id column
+    'audit_logs': """
+        user_id UUID PRIMARY KEY,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        action VARCHAR(50) NOT NULL,
+        table_name VARCHAR(50) NOT NULL,
+        record_id UUID NOT NULL,
+        changes JSON,
+        ip_address VARCHAR(45),
+        user_agent VARCHAR(500)
+    """,
+}
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_users_created_at ON users (created_at)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_username ON users (username)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_tags_name ON tags (name)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_logs_created_at ON audit_logs (created_at)",
+]
+
+
+def upgrade():
+    for table, columns in TABLES.items():
+        op.execute(f"CREATE TABLE IF NOT EXISTS {table} ({columns})")
+    for statement in INDEXES:
+        op.execute(statement)
+
+
+def downgrade():
+    for table in reversed(list(TABLES)):
+        op.execute(f"DROP TABLE IF EXISTS {table}")
@@ -0,0 +1,50 @@
+"""Soft-delete columns on recipes and comments, and the archive tables
+
+Databases created by db.create_all() from the current models already have
+all of this; the IF NOT EXISTS clauses make the revision a no-op there.
+
+Revision ID: 0001
+Revises: 0000
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = '0000'
+branch_labels = None
+depends_on = None
+
+# Archive tables take the live table's columns (LIKE copies types and NOT
+# NULL, but no defaults or foreign keys), keyed like the live table
+ARCHIVES = {
+    'recipes': 'id',
+    'comments': 'id',
+    'ratings': 'id',
+    'recipe_tags': 'recipe_id, tag_id'
+}
+
+
+def upgrade():
+    for table in ('recipes', 'comments'):
+        op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS is_deleted BOOLEAN NOT NULL DEFAULT false")
+        op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITHOUT TIME ZONE")
+
+    for table, key in ARCHIVES.items():
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS {table}_archive ("
+            f"LIKE {table}, archived_at TIMESTAMP WITHOUT TIME ZONE NOT NULL, PRIMARY KEY ({key}))"
+        )
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_archive_archived_at ON {table}_archive (archived_at)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_comments_archive_recipe_id ON comments_archive (recipe_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_ratings_archive_recipe_id ON ratings_archive (recipe_id)")
+
+
+def downgrade():
+    for table in ARCHIVES:
+        op.execute(f"DROP TABLE IF EXISTS {table}_archive")
+    for table in ('recipes', 'comments'):
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS deleted_at")
+        op.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS is_deleted")
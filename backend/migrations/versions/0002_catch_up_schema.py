@@ -0,0 +1,111 @@
+"""Tables and columns the models gained without a revision
+
+payment_events (webhook inbox), ai_usage_rollups (daily AI usage, filled
+from the completed ai_requests already recorded), the token and latency
+columns on ai_requests, a surrogate primary key on audit_logs (user_id
+was the key, so one user could only ever have one row), tags.created_at
+and a password_hash wide enough for scrypt hashes.
+
+Like 0001, every step checks what is already there, so databases created
+by db.create_all() pass through unchanged.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+AI_REQUEST_COLUMNS = {
+    'prompt_tokens': 'INTEGER',
+    'completion_tokens': 'INTEGER',
+    'tokens_estimated': 'BOOLEAN DEFAULT false',
+    'cache_hit': 'BOOLEAN DEFAULT false',
+    'queue_wait_ms': 'DOUBLE PRECISION',
+    'upstream_latency_ms': 'DOUBLE PRECISION',
+}
+
+
+def _audit_log_key():
+    return sa.inspect(op.get_bind()).get_pk_constraint('audit_logs')
+
+
+def upgrade():
+    op.execute("ALTER TABLE users ALTER COLUMN password_hash TYPE VARCHAR(255)")
+    op.execute("ALTER TABLE tags ADD COLUMN IF NOT EXISTS created_at TIMESTAMP WITHOUT TIME ZONE")
+    for column, definition in AI_REQUEST_COLUMNS.items():
+        op.execute(f"ALTER TABLE ai_requests ADD COLUMN IF NOT EXISTS {column} {definition}")
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS payment_events (
+            id UUID PRIMARY KEY,
+            event_id VARCHAR(64) NOT NULL UNIQUE,
+            event_type VARCHAR(50) NOT NULL,
+            order_id VARCHAR(50),
+            payload JSON NOT NULL,
+            status VARCHAR(20),
+            error_message TEXT,
+            received_at TIMESTAMP WITHOUT TIME ZONE,
+            processed_at TIMESTAMP WITHOUT TIME ZONE
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_payment_events_order_id ON payment_events (order_id)")
+
+    rollups_exist = sa.inspect(op.get_bind()).has_table('ai_usage_rollups')
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS ai_usage_rollups (
+            user_id UUID NOT NULL REFERENCES users (id),
+            day DATE NOT NULL,
+            model_used VARCHAR(50) NOT NULL,
+            requests INTEGER NOT NULL,
+            cache_hits INTEGER NOT NULL,
+            prompt_tokens BIGINT NOT NULL,
+            completion_tokens BIGINT NOT NULL,
+            cost DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (user_id, day, model_used)
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_ai_usage_rollups_day_model ON ai_usage_rollups (day, model_used)")
+    if not rollups_exist:
+        # Monthly quotas sum the rollups; older requests only recorded token_used
+        op.execute("""
+            INSERT INTO ai_usage_rollups
+            SELECT user_id, created_at::date, COALESCE(model_used, 'unknown'), count(*),
+                   count(*) FILTER (WHERE cache_hit),
+                   SUM(COALESCE(prompt_tokens, 0)),
+                   SUM(COALESCE(completion_tokens, token_used, 0)),
+                   SUM(COALESCE(cost, 0))
+            FROM ai_requests
+            WHERE status = 'completed' AND created_at IS NOT NULL
+            GROUP BY 1, 2, 3
+        """)
+
+    key = _audit_log_key()
+    if key['constrained_columns'] != ['id']:
+        op.execute("ALTER TABLE audit_logs ADD COLUMN IF NOT EXISTS id UUID")
+        op.execute("UPDATE audit_logs SET id = gen_random_uuid() WHERE id IS NULL")
+        op.execute("ALTER TABLE audit_logs ALTER COLUMN id SET NOT NULL")
+        if key['name']:
+            op.execute(f"ALTER TABLE audit_logs DROP CONSTRAINT {key['name']}")
+        op.execute("ALTER TABLE audit_logs ADD PRIMARY KEY (id)")
+        op.execute("ALTER TABLE audit_logs ALTER COLUMN user_id DROP NOT NULL")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_audit_logs_user_id ON audit_logs (user_id)")
+
+
+def downgrade():
+    # audit_logs keeps its id key and users.password_hash its width: audit rows
+    # can't be keyed by user_id again, and longer hashes would not fit
+    op.execute("DROP INDEX IF EXISTS ix_audit_logs_user_id")
+    op.execute("DROP TABLE IF EXISTS ai_usage_rollups")
+    op.execute("DROP TABLE IF EXISTS payment_events")
+    for column in AI_REQUEST_COLUMNS:
+        op.execute(f"ALTER TABLE ai_requests DROP COLUMN IF EXISTS {column}")
+    op.execute("ALTER TABLE tags DROP COLUMN IF EXISTS created_at")
@@ -0,0 +1,64 @@
+"""Composite indexes for the routes' filters and sort orders
+
+Built with CREATE INDEX CONCURRENTLY so writes carry on during the build;
+each statement runs outside a transaction. A build that failed part way
+leaves an invalid index behind, which is dropped and rebuilt. The same
+indexes are declared in the models' __table_args__ for db.create_all().
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+# name -> (table, columns and predicate). B-tree indexes scan both ways, so
+# created_at columns serve ORDER BY created_at DESC as well.
+INDEXES = {
+    # Recipe listings, sitemaps and feeds: live rows only
+    'ix_recipes_live_created': ('recipes', '(created_at, id) WHERE NOT is_deleted'),
+    'ix_recipes_live_author_created': ('recipes', '(author_id, created_at) WHERE NOT is_deleted'),
+    'ix_recipes_live_featured_created': ('recipes', '(created_at) WHERE is_featured AND NOT is_deleted'),
+    'ix_recipes_deleted_at': ('recipes', '(deleted_at) WHERE is_deleted'),
+    # Comment threads (top level: parent_id IS NULL), reply and count lookups
+    'ix_comments_recipe_parent_created': ('comments', '(recipe_id, parent_id, created_at)'),
+    'ix_comments_parent_id': ('comments', '(parent_id)'),
+    'ix_comments_deleted_at': ('comments', '(deleted_at) WHERE is_deleted'),
+    'ix_ratings_recipe_created': ('ratings', '(recipe_id, created_at)'),
+    'ix_recipe_tags_tag_recipe': ('recipe_tags', '(tag_id, recipe_id)'),
+    # Payment history, webhook matching and reconciliation
+    'ix_payments_user_status_created': ('payments', '(user_id, status, created_at)'),
+    'ix_payments_payment_id': ('payments', '(payment_id)'),
+    'ix_payments_pending_created': ('payments', "(created_at, id) WHERE status = 'pending'"),
+    'ix_ai_requests_user_created': ('ai_requests', '(user_id, created_at)'),
+    'ix_payment_events_received': ('payment_events', "(received_at) WHERE status = 'received'"),
+}
+
+
+def _invalid_indexes():
+    return set(op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+    )).scalars())
+
+
+def upgrade():
+    invalid = _invalid_indexes()
+    with op.get_context().autocommit_block():
+        for name, (table, definition) in INDEXES.items():
+            if name in invalid:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}")
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
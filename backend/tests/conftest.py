@@ -0,0 +1,160 @@
+"""
+Tests run against the Postgres database named by TEST_DATABASE_URL. Its
+tables are dropped and recreated once per session, so point it at a
+database kept for tests. Without it the tests that need one are skipped.
+
+    TEST_DATABASE_URL=postgresql://localhost/recipe_test python -m pytest backend/tests
+
+The app has one read replica: the second database in
+TEST_REPLICA_DATABASE_URL, whose tables are recreated the same way, or
+else the test database itself. Nothing replicates into a second database,
+so requests read from the primary unless the test uses `replicas`.
+"""
+import os
+import sys
+import uuid
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'app'))
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+from testing import query_budget  # noqa: E402,F401
+
+
+@pytest.fixture(scope='session')
+def app():
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip('TEST_DATABASE_URL is not set')
+    # create_app reads DATABASE_URL over the config class
+    os.environ['DATABASE_URL'] = url
+
+    from app import create_app
+    from config import TestingConfig
+    from models import db
+
+    TestingConfig.DB_REPLICA_URLS = [os.environ.get('TEST_REPLICA_DATABASE_URL') or url]
+    app = create_app('testing')
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            pytest.skip('the tests need Postgres')
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+        # The models have no bind key; give the replica their tables too
+        replica = db.engines['replica_0']
+        if replica.url != db.engine.url:
+            db.metadata.drop_all(replica)
+            db.metadata.create_all(replica)
+    return app
+
+
+@pytest.fixture(autouse=True)
+def app_context(request):
+    """Tests that use the app run inside its context; the others don't need a database"""
+    if 'app' not in request.fixturenames:
+        yield None
+        return
+    with request.getfixturevalue('app').app_context() as context:
+        yield context
+
+
+@pytest.fixture(autouse=True)
+def primary_reads(request):
+    """Requests read from the primary unless the test routes them with `replicas`"""
+    if 'app' not in request.fixturenames or 'replicas' in request.fixturenames:
+        yield
+        return
+    extensions = request.getfixturevalue('app').extensions
+    replicas = extensions.pop('db_replicas')
+    yield
+    extensions['db_replicas'] = replicas
+
+
+@pytest.fixture
+def replicas(app):
+    """The app's replica set, due for a health check, so safe-method requests read from it"""
+    replicas = app.extensions['db_replicas']
+    for state in replicas.state.values():
+        state['checked_at'] = 0.0
+    yield replicas
+    for state in replicas.state.values():
+        state.update(healthy=False, checked_at=0.0)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    from models import db
+    from models.user import User
+
+    def make_user(**fields):
+        name = f"user_{uuid.uuid4().hex[:10]}"
+        user = User(username=name, email=f"{name}@example.com", **fields)
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def admin(make_user, monkeypatch):
+    from models.user import User
+
+    # Admin rights come from an is_admin attribute the users table doesn't have yet
+    monkeypatch.setattr(User, 'is_admin', True, raising=False)
+    return make_user()
+
+
+@pytest.fixture
+def make_payment(make_user):
+    from models import db
+    from models.payment import Payment
+
+    def make_payment(user=None, **fields):
+        fields.setdefault('payment_id', f"order_{uuid.uuid4().hex[:14]}")
+        fields.setdefault('description', 'Premium subscription')
+        payment = Payment(user_id=(user or make_user()).id, amount=499.0, status='pending', **fields)
+        db.session.add(payment)
+        db.session.commit()
+        return payment
+
+    return make_payment
+
+
+@pytest.fixture
+def make_recipe(make_user):
+    from models import db
+    from models.recipe import Recipe
+
+    def make_recipe(author=None, **fields):
+        fields.setdefault('title', 'Dal tadka')
+        recipe = Recipe(
+            author_id=(author or make_user()).id,
+            description='Yellow lentils with a cumin and garlic tempering',
+            ingredients='toor dal, cumin, garlic, ghee',
+            instructions='Cook the dal, then pour the tempering over it',
+            **fields
+        )
+        db.session.add(recipe)
+        db.session.commit()
+        return recipe
+
+    return make_recipe
+
+
+@pytest.fixture
+def auth_headers():
+    from flask_jwt_extended import create_access_token
+
+    def auth_headers(user):
+        return {'Authorization': f"Bearer {create_access_token(identity=str(user.id))}"}
+
+    return auth_headers
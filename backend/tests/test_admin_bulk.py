@@ -0,0 +1,33 @@
+from models import db
+from models.recipe import Recipe
+
+
+def test_bulk_delete_refuses_filters_over_the_row_cap(app, client, admin, auth_headers, make_user,
+                                                       make_recipe, monkeypatch):
+    author = make_user()
+    recipes = [make_recipe(author=author) for _ in range(3)]
+    monkeypatch.setitem(app.config, 'BULK_UPDATE_MAX_ROWS', 2)
+
+    response = client.post('/api/admin/recipes/bulk-delete', json={'author_id': str(author.id)},
+                           headers=auth_headers(admin))
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Too many rows matched'
+    db.session.expire_all()
+    assert not any(db.session.get(Recipe, recipe.id).is_deleted for recipe in recipes)
+
+
+def test_bulk_delete_updates_matches_within_the_cap(app, client, admin, auth_headers, make_user,
+                                                    make_recipe, monkeypatch):
+    author = make_user()
+    recipes = [make_recipe(author=author) for _ in range(3)]
+    monkeypatch.setitem(app.config, 'BULK_UPDATE_MAX_ROWS', 3)
+
+    response = client.post('/api/admin/recipes/bulk-delete', json={'author_id': str(author.id)},
+                           headers=auth_headers(admin))
+
+    assert response.status_code == 200
+    assert response.get_json()['updated'] == 3
+    assert set(response.get_json()['ids']) == {str(recipe.id) for recipe in recipes}
+    db.session.expire_all()
+    assert all(db.session.get(Recipe, recipe.id).is_deleted for recipe in recipes)
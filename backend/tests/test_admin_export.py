@@ -0,0 +1,61 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+
+from models import db
+from models.audit_log import AuditLog
+from models.user import User
+from utils.exports import stream_query
+
+
+def test_ndjson_export_has_a_line_per_row(client, admin, auth_headers, make_user):
+    since = datetime.utcnow().isoformat()
+    user_ids = [str(make_user().id) for _ in range(3)]
+
+    response = client.get(f"/api/admin/export/users?since={since}", headers=auth_headers(admin))
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.headers['Content-Disposition'].endswith('.ndjson"')
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert sorted(row['id'] for row in rows) == sorted(user_ids)
+    assert rows[0]['is_premium'] is False
+    assert rows[0]['last_login'] is None
+
+
+def test_csv_export_of_the_audit_log_includes_its_ids(client, admin, auth_headers):
+    since = datetime.utcnow().isoformat()
+    headers = auth_headers(admin)
+    client.get(f"/api/admin/export/users?since={since}", headers=headers)
+
+    response = client.get(f"/api/admin/export/audit-logs?format=csv&since={since}", headers=headers)
+
+    assert response.mimetype == 'text/csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    logged = AuditLog.query.filter(AuditLog.created_at >= datetime.fromisoformat(since)).all()
+    assert sorted(row['id'] for row in rows) == sorted(str(entry.id) for entry in logged)
+    assert {row['action'] for row in rows} == {'ADMIN_EXPORT'}
+    assert rows[0]['changes'].startswith('{')
+
+
+def test_exports_stream_from_a_cursor_a_batch_at_a_time(make_user):
+    since = datetime.utcnow()
+    users = [make_user() for _ in range(5)]
+    stmt = select(User.id, User.username).where(User.created_at >= since).order_by(User.created_at)
+    pool = db.engine.pool
+
+    chunks = list(stream_query(stmt, fmt='ndjson', batch_size=2))
+    assert [chunk.count('\n') for chunk in chunks] == [2, 2, 1]
+    assert [json.loads(line)['id'] for line in ''.join(chunks).splitlines()] == [str(user.id) for user in users]
+
+    # A client that goes away part way releases the connection
+    checked_out = pool.checkedout()
+    export = stream_query(stmt, fmt='csv', batch_size=2)
+    assert next(export) == 'id,username\r\n'
+    assert next(export).count('\n') == 2
+    assert pool.checkedout() == checked_out + 1
+    export.close()
+    assert pool.checkedout() == checked_out
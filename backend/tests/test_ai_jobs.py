@@ -0,0 +1,67 @@
+import json
+import threading
+import time
+
+from models import db
+from models.ai_request import AIRequest
+from routes import ai_routes
+
+
+def read_events(response):
+    """(event, data) pairs of a server-sent event body"""
+    events = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in lines:
+            events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_submit_poll_and_stream(client, make_user, auth_headers):
+    headers = auth_headers(make_user(is_premium=True))
+
+    response = client.post('/api/ai/generate-recipe', json={'prompt': 'saffron rice', 'fresh': True}, headers=headers)
+    assert response.status_code == 202
+    body = response.get_json()
+
+    deadline = time.monotonic() + 5
+    while True:
+        request = client.get(body['poll_url'], headers=headers).get_json()['request']
+        if request['status'] != 'pending' or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert request['status'] == 'completed'
+    assert request['response'].startswith('Recipe for: ')
+
+    events = read_events(client.get(body['stream_url'], headers=headers))
+    assert events[-1] == ('done', {'status': 'completed', 'error': None})
+    assert ''.join(data['text'] for event, data in events if event == 'token') == request['response']
+
+
+def test_stream_ends_when_the_row_settles_without_a_token_buffer(client, make_user, auth_headers, monkeypatch):
+    monkeypatch.setattr(ai_routes, 'STATUS_CHECK_INTERVAL', 0.1)
+    user = make_user(is_premium=True)
+    ai_request = AIRequest(prompt='masala chai', model_used='gemini-pro', status='pending', user_id=user.id)
+    db.session.add(ai_request)
+    db.session.commit()
+    request_id = ai_request.id
+
+    def settle():
+        # Finished by a worker in another process: the row changes, this process sees no tokens
+        with client.application.app_context():
+            row = db.session.get(AIRequest, request_id)
+            row.status = 'completed'
+            row.response = 'Brew the tea with milk and spices'
+            db.session.commit()
+
+    timer = threading.Timer(0.3, settle)
+    timer.start()
+    started = time.monotonic()
+    events = read_events(client.get(f"/api/ai/requests/{request_id}/stream", headers=auth_headers(user)))
+    timer.join()
+
+    assert time.monotonic() - started < 5
+    assert events == [
+        ('token', {'text': 'Brew the tea with milk and spices'}),
+        ('done', {'status': 'completed', 'error': None})
+    ]
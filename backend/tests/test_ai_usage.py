@@ -0,0 +1,75 @@
+from datetime import date, datetime
+
+from models import db
+from models.ai_request import AIRequest
+from models.ai_usage import AIUsageRollup
+from services import ai_usage
+from services.ai_jobs import generate_recipe_job
+from services.gemini_fake import FakeGeminiModel
+
+
+class FrozenDatetime(datetime):
+    """UTC is already on the 1st while local time may still be the 31st"""
+
+    @classmethod
+    def utcnow(cls):
+        return cls(2026, 11, 1, 0, 30)
+
+
+def test_usage_rolls_up_on_the_utc_day(make_user, monkeypatch):
+    monkeypatch.setattr(ai_usage, 'datetime', FrozenDatetime)
+    user = make_user()
+
+    ai_usage.record_usage(user.id, 'gemini-pro', prompt_tokens=100, completion_tokens=50)
+    ai_usage.record_usage(user.id, 'gemini-pro', prompt_tokens=10, completion_tokens=5)
+    db.session.commit()
+
+    rollup = AIUsageRollup.query.filter_by(user_id=user.id).one()
+    assert rollup.day == date(2026, 11, 1)
+    assert rollup.requests == 2
+    assert ai_usage.tokens_used_this_month(user.id) == 165
+
+
+def premium_quota(app, monkeypatch, tokens):
+    monkeypatch.setitem(app.config, 'AI_MONTHLY_TOKEN_QUOTA', dict(app.config['AI_MONTHLY_TOKEN_QUOTA'], premium=tokens))
+
+
+def test_running_generations_hold_part_of_the_quota(app, make_user, monkeypatch):
+    premium_quota(app, monkeypatch, 1000)
+    user = make_user(is_premium=True)
+    day = ai_usage.utc_today()
+    ai_usage.record_usage(user.id, 'gemini-pro', prompt_tokens=400, completion_tokens=200)
+
+    assert ai_usage.reserve_tokens(user, 'gemini-pro', 500, day) == (True, 600, 1000)
+    db.session.commit()
+    # A second job for the same user now sees the first one's share
+    assert ai_usage.reserve_tokens(user, 'gemini-pro', 500, day) == (False, 1100, 1000)
+
+    ai_usage.release_tokens(user.id, 'gemini-pro', 500, day)
+    db.session.commit()
+    assert ai_usage.tokens_used_this_month(user.id) == 600
+    assert AIUsageRollup.query.filter_by(user_id=user.id).one().requests == 1
+
+
+def test_job_rechecks_the_quota_before_calling_the_model(app, make_user, monkeypatch):
+    premium_quota(app, monkeypatch, 1000)
+    model = FakeGeminiModel()
+    monkeypatch.setitem(app.extensions, 'gemini_fake', model)
+    user = make_user(is_premium=True)
+    requests = [AIRequest(prompt=f"soup {n}", model_used='gemini-pro', status='pending', user_id=user.id) for n in range(2)]
+    db.session.add_all(requests)
+    db.session.commit()
+
+    generate_recipe_job(str(requests[0].id))
+    db.session.expire_all()
+    assert requests[0].status == 'completed'
+    # The reservation is gone; only what was actually used counts
+    assert ai_usage.tokens_used_this_month(user.id) == requests[0].token_used
+
+    ai_usage.record_usage(user.id, 'gemini-pro', completion_tokens=1000)
+    db.session.commit()
+    generate_recipe_job(str(requests[1].id))
+    db.session.expire_all()
+    assert requests[1].status == 'failed'
+    assert requests[1].error_message == 'Monthly AI token quota exceeded'
+    assert len(model.calls) == 1
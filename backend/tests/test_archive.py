@@ -0,0 +1,111 @@
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from models import db
+from models.archive import comments_archive, ratings_archive, recipe_tags_archive, recipes_archive
+from models.comment import Comment
+from models.ratings import Rating
+from models.recipe import Recipe
+from models.tag import Tag
+from services.archive import archive_deleted, restore
+
+OLDER_THAN = timedelta(days=30)
+LONG_AGO = datetime.utcnow() - timedelta(days=60)
+
+
+def count(table, **where):
+    return db.session.execute(
+        select(func.count()).select_from(table).where(*(table.c[name] == value for name, value in where.items()))
+    ).scalar()
+
+
+def comment(recipe, make_user, parent_id=None, deleted=False):
+    """Id of a new comment; the row object goes stale once it is archived"""
+    row = Comment(
+        recipe_id=recipe.id, user_id=make_user().id, content='Needs more salt', parent_id=parent_id,
+        is_deleted=deleted, deleted_at=LONG_AGO if deleted else None
+    )
+    db.session.add(row)
+    db.session.commit()
+    return row.id
+
+
+def test_a_recipe_is_archived_and_restored_with_everything_on_it(make_recipe, make_user):
+    recipe = make_recipe()
+    tag = Tag(name=f"archive-{uuid.uuid4().hex[:8]}", usage_count=1)
+    recipe.tags.append(tag)
+    db.session.add(Rating(recipe_id=recipe.id, user_id=make_user().id, score=5))
+    db.session.commit()
+    top = comment(recipe, make_user)
+    reply = comment(recipe, make_user, parent_id=top, deleted=True)
+    recipe.is_deleted, recipe.deleted_at = True, LONG_AGO
+    db.session.commit()
+    recipe_id, tag_id = recipe.id, tag.id
+
+    stats = archive_deleted('recipes', OLDER_THAN)
+    assert stats['archived'] >= 1
+    db.session.expire_all()
+    assert db.session.get(Recipe, recipe_id) is None
+    assert count(recipes_archive, id=recipe_id) == 1
+    assert count(comments_archive, recipe_id=recipe_id) == 2
+    assert count(ratings_archive, recipe_id=recipe_id) == 1
+    assert count(recipe_tags_archive, recipe_id=recipe_id) == 1
+    assert db.session.get(Tag, tag_id).usage_count == 0
+
+    # Its comments can't come back without it
+    assert restore('comments', [top]) == []
+
+    assert restore('recipes', [recipe_id]) == [recipe_id]
+    db.session.expire_all()
+    restored = db.session.get(Recipe, recipe_id)
+    assert (restored.is_deleted, restored.deleted_at) == (False, None)
+    assert [t.id for t in restored.tags] == [tag_id]
+    assert Rating.query.filter_by(recipe_id=recipe_id).count() == 1
+    assert db.session.get(Comment, reply).is_deleted
+    assert not db.session.get(Comment, top).is_deleted
+    assert db.session.get(Tag, tag_id).usage_count == 1
+    assert count(recipes_archive, id=recipe_id) == 0
+    for table in (comments_archive, ratings_archive, recipe_tags_archive):
+        assert count(table, recipe_id=recipe_id) == 0
+
+
+def archived_at(comment_id):
+    return db.session.execute(
+        select(comments_archive.c.archived_at).where(comments_archive.c.id == comment_id)
+    ).scalar()
+
+
+def test_comment_threads_are_archived_from_the_leaves_up(make_recipe, make_user):
+    recipe = make_recipe()
+    top = comment(recipe, make_user, deleted=True)
+    reply = comment(recipe, make_user, parent_id=top, deleted=True)
+    answered = comment(recipe, make_user, deleted=True)
+    comment(recipe, make_user, parent_id=answered)
+
+    stats = archive_deleted('comments', OLDER_THAN)
+
+    assert stats['batches'] >= 2
+    assert archived_at(reply) < archived_at(top)
+    # Still has a live reply
+    assert archived_at(answered) is None
+    db.session.expire_all()
+    assert db.session.get(Comment, answered).is_deleted
+
+
+def test_a_reply_is_only_restored_with_its_parent(make_recipe, make_user):
+    recipe = make_recipe()
+    top = comment(recipe, make_user, deleted=True)
+    reply = comment(recipe, make_user, parent_id=top, deleted=True)
+    other = comment(recipe, make_user, deleted=True)
+    archive_deleted('comments', OLDER_THAN)
+
+    assert restore('comments', [reply]) == []
+    assert sorted(restore('comments', [reply, top])) == sorted([reply, top])
+    assert restore('comments', [other]) == [other]
+
+    db.session.expire_all()
+    restored = db.session.get(Comment, reply)
+    assert (restored.is_deleted, restored.deleted_at, restored.parent_id) == (False, None, top)
+    assert count(comments_archive, recipe_id=recipe.id) == 0
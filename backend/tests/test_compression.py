@@ -0,0 +1,114 @@
+import gzip
+import zlib
+
+import pytest
+from flask import Response
+from werkzeug.http import parse_accept_header
+
+from utils import compression
+from utils.compression import compress_response, negotiate
+
+BODY = 'Toast the cumin, then add the onions. ' * 100
+
+
+@pytest.fixture
+def every_encoding(monkeypatch):
+    """Negotiate as if brotli and zstandard were installed"""
+    monkeypatch.setitem(compression.COMPRESSORS, 'br', compression._Gzip)
+    monkeypatch.setitem(compression.COMPRESSORS, 'zstd', compression._Gzip)
+
+
+@pytest.mark.parametrize('accept, expected', [
+    ('gzip, br, zstd', 'zstd'),
+    ('gzip;q=1, br;q=0.8', 'gzip'),
+    ('zstd;q=0, *', 'br'),
+    ('*;q=0, gzip', 'gzip'),
+    ('gzip;q=0', None),
+    ('identity', None),
+])
+def test_negotiation(every_encoding, accept, expected):
+    assert negotiate(parse_accept_header(accept), ('zstd', 'br', 'gzip')) == expected
+
+
+def test_negotiation_skips_encodings_that_are_not_installed(monkeypatch):
+    monkeypatch.delitem(compression.COMPRESSORS, 'br', raising=False)
+    assert negotiate(parse_accept_header('br, gzip;q=0.5'), ('br', 'gzip')) == 'gzip'
+
+
+def compress(app, response, accept='gzip', method='GET'):
+    with app.test_request_context(method=method, headers={'Accept-Encoding': accept}):
+        return compress_response(response)
+
+
+def test_bodies_under_the_threshold_are_sent_as_is(app):
+    small = compress(app, Response('x' * (app.config['COMPRESSION_MIN_SIZE'] - 1), mimetype='text/plain'))
+    assert 'Content-Encoding' not in small.headers
+    assert 'Accept-Encoding' in small.vary
+
+    large = compress(app, Response(BODY, mimetype='application/json'))
+    assert large.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(large.get_data()).decode() == BODY
+    assert 'Accept-Encoding' in large.vary
+
+
+def test_file_and_no_transform_responses_are_left_alone(app):
+    passthrough = Response([BODY.encode()], mimetype='text/plain', direct_passthrough=True)
+    assert 'Content-Encoding' not in compress(app, passthrough).headers
+
+    no_transform = Response(BODY, mimetype='text/plain', headers={'Cache-Control': 'no-transform'})
+    assert 'Content-Encoding' not in compress(app, no_transform).headers
+
+    assert 'Content-Encoding' not in compress(app, Response(BODY, mimetype='image/png')).headers
+    assert 'Content-Encoding' not in compress(app, Response(BODY, mimetype='text/plain'), method='HEAD').headers
+
+
+def test_the_etag_names_the_encoding(app):
+    response = Response(BODY, mimetype='text/plain')
+    response.set_etag('recipe-42', weak=True)
+
+    assert compress(app, response).get_etag() == ('recipe-42-gzip', True)
+
+
+def read_as_produced(response, produced):
+    """(chunks produced so far, text decompressed so far) each time more text can be read"""
+    decompressor = zlib.decompressobj(31)
+    seen = []
+    text = ''
+    for output in response.response:
+        more = decompressor.decompress(output).decode()
+        if more:
+            text += more
+            seen.append((len(produced), text))
+    return seen
+
+
+def test_server_sent_events_are_flushed_per_event(app):
+    events = [f"data: step {n}\n\n" for n in range(3)]
+    produced = []
+
+    def stream():
+        for event in events:
+            produced.append(event)
+            yield event
+
+    response = compress(app, Response(stream(), mimetype='text/event-stream'))
+
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    assert read_as_produced(response, produced) == [(n + 1, ''.join(events[:n + 1])) for n in range(3)]
+
+
+def test_ndjson_is_flushed_once_enough_has_built_up(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'COMPRESSION_STREAM_FLUSH_BYTES', 20)
+    lines = [f'{{"row": {n}}}\n' for n in range(6)]
+    produced = []
+
+    def stream():
+        for line in lines:
+            produced.append(line)
+            yield line
+
+    response = compress(app, Response(stream(), mimetype='application/x-ndjson'))
+
+    # Each line is 11 bytes, so text arrives every second line
+    assert read_as_produced(response, produced) == [(n, ''.join(lines[:n])) for n in (2, 4, 6)]
@@ -0,0 +1,72 @@
+import pytest
+from flask import g
+from sqlalchemy import event, select, text
+
+from models import db
+from models.tag import Tag
+from utils import db_routing
+
+
+@pytest.fixture
+def replica_reads(app, replicas):
+    """Statements on the tags table the replica has run"""
+    statements = []
+    engine = db.engines['replica_0']
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM tags' in statement:
+            statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+def test_safe_requests_read_from_a_healthy_replica(client, replicas, replica_reads):
+    assert client.get('/api/tags').status_code == 200
+
+    assert replica_reads
+    assert replicas.stats()['replica_0'] == {'healthy': True, 'lag': 0.0, 'error': None}
+
+
+def test_a_write_pins_the_client_to_the_primary(client, replica_reads, make_user, auth_headers):
+    headers = auth_headers(make_user())
+
+    response = client.put('/api/users/profile', json={'bio': 'Cooks on weekends'}, headers=headers)
+    assert response.status_code == 200
+    assert db_routing.PRIMARY_COOKIE in response.headers['Set-Cookie']
+
+    client.get('/api/tags', headers=headers)
+    assert replica_reads == []
+
+    client.delete_cookie(db_routing.PRIMARY_COOKIE)
+    client.get('/api/tags', headers=headers)
+    assert replica_reads
+
+
+def test_reads_fall_back_to_the_primary(client, replicas, replica_reads, monkeypatch):
+    replicas.mark_down('replica_0', 'connection refused')
+    client.get('/api/tags')
+    assert replica_reads == []
+
+    monkeypatch.setattr(db_routing, 'LAG_QUERY', text('SELECT 30'))
+    replicas.state['replica_0']['checked_at'] = 0.0
+    client.get('/api/tags')
+    assert replica_reads == []
+    assert replicas.stats()['replica_0'] == {'healthy': False, 'lag': 30.0, 'error': 'lagging 30.0s'}
+
+
+@pytest.mark.parametrize('clause', [
+    text('UPDATE tags SET usage_count = usage_count + 1'),
+    text('select id from tags for update'),
+    select(Tag.id).with_for_update(),
+])
+def test_writes_and_row_locks_go_to_the_primary(app, replicas, clause):
+    with app.test_request_context('/api/tags'):
+        g.db_replica = 'replica_0'
+        assert db.session.get_bind(clause=select(Tag.id)) is db.engines['replica_0']
+
+        assert db.session.get_bind(clause=clause) is db.engine
+        # The rest of the request stays there
+        assert g.db_replica is None
+        assert db.session.get_bind(clause=select(Tag.id)) is db.engine
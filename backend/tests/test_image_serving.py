@@ -0,0 +1,72 @@
+import hashlib
+
+import pytest
+
+DIGEST = hashlib.sha256(b'recipe photo').hexdigest()
+PNG = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+WEBP = b'RIFF\x00\x00\x00\x00WEBPVP8 ' + bytes(64)
+
+
+@pytest.fixture
+def images(app, tmp_path, monkeypatch):
+    """Files under a stand-in static/profile_pics; returns the URL prefix"""
+    monkeypatch.setattr(app, 'root_path', str(tmp_path))
+    folder = tmp_path / 'static' / 'profile_pics'
+    folder.mkdir(parents=True)
+    (folder / f"{DIGEST}_800.png").write_bytes(PNG)
+    (folder / f"{DIGEST}_800.webp").write_bytes(WEBP)
+    (folder / 'avatar.png').write_bytes(PNG)
+    return '/img/profile_pics'
+
+
+def test_content_addressed_images_are_cached_forever(client, images):
+    response = client.get(f"{images}/{DIGEST}_800.png")
+
+    assert response.status_code == 200
+    assert response.get_data() == PNG
+    assert response.cache_control.immutable
+    assert response.cache_control.public
+    assert response.cache_control.max_age == 365 * 24 * 3600
+    assert response.get_etag() == (f"{DIGEST}_800.png", False)
+    assert 'Accept' in response.vary
+
+    other = client.get(f"{images}/avatar.png")
+    assert not other.cache_control.immutable
+    assert other.cache_control.max_age == 3600
+
+
+def test_conditional_requests_answer_304(client, images):
+    first = client.get(f"{images}/{DIGEST}_800.png")
+
+    revalidated = client.get(f"{images}/{DIGEST}_800.png", headers={'If-None-Match': first.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.get_data() == b''
+
+    mutable = client.get(f"{images}/avatar.png")
+    unchanged = client.get(f"{images}/avatar.png", headers={'If-Modified-Since': mutable.headers['Last-Modified']})
+    assert unchanged.status_code == 304
+
+
+def test_range_requests_get_part_of_the_file(client, images):
+    response = client.get(f"{images}/{DIGEST}_800.png", headers={'Range': 'bytes=8-15'})
+
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f"bytes 8-15/{len(PNG)}"
+    assert response.get_data() == PNG[8:16]
+
+    past_the_end = client.get(f"{images}/{DIGEST}_800.png", headers={'Range': f"bytes={len(PNG)}-"})
+    assert past_the_end.status_code == 416
+
+
+def test_webp_is_served_to_clients_that_ask_for_it(client, images):
+    webp = client.get(f"{images}/{DIGEST}_800.png", headers={'Accept': 'image/webp,*/*'})
+    assert webp.mimetype == 'image/webp'
+    assert webp.get_data() == WEBP
+    assert webp.get_etag() == (f"{DIGEST}_800.webp", False)
+
+    for accept in ('*/*', 'image/webp;q=0, */*'):
+        png = client.get(f"{images}/{DIGEST}_800.png", headers={'Accept': accept})
+        assert png.mimetype == 'image/png'
+
+    # No WebP sibling to prefer
+    assert client.get(f"{images}/avatar.png", headers={'Accept': 'image/webp'}).mimetype == 'image/png'
@@ -0,0 +1,15 @@
+from import_time import parse_importtime
+
+STDERR = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 | encodings
+import time:       200 |        200 |     markupsafe._speedups
+import time:       300 |        500 |   markupsafe
+import time:       400 |        900 |   flask
+import time:        50 |         50 |   models
+import time:       100 |       1550 | app
+"""
+
+
+def test_breakdown_lists_what_the_module_imports():
+    assert parse_importtime(STDERR, 'app') == [('markupsafe', 0.0005), ('flask', 0.0009), ('models', 0.00005)]
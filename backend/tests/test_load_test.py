@@ -0,0 +1,28 @@
+from load_test import compare, summarize
+
+
+def run(fast_errors=0, slow_ok=10):
+    return [('recipe_detail', 0.100, 200, 3)] * slow_ok + [('recipe_detail', 0.001, 500, 1)] * fast_errors
+
+
+def test_failed_requests_stay_out_of_latency_and_throughput():
+    summary = summarize(run(fast_errors=30), elapsed=1.0)['all']
+
+    assert (summary['requests'], summary['errors']) == (40, 30)
+    assert summary['error_statuses'] == ['500']
+    assert summary['p50_ms'] == summary['p95_ms'] == 100.0
+    assert summary['throughput_rps'] == 10.0
+    assert summary['queries_per_request'] == 3.0
+
+
+def test_more_errors_fail_the_comparison():
+    baseline = summarize(run(), elapsed=1.0)
+    assert compare(summarize(run(), elapsed=1.0), baseline, tolerance=0.1) == []
+
+    regressions = compare(summarize(run(fast_errors=5), elapsed=1.0), baseline, tolerance=0.1)
+    assert 'all: errors 0/10 -> 5/15' in regressions
+
+    # Only failures: nothing to measure latency on, still a regression
+    broken = summarize(run(fast_errors=5, slow_ok=0), elapsed=1.0)
+    assert broken['all']['p95_ms'] is None
+    assert 'all: errors 0/10 -> 5/5' in compare(broken, baseline, tolerance=0.1)
@@ -0,0 +1,22 @@
+import pytest
+
+from utils.metrics import Counter, _Metric
+
+
+def test_metric_kinds_must_implement_their_hooks():
+    class Incomplete(_Metric):
+        kind = 'incomplete'
+
+    with pytest.raises(TypeError):
+        Incomplete('test_incomplete_metric', 'Never registered')
+
+
+def test_labelled_counter_values():
+    counter = Counter('test_lookups_total', 'Lookups by result', ['result'])
+    counter.labels('hit').inc()
+    counter.labels(result='hit').inc(2)
+    counter.labels('miss').inc()
+
+    assert sorted((sample['labels']['result'], sample['value']) for sample in counter.samples()) == [
+        ('hit', 3.0), ('miss', 1.0)
+    ]
@@ -0,0 +1,123 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import db
+from models.payment import Payment
+from models.payment_event import PaymentEvent
+from models.user import User
+from services import task_queue
+from services.razorpay_fake import FakeRazorpayWebhooks, build_event, sign_webhook
+from services.task_queue import TaskQueue
+
+SECRET = 'whsec_test'
+
+
+@pytest.fixture
+def webhooks(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'RAZORPAY_WEBHOOK_SECRET', SECRET)
+    return FakeRazorpayWebhooks(SECRET, client=client)
+
+
+def wait_for_status(payment_id, status, timeout=5):
+    """Events are processed off the request; poll until the payment settles"""
+    deadline = time.monotonic() + timeout
+    while True:
+        db.session.expire_all()
+        payment = db.session.get(Payment, payment_id)
+        if payment.status == status or time.monotonic() > deadline:
+            return payment
+        time.sleep(0.05)
+
+
+def test_signed_capture_is_accepted_and_applied(webhooks, make_payment):
+    payment = make_payment()
+
+    response = webhooks.payment_captured(payment.payment_id, event_id='evt_capture_1', method='card')
+
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'accepted'}
+    assert PaymentEvent.query.filter_by(event_id='evt_capture_1').count() == 1
+    payment = wait_for_status(payment.id, 'completed')
+    assert payment.status == 'completed'
+    assert payment.payment_method == 'card'
+    assert db.session.get(User, payment.user_id).is_premium
+
+
+def test_retried_event_is_a_duplicate(webhooks, make_payment):
+    payment = make_payment()
+
+    first = webhooks.payment_captured(payment.payment_id, event_id='evt_retry_1')
+    retry = webhooks.payment_captured(payment.payment_id, event_id='evt_retry_1')
+
+    assert first.get_json() == {'status': 'accepted'}
+    assert retry.status_code == 200
+    assert retry.get_json() == {'status': 'duplicate'}
+
+
+def test_failure_marks_pending_payment_failed(webhooks, make_payment):
+    payment = make_payment()
+
+    response = webhooks.payment_failed(payment.payment_id, error_description='Card declined')
+
+    assert response.status_code == 200
+    payment = wait_for_status(payment.id, 'failed')
+    assert payment.status == 'failed'
+    assert payment.failure_reason == 'Card declined'
+
+
+def test_bad_signature_is_rejected(webhooks, make_payment):
+    payment = make_payment()
+
+    response = webhooks.deliver(build_event('payment.captured', payment.payment_id), signature='0' * 64)
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Invalid webhook signature'
+
+
+def test_signed_body_that_is_not_json_is_malformed(webhooks, client):
+    body = b'not json'
+    response = client.post('/api/payments/webhook', data=body, headers={
+        'X-Razorpay-Event-Id': 'evt_garbage',
+        'X-Razorpay-Signature': sign_webhook(body, SECRET)
+    })
+
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Malformed webhook'
+
+
+def test_sweep_retries_events_stuck_in_received(app, make_payment):
+    payment = make_payment()
+    stale = datetime.utcnow() - timedelta(minutes=10)
+    # Stored by a process that died before running it
+    db.session.add_all([
+        PaymentEvent(event_id='evt_stuck_1', event_type='payment.captured', order_id=payment.payment_id,
+                     payload=build_event('payment.captured', payment.payment_id), status='received',
+                     received_at=stale),
+        PaymentEvent(event_id='evt_fresh_1', event_type='payment.captured', order_id='order_unknown',
+                     payload=build_event('payment.captured', 'order_unknown'), status='received',
+                     received_at=datetime.utcnow())
+    ])
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['requeue-payment-events'])
+
+    assert result.exit_code == 0, result.output
+    assert 'Requeued 1 payment events' in result.output
+    assert wait_for_status(payment.id, 'completed').status == 'completed'
+    assert PaymentEvent.query.filter_by(event_id='evt_fresh_1').one().status == 'received'
+
+
+def test_failed_task_does_not_sleep_after_its_last_attempt(app, monkeypatch):
+    queue = TaskQueue('test_retries', max_attempts=2)
+    sleeps = []
+    monkeypatch.setattr(task_queue.time, 'sleep', sleeps.append)
+
+    @queue.task
+    def always_fails():
+        raise RuntimeError('boom')
+
+    assert queue.execute(json.dumps({'task': 'always_fails', 'payload': {}})) is False
+    assert sleeps == [0.2]
@@ -0,0 +1,77 @@
+import io
+import os
+import time
+
+import pytest
+from PIL import Image
+
+from models import db
+from models.user import User
+from services import image_pipeline
+
+
+@pytest.fixture
+def image_dirs(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'IMAGE_STAGING_FOLDER', str(tmp_path / 'staging'))
+    out_dir = tmp_path / 'profile_pics'
+    out_dir.mkdir()
+    monkeypatch.setattr(image_pipeline, 'folder_path', lambda folder: str(out_dir))
+    return out_dir
+
+
+def png_bytes(color='orange'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (40, 30), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def upload(client, headers, data, filename):
+    return client.post(
+        '/api/users/profile/image',
+        data={'image': (io.BytesIO(data), filename)},
+        headers=headers,
+        content_type='multipart/form-data'
+    )
+
+
+def wait_for_url(user_id, url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        db.session.expire_all()
+        current = db.session.get(User, user_id).profile_image_url
+        if current == url or time.monotonic() > deadline:
+            return current
+        time.sleep(0.05)
+
+
+def test_profile_image_is_sniffed_and_processed(client, make_user, auth_headers, image_dirs):
+    user = make_user()
+    headers = auth_headers(user)
+
+    response = upload(client, headers, b'<?php echo "not an image"; ?>', 'avatar.png')
+    assert response.status_code == 400
+    assert db.session.get(User, user.id).profile_image_url is None
+
+    # Named .gif, stored under the type its bytes say
+    response = upload(client, headers, png_bytes(), 'avatar.gif')
+    assert response.status_code == 202
+    image_url = response.get_json()['image_url']
+    assert image_url.endswith('_800.png')
+    assert wait_for_url(user.id, image_url) == image_url
+
+    name = os.path.basename(image_url)
+    deadline = time.monotonic() + 10
+    while not (image_dirs / name).exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert (image_dirs / name).exists()
+    assert (image_dirs / name.replace('.png', '.webp')).exists()
+
+
+def test_failed_processing_restores_the_previous_image(client, make_user, auth_headers, image_dirs):
+    user = make_user(profile_image_url='/img/profile_pics/previous_800.png')
+
+    # Right signature, unreadable body
+    response = upload(client, auth_headers(user), png_bytes()[:40], 'avatar.png')
+
+    assert response.status_code == 202
+    assert wait_for_url(user.id, '/img/profile_pics/previous_800.png') == '/img/profile_pics/previous_800.png'
@@ -0,0 +1,21 @@
+from services.prompt_cache import cache_digest, normalize_prompt
+
+
+def test_case_punctuation_and_spacing_are_folded():
+    assert normalize_prompt('  Paneer Tikka,   spicy!! ') == 'paneer tikka spicy'
+    assert cache_digest('Paneer tikka', 'gemini-pro') == cache_digest('paneer  TIKKA!', 'gemini-pro')
+
+
+def test_filler_words_are_dropped():
+    assert normalize_prompt('Please give me a paneer tikka recipe') == 'paneer tikka'
+    assert cache_digest('Make me the dal makhani recipe, please', 'gemini-pro') == \
+        cache_digest('dal makhani', 'gemini-pro')
+    # A prompt of nothing but filler keeps its words
+    assert normalize_prompt('A recipe, please') == 'a recipe please'
+
+
+def test_connectives_are_kept():
+    assert normalize_prompt('a curry with rice and without onion') == 'curry with rice and without onion'
+    assert cache_digest('rice and dal', 'gemini-pro') != cache_digest('rice or dal', 'gemini-pro')
+    assert cache_digest('pasta with cheese', 'gemini-pro') != cache_digest('pasta cheese', 'gemini-pro')
+    assert cache_digest('pasta without cheese', 'gemini-pro') != cache_digest('pasta with cheese', 'gemini-pro')
@@ -0,0 +1,49 @@
+import uuid
+
+from models import db
+from models.comment import Comment
+from models.ratings import Rating
+from models.tag import Tag
+
+# Enough rows that a query per row would pass n_plus_one_threshold
+ROWS = 8
+
+
+def test_recipe_list_stays_within_its_budget(client, query_budget, make_recipe, make_user):
+    author = make_user()
+    for index in range(ROWS):
+        recipe = make_recipe(author=author, title=f"Budget recipe {index}")
+        recipe.tags.append(Tag(name=f"budget-{uuid.uuid4().hex[:8]}"))
+        db.session.add(Rating(recipe_id=recipe.id, user_id=make_user().id, score=4))
+        db.session.commit()
+
+    # Count, page, authors, tags, ratings and comment counts; not one of them per recipe
+    with query_budget(7):
+        response = client.get(f"/api/recipes?author_id={author.id}")
+
+    assert response.status_code == 200
+    recipes = response.get_json()['recipes']
+    assert len(recipes) == ROWS
+    assert all(recipe['tags'] for recipe in recipes)
+
+
+def test_comment_threads_stay_within_their_budget(client, query_budget, make_recipe, make_user):
+    recipe = make_recipe()
+    for index in range(ROWS):
+        comment = Comment(recipe_id=recipe.id, user_id=make_user().id, content=f"Top level {index}")
+        db.session.add(comment)
+        db.session.commit()
+        db.session.add_all([
+            Comment(recipe_id=recipe.id, user_id=make_user().id, content='A reply', parent_id=comment.id)
+            for _ in range(2)
+        ])
+        db.session.commit()
+
+    # Recipe, count, page, then replies and authors for the whole page
+    with query_budget(6):
+        response = client.get(f"/api/comments/recipe/{recipe.id}")
+
+    assert response.status_code == 200
+    comments = response.get_json()['comments']
+    assert len(comments) == ROWS
+    assert all(len(comment['replies']) == 2 for comment in comments)
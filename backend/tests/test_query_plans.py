@@ -0,0 +1,174 @@
+"""
+Query plans of the main read routes against the seeded benchmark dataset.
+
+Each route is requested through the test client and every statement it
+runs is EXPLAINed. A sequential scan fails the check unless the route is
+explicitly allowed to scan that table, with the reason next to the
+allowance. Recipe text search (ILIKE '%term%') can't use a b-tree index
+and is not checked.
+
+Reads go to the replica when it is the test database itself; a separate
+replica database has no seeded data, so then they stay on the primary.
+"""
+import json
+import random
+import urllib.parse
+
+import pytest
+from sqlalchemy import event, select, text
+
+from dataset import seed
+from models import db
+from models.tag import Tag
+from utils import db_routing
+from utils.sql_profiler import statement_shape
+
+EXPLAINED = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+# Tables that stay small however much content there is; reading them whole is cheapest
+TAGS = {'tags': 'the tag vocabulary is a few dozen rows'}
+LIVE_COUNT = {'recipes': 'the page total counts every live recipe'}
+
+# name -> (path, needs a token, {table: why a sequential scan is fine})
+CHECKS = {
+    'recipes': ('/api/recipes', False, {**TAGS, **LIVE_COUNT}),
+    'recipes_page': ('/api/recipes?page=5', False, {**TAGS, **LIVE_COUNT}),
+    'recipes_by_author': ('/api/recipes?author_id={author_id}', False, TAGS),
+    'recipes_featured': ('/api/recipes?featured=1', False, TAGS),
+    'recipes_by_tag': ('/api/recipes?tag={tag}', False, TAGS),
+    'recipe_detail': ('/api/recipes/{recipe_id}', False, TAGS),
+    'recipe_comments': ('/api/comments/recipe/{recipe_id}', False, {}),
+    'recipe_ratings': ('/api/ratings/recipe/{recipe_id}', False, {}),
+    'tag_recipes': ('/api/tags/{tag_id}/recipes', False, {
+        **TAGS,
+        'recipes': 'a tag covers several percent of recipes; its count hash-joins them against the live rows'
+    }),
+    'popular_tags': ('/api/tags/popular', False, TAGS),
+    'user': ('/api/users/{author_id}', False, {}),
+    'user_recipes': ('/api/users/{author_id}/recipes', False, TAGS),
+    'my_profile': ('/api/users/profile', True, {}),
+    'my_recipes': ('/api/recipes/my-recipes', True, TAGS),
+    'my_payments': ('/api/payments/my-payments', True, {}),
+    'my_payments_completed': ('/api/payments/my-payments?status=completed', True, {}),
+    'my_ai_requests': ('/api/ai/my-requests', True, {}),
+}
+
+
+class StatementRecorder:
+    """Statements, their parameters and the engine that ran them, as sent while recording"""
+
+    def __init__(self, engines):
+        self.engines = list(engines)
+        self.statements = None
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.statements is not None and not executemany:
+            self.statements.append((conn.engine, statement, parameters))
+
+    def close(self):
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._record)
+
+    def __enter__(self):
+        self.statements = []
+        return self.statements
+
+    def __exit__(self, *exc_info):
+        self.statements = None
+        return False
+
+
+def seq_scans(plan):
+    """Every Seq Scan node in an EXPLAIN (FORMAT JSON) plan tree"""
+    nodes = [plan]
+    while nodes:
+        node = nodes.pop()
+        if node['Node Type'] == 'Seq Scan':
+            yield node
+        nodes.extend(node.get('Plans', ()))
+
+
+def explain(connection, statement, parameters):
+    row = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters or {}).scalar()
+    return (json.loads(row) if isinstance(row, str) else row)[0]['Plan']
+
+
+@pytest.fixture(scope='module')
+def seeded(app):
+    """The benchmark dataset with fresh planner statistics; the tables are emptied afterwards"""
+    with app.app_context():
+        manifest = seed(users=2000, recipes=4000)
+        with db.engine.connect() as connection:
+            connection.execute(text('ANALYZE'))
+            connection.commit()
+        manifest['tag_ids'] = dict(db.session.execute(
+            select(Tag.name, Tag.id).where(Tag.name.in_(manifest['tags']))
+        ).all())
+        db.session.commit()
+    yield manifest
+    with app.app_context():
+        db.drop_all(bind_key=None)
+        db.create_all(bind_key=None)
+
+
+@pytest.fixture(scope='module')
+def recorder(app):
+    """Watches the primary and the replicas, so reads routed to either are EXPLAINed where they ran"""
+    with app.app_context():
+        recorder = StatementRecorder(db.engines.values())
+    yield recorder
+    recorder.close()
+
+
+@pytest.fixture
+def routed(app, replicas):
+    """Send reads to the replica when it holds the seeded data"""
+    if db.engines['replica_0'].url != db.engine.url:
+        replicas.mark_down('replica_0', 'not seeded')
+    return replicas
+
+
+@pytest.fixture
+def token_headers(client, seeded):
+    response = client.post('/api/auth/login', json={
+        'email': seeded['emails'][0], 'password': seeded['password']
+    })
+    assert response.status_code == 200
+    # Logging in is a write; don't let it pin the reads below to the primary
+    client.delete_cookie(db_routing.PRIMARY_COOKIE)
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+@pytest.mark.parametrize('name', CHECKS)
+def test_route_uses_indexes(name, client, seeded, recorder, routed, token_headers):
+    template, needs_token, allowed = CHECKS[name]
+    rng = random.Random(name)
+    tag = rng.choice(seeded['tags'])
+    path = template.format(
+        recipe_id=rng.choice(seeded['recipe_ids']),
+        author_id=rng.choice(seeded['author_ids']),
+        tag=urllib.parse.quote(tag),
+        tag_id=seeded['tag_ids'][tag]
+    )
+
+    with recorder as statements:
+        response = client.get(path, headers=token_headers if needs_token else {})
+    assert response.status_code == 200, f"GET {path}"
+
+    problems = []
+    for engine, statement, parameters in statements:
+        if not statement.lstrip().upper().startswith(EXPLAINED):
+            continue
+        with engine.connect() as connection:
+            plan = explain(connection, statement, parameters)
+        for node in seq_scans(plan):
+            if node['Relation Name'] in allowed:
+                continue
+            problems.append(
+                f"Seq Scan on {node['Relation Name']} (~{node['Plan Rows']} rows"
+                + (f", Filter: {node['Filter']})" if node.get('Filter') else ')')
+                + f"\n    {statement_shape(statement)[:200]}"
+            )
+    assert not problems, f"GET {path}\n" + '\n'.join(problems)
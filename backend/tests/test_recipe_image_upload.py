@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from services.storage import LocalStorage, StorageBackend, UploadGone
+
+
+@pytest.fixture
+def storage(app, tmp_path, monkeypatch):
+    storage = LocalStorage(str(tmp_path / 'images'), '/img/recipe_images', str(tmp_path / 'uploads'))
+    monkeypatch.setitem(app.extensions, 'storage', storage)
+    return storage
+
+
+def test_storage_backends_must_implement_the_interface():
+    class Partial(StorageBackend):
+        def url(self, name):
+            return name
+
+    with pytest.raises(TypeError):
+        Partial()
+
+
+def test_upload_whose_data_is_gone_answers_410(client, storage, make_recipe, auth_headers):
+    recipe = make_recipe()
+    headers = auth_headers(recipe.author)
+    base = f"/api/recipes/{recipe.id}/image/uploads"
+
+    created = client.post(base, json={'size': 1024}, headers=headers)
+    assert created.status_code == 201
+    upload_id = created.get_json()['upload_id']
+    assert client.get(f"{base}/{upload_id}", headers=headers).get_json()['offset'] == 0
+
+    os.unlink(os.path.join(storage.uploads, f"{upload_id}.part"))
+    with pytest.raises(UploadGone):
+        storage.upload_offset(upload_id)
+
+    response = client.patch(f"{base}/{upload_id}", data=b'\x89PNG', headers=dict(headers, **{'Upload-Offset': '0'}))
+    assert response.status_code == 410
+    assert not os.path.exists(os.path.join(storage.uploads, f"{upload_id}.part"))
+
+    # The leftover metadata went with it
+    assert client.get(f"{base}/{upload_id}", headers=headers).status_code == 404
+
+
+def test_largest_allowed_image_fits_in_one_request(app, client, storage, make_recipe, auth_headers):
+    recipe = make_recipe()
+    headers = auth_headers(recipe.author)
+    base = f"/api/recipes/{recipe.id}/image/uploads"
+    max_bytes = app.config['RECIPE_IMAGE_MAX_BYTES']
+
+    assert client.post(base, json={'size': max_bytes + 1}, headers=headers).status_code == 400
+    created = client.post(base, json={'size': max_bytes}, headers=headers)
+    upload_id = created.get_json()['upload_id']
+
+    body = b'\x89PNG\r\n\x1a\n'.ljust(max_bytes, b'\0')
+    response = client.patch(f"{base}/{upload_id}", data=body, headers=dict(headers, **{'Upload-Offset': '0'}))
+    assert response.status_code == 200
+    assert response.get_json()['offset'] == max_bytes
@@ -0,0 +1,101 @@
+import json
+import uuid
+
+import pytest
+
+from models import db
+from models.recipe import Recipe
+from models.tag import Tag
+from services.recipe_import import import_recipes, normalize
+
+
+def record(title, **fields):
+    return {
+        'title': title,
+        'description': 'Weeknight dinner',
+        'ingredients': ['rice', 'lentils'],
+        'instructions': 'Simmer until soft',
+        **fields
+    }
+
+
+def write_jsonl(path, records):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(''.join(json.dumps(item) + '\n' for item in records))
+    return path
+
+
+def test_normalize_applies_the_model_rules():
+    author_id = uuid.uuid4()
+    row, tags = normalize(
+        record('Khichdi', tags='Comfort| comfort |Rice', difficulty_level='EASY', servings='4'),
+        'feed', 7, author_id
+    )
+
+    assert row['ingredients'] == 'rice\nlentils'
+    assert row['difficulty_level'] == 'easy'
+    assert row['servings'] == 4
+    assert row['author_id'] == author_id
+    assert row['id'] == normalize(record('Other'), 'feed', 7, author_id)[0]['id']
+    assert row['id'] != normalize(record('Khichdi'), 'other-feed', 7, author_id)[0]['id']
+    assert tags == ['comfort', 'rice']
+
+    with pytest.raises(ValueError, match='title is required'):
+        normalize(record(''), 'feed', 0, author_id)
+    with pytest.raises(ValueError, match='servings must be positive'):
+        normalize(record('Khichdi', servings=0), 'feed', 0, author_id)
+    with pytest.raises(ValueError, match='Difficulty'):
+        normalize(record('Khichdi', difficulty_level='extreme'), 'feed', 0, author_id)
+
+
+def test_import_rejects_invalid_records_and_resumes_from_the_checkpoint(make_user, tmp_path):
+    author = make_user()
+    tag = f"import-{uuid.uuid4().hex[:8]}"
+    batch = uuid.uuid4().hex[:8]
+    titles = [f"Imported {batch} {n}" for n in range(5)]
+    source = write_jsonl(tmp_path / 'feed.jsonl', [
+        record(titles[0], tags=[tag]),
+        record(titles[1], servings=-2),
+        record(titles[2], tags=[tag]),
+        record(titles[3], author_email='nobody@example.com'),
+        record(titles[4]),
+    ])
+    checkpoint = tmp_path / 'feed.checkpoint'
+    rejects = tmp_path / 'rejects.jsonl'
+
+    def interrupt(stats):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        import_recipes(str(source), batch_size=2, default_author=author.email, checkpoint_path=str(checkpoint),
+                       rejects_path=str(rejects), progress=interrupt)
+    assert json.loads(checkpoint.read_text())['records'] == 2
+
+    stats = import_recipes(str(source), batch_size=2, default_author=author.email,
+                           checkpoint_path=str(checkpoint), rejects_path=str(rejects))
+
+    assert stats['resumed_at'] == 2
+    assert (stats['imported'], stats['rejected']) == (2, 1)
+    assert not checkpoint.exists()
+    assert [json.loads(line)['record'] for line in rejects.read_text().splitlines()] == [1, 3]
+    imported = Recipe.query.filter(Recipe.title.in_(titles)).all()
+    assert sorted(recipe.title for recipe in imported) == [titles[0], titles[2], titles[4]]
+    imported_tag = Tag.query.filter_by(name=tag).one()
+    assert imported_tag.color == '#3B82F6'
+    assert imported_tag.usage_count == 2
+
+
+def test_files_sharing_a_name_get_their_own_ids(make_user, tmp_path):
+    author = make_user()
+    first = write_jsonl(tmp_path / 'a' / 'catalog.jsonl', [record(f"Catalog {uuid.uuid4().hex[:8]}")])
+    second = write_jsonl(tmp_path / 'b' / 'catalog.jsonl', [record(f"Catalog {uuid.uuid4().hex[:8]}")])
+
+    assert import_recipes(str(first), default_author=author.email)['imported'] == 1
+    assert import_recipes(str(second), default_author=author.email)['imported'] == 1
+    repeat = import_recipes(str(first), default_author=author.email)
+    assert (repeat['imported'], repeat['skipped']) == (0, 1)
+
+    named = import_recipes(str(second), default_author=author.email, source='partner-catalog')
+    assert named['imported'] == 1
+    db.session.expire_all()
+    assert Recipe.query.filter_by(author_id=author.id).count() == 3
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from models import db
+from models.recipe import Recipe
+from utils.db_routing import replica_binds
+
+
+def test_concurrent_views_are_all_counted(app, make_recipe):
+    recipe_id = make_recipe().id
+
+    def view(_):
+        return app.test_client().get(f"/api/recipes/{recipe_id}").status_code
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        statuses = list(executor.map(view, range(20)))
+
+    assert statuses == [200] * 20
+    db.session.expire_all()
+    assert db.session.get(Recipe, recipe_id).view_count == 20
+
+
+def test_replica_binds_carry_pool_options_and_a_connect_timeout():
+    binds = replica_binds(['postgresql://replica-a/db'], {'pool_size': 3, 'pool_pre_ping': True}, connect_timeout=2)
+
+    assert binds == {'replica_0': {
+        'url': 'postgresql://replica-a/db',
+        'pool_size': 3,
+        'pool_pre_ping': True,
+        'connect_args': {'connect_timeout': 2}
+    }}
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+from models import db
+from models.audit_log import AuditLog
+from models.payment import Payment
+from models.user import User
+from services.razorpay_fake import FakeRazorpayServer
+from services.reconciliation import apply_results, reconcile_payments
+
+
+def test_pending_payments_settle_against_the_provider(make_payment, tmp_path, monkeypatch):
+    monkeypatch.setenv('RAZORPAY_KEY_ID', 'rzp_test_fake')
+    monkeypatch.setenv('RAZORPAY_KEY_SECRET', 'secret')
+    two_days_ago = datetime.utcnow() - timedelta(days=2)
+    two_hours_ago = datetime.utcnow() - timedelta(hours=2)
+    captured = make_payment(created_at=two_days_ago)
+    declined = make_payment(created_at=two_days_ago)
+    abandoned = make_payment(created_at=two_days_ago)
+    unattempted = make_payment(created_at=two_hours_ago)
+    unknown = make_payment(created_at=two_days_ago)
+    recent = make_payment()
+
+    with FakeRazorpayServer() as fake:
+        fake.add_payment(captured.payment_id, status='failed')
+        paid = fake.add_payment(captured.payment_id, status='captured', method='card')
+        fake.add_payment(declined.payment_id, status='failed')
+        fake.orders[abandoned.payment_id] = []
+        fake.orders[unattempted.payment_id] = []
+        fake.orders[recent.payment_id] = []
+
+        stats = reconcile_payments(
+            older_than=timedelta(hours=1),
+            chunk_size=2,
+            concurrency=2,
+            checkpoint_path=str(tmp_path / 'checkpoint'),
+            api_base=fake.url
+        )
+
+    assert stats['checked'] == 5
+    assert stats['completed'] == 1
+    assert stats['closed'] == 2
+    assert stats['errors'] == 1
+    assert not (tmp_path / 'checkpoint').exists()
+
+    db.session.expire_all()
+    status = {payment.id: payment for payment in Payment.query.filter(Payment.id.in_([
+        captured.id, declined.id, abandoned.id, unattempted.id, unknown.id, recent.id
+    ]))}
+    assert status[captured.id].status == 'completed'
+    assert status[captured.id].payment_id == paid['id']
+    assert status[captured.id].payment_method == 'card'
+    assert db.session.get(User, captured.user_id).is_premium
+    assert status[declined.id].status == 'failed'
+    assert status[abandoned.id].status == 'cancelled'
+    # Too young to give up on, unknown to the provider, or not stale yet
+    assert status[unattempted.id].status == 'pending'
+    assert status[unknown.id].status == 'pending'
+    assert status[recent.id].status == 'pending'
+
+
+def test_payments_settled_meanwhile_are_left_alone(make_payment):
+    captured = make_payment()
+    declined = make_payment()
+    # Read as pending by the chunk query, then settled by webhooks before the answers are applied
+    rows = Payment.query.filter(Payment.id.in_([captured.id, declined.id])).order_by(Payment.id).all()
+    db.session.expunge_all()
+    Payment.query.filter(Payment.id == captured.id).update({'status': 'completed'})
+    Payment.query.filter(Payment.id == declined.id).update({'status': 'failed'})
+    db.session.commit()
+
+    results = [
+        ('completed', 'pay_late', 'card') if row.id == captured.id else ('failed', None, None)
+        for row in rows
+    ]
+    assert apply_results(rows, results) == (0, 0)
+
+    assert AuditLog.query.filter(
+        AuditLog.action == 'RECONCILE',
+        AuditLog.record_id.in_([captured.id, declined.id])
+    ).count() == 0
+    assert not db.session.get(User, captured.user_id).is_premium
+    assert db.session.get(Payment, captured.id).payment_id != 'pay_late'
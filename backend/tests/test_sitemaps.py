@@ -0,0 +1,81 @@
+import gzip
+import os
+import re
+from datetime import datetime
+
+import pytest
+
+from models import db
+from models.recipe import Recipe
+from services import sitemaps
+
+
+@pytest.fixture
+def sitemap_folder(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'SITEMAP_FOLDER', str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def shard_size(app, make_recipe, monkeypatch):
+    """Room for exactly the recipes there are now"""
+    make_recipe()
+    size = Recipe.query.filter_by(is_deleted=False).count()
+    monkeypatch.setitem(app.config, 'SITEMAP_SHARD_SIZE', size)
+    return size
+
+
+def shard_ids(folder, name):
+    with gzip.open(os.path.join(folder, name), 'rt') as f:
+        return re.findall(r'/recipes/([0-9a-f-]+)</loc>', f.read())
+
+
+def written(stats):
+    return stats['shards_written'], stats['shards'], stats['index_written'], stats['feeds_written']
+
+
+def test_only_changed_files_are_rewritten(client, sitemap_folder, shard_size, make_recipe):
+    assert written(sitemaps.generate()) == (1, 1, True, 2)
+    assert written(sitemaps.generate()) == (0, 1, False, 0)
+
+    first = sitemaps.SHARD_NAME.format(1)
+    response = client.get(f"/sitemaps/{first}")
+    etag = response.headers['ETag']
+    assert etag == f'"{sitemaps.etag_for(first)}"'
+    assert client.get(f"/sitemaps/{first}", headers={'If-None-Match': etag}).status_code == 304
+
+    # A new recipe overflows into a new shard; the full one and the featured feed are left alone
+    latest = make_recipe(title='Newest recipe')
+    assert written(sitemaps.generate()) == (1, 2, True, 1)
+    assert client.get(f"/sitemaps/{first}", headers={'If-None-Match': etag}).status_code == 304
+    assert shard_ids(sitemap_folder, sitemaps.SHARD_NAME.format(2)) == [str(latest.id)]
+
+    # Deleting a recipe rewrites only the shard it was in
+    latest.is_deleted = True
+    db.session.commit()
+    second = sitemaps.SHARD_NAME.format(2)
+    previous = sitemaps.etag_for(second)
+    assert written(sitemaps.generate()) == (1, 2, True, 1)
+    assert sitemaps.etag_for(second) != previous
+    assert shard_ids(sitemap_folder, second) == []
+    assert sitemaps.etag_for(first) == etag.strip('"')
+
+
+def test_backdated_recipes_split_the_shard_they_land_in(sitemap_folder, shard_size, make_recipe):
+    sitemaps.generate()
+    latest = make_recipe(title='Newest recipe')
+    sitemaps.generate()
+
+    # Imported with their original dates: they sort into the first shard
+    backdated = [make_recipe(title='Old family recipe', created_at=datetime(2001, 1, day)) for day in (1, 2)]
+    stats = sitemaps.generate()
+
+    shards = sitemaps.load_state(str(sitemap_folder))['shards']
+    assert [shard['name'] for shard in shards] == [sitemaps.SHARD_NAME.format(n) for n in (1, 3, 2)]
+    assert [shard['fingerprint'][0] for shard in shards] == [shard_size, 2, 1]
+    assert stats['shards_written'] == 2
+
+    ids = [recipe_id for shard in shards for recipe_id in shard_ids(sitemap_folder, shard['name'])]
+    assert len(ids) == len(set(ids)) == shard_size + 3
+    assert ids[:2] == [str(recipe.id) for recipe in backdated]
+    assert ids[-1] == str(latest.id)
@@ -0,0 +1,51 @@
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.trace import NonRecordingSpan, SpanContext, TraceFlags
+
+from utils.trace_export import KeepSlowSpanProcessor
+
+
+def tracer_and_exporter():
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    # Nothing is sampled at random and nothing counts as slow
+    provider.add_span_processor(KeepSlowSpanProcessor(SimpleSpanProcessor(exporter), 0.0, 3600))
+    return provider.get_tracer(__name__), exporter
+
+
+def remote_parent(sampled):
+    return trace.set_span_in_context(NonRecordingSpan(SpanContext(
+        trace_id=0x1234, span_id=0x5678, is_remote=True,
+        trace_flags=TraceFlags(TraceFlags.SAMPLED if sampled else TraceFlags.DEFAULT)
+    )))
+
+
+def test_local_roots_are_tail_sampled():
+    tracer, exporter = tracer_and_exporter()
+    with tracer.start_as_current_span('request'):
+        with tracer.start_as_current_span('query'):
+            pass
+
+    assert exporter.get_finished_spans() == ()
+
+
+def test_traces_with_a_sampled_remote_parent_are_kept():
+    tracer, exporter = tracer_and_exporter()
+    with tracer.start_as_current_span('request', context=remote_parent(sampled=True)):
+        with tracer.start_as_current_span('query'):
+            pass
+
+    assert [span.name for span in exporter.get_finished_spans()] == ['query', 'request']
+
+
+def test_errored_local_traces_are_kept():
+    tracer, exporter = tracer_and_exporter()
+    try:
+        with tracer.start_as_current_span('request'):
+            raise RuntimeError('boom')
+    except RuntimeError:
+        pass
+
+    assert [span.name for span in exporter.get_finished_spans()] == ['request']